@@ -0,0 +1,8 @@
+import os
+
+FIXTURE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "game_crawlers",
+    "nba",
+    "fixtures",
+)
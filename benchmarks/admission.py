@@ -0,0 +1,124 @@
+"""
+Crawls --games ESPN games from the fixture server, with random per page latency and a
+--fail-rate of pages answering 404, and measures what the pipeline's join buffer has to
+hold. Every game id is served one of the saved games, and a probe pipeline feeds the
+fragments to a GameJoinBuffer the way DBWriterPipeline does.
+
+Two runs are compared: the crawl as it was (every game issued up front, games with a
+failed page left in the buffer) and with game admission (MAX_OPEN_GAMES) and incomplete
+games spilled when the spider reports them. Reported per run: the most partial games and
+bytes the buffer held, when the first game completed and how many games were complete
+halfway through the crawl.
+
+    python -m benchmarks.admission [--games 600] [--max-open 32] [--fail-rate 0.02]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.fixture_server import mock_handler, serve
+
+
+class JoinProbePipeline:
+    def open_spider(self, spider):
+        from game_crawlers.nba.join_buffer import GameJoinBuffer
+
+        self.tmp = tempfile.TemporaryDirectory()
+        self.buffer = GameJoinBuffer(os.path.join(self.tmp.name, "spill.sqlite"), max_age=3600)
+        self.started = time.monotonic()
+        self.completed = []
+        self.max_pending = 0
+        self.max_bytes = 0
+        self.spill_incomplete = spider.settings.getbool("PROBE_SPILL_INCOMPLETE")
+
+    def process_item(self, item, spider):
+        if item["type"] == "game_incomplete":
+            if self.spill_incomplete:
+                self.buffer.spill(item["game_id"])
+            return item
+        record = self.buffer.add(item["game_id"], item["type"], item["data"])
+        if record is not None:
+            self.completed.append(time.monotonic() - self.started)
+        self.max_pending = max(self.max_pending, len(self.buffer.games))
+        self.max_bytes = max(self.max_bytes, self.buffer.size)
+        return item
+
+    def close_spider(self, spider):
+        elapsed = time.monotonic() - self.started
+        self.buffer.close()
+        self.tmp.cleanup()
+        print(
+            json.dumps(
+                {
+                    "games": len(self.completed),
+                    "elapsed": elapsed,
+                    "max_partial_games": self.max_pending,
+                    "max_buffer_bytes": self.max_bytes,
+                    "first_game": self.completed[0] if self.completed else None,
+                    "complete_at_half": sum(1 for t in self.completed if t <= elapsed / 2),
+                }
+            )
+        )
+
+
+def crawl(games: int, max_open: int, concurrency: int, fail_rate: float, legacy: bool):
+    from scrapy.crawler import CrawlerProcess
+
+    from game_crawlers.nba.espn_crawler import NBAESPNSpider
+
+    server = serve(handler=mock_handler(latency=0.02, fail_rate=fail_rate, any_game=True))
+    process = CrawlerProcess(
+        {
+            "LOG_LEVEL": "ERROR",
+            "CONCURRENT_REQUESTS": concurrency,
+            "CONCURRENT_REQUESTS_PER_DOMAIN": concurrency,
+            "MAX_OPEN_GAMES": 0 if legacy else max_open,
+            "PROBE_SPILL_INCOMPLETE": not legacy,
+            "RETRY_ENABLED": False,
+            "ITEM_PIPELINES": {"benchmarks.admission.JoinProbePipeline": 100},
+        }
+    )
+    process.crawl(
+        NBAESPNSpider,
+        ids=[str(400000000 + i) for i in range(games)],
+        base_url=f"http://127.0.0.1:{server.server_port}",
+    )
+    process.start()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, default=600)
+    parser.add_argument("--max-open", type=int, default=32)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--fail-rate", type=float, default=0.02)
+    parser.add_argument("--run", choices=["before", "admission"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        crawl(args.games, args.max_open, args.concurrency, args.fail_rate, args.run == "before")
+        sys.exit(0)
+
+    # a crawler process can only start the reactor once, so each run is its own process
+    for run in ("before", "admission"):
+        out = subprocess.run(
+            [
+                sys.executable, "-m", "benchmarks.admission", "--run", run,
+                "--games", str(args.games),
+                "--max-open", str(args.max_open),
+                "--concurrency", str(args.concurrency),
+                "--fail-rate", str(args.fail_rate),
+            ],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        r = json.loads(out.strip().splitlines()[-1])
+        label = "before" if run == "before" else f"MAX_OPEN_GAMES={args.max_open}"
+        print(f"{label}: {r['games']} games complete in {r['elapsed']:.1f}s")
+        print(f"  join buffer peak: {r['max_partial_games']} partial games, {r['max_buffer_bytes'] / 1024:,.0f} KiB")
+        print(f"  first game complete after {r['first_game']:.2f}s, {r['complete_at_half']} complete at half time")
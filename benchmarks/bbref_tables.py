@@ -0,0 +1,157 @@
+"""
+Compares the table extraction used by BBRefSpider against the original per-team extraction
+on the basketball-reference boxscore fixtures:
+
+  - commented tables: the four factor and line score index against the regex over the raw
+    comment text
+  - box tables: the single pass over every box score table (team totals and player rows for
+    both teams) against the per-team tfoot xpath and per-cell regex, which only produced
+    the team totals
+
+Team output must be identical, and pages/sec is reported for both.
+
+    python -m benchmarks.bbref_tables [--rounds 200]
+"""
+import argparse
+import glob
+import os
+import re
+import time
+from typing import List, Tuple
+
+from scrapy.http import HtmlResponse
+
+from benchmarks import FIXTURE_DIR
+from game_crawlers.nba.bbref_crawler import ADVANCED_BOX_MAP, BASIC_BOX_MAP, BBRefSpider
+from game_crawlers.nba import bbref_tables
+from game_crawlers.nba.bbref_tables import commented_tables
+
+
+# legacy_four_factor and legacy_scoreline are the regex extractors the table index replaced,
+# kept as the reference
+def legacy_four_factor(four_factor: str, abbr: str) -> dict:
+    bbref_to_teamstat_map = {"pace": "pace", "ft_rate": "ft_per_fga"}
+    clean_str = four_factor.replace("/n", "")
+    re_str = abbr + r'<.+(?=\<a)|' + abbr + r'<.+(?=</tr)'
+    snippet = re.search(re_str, clean_str)
+    stats = re.findall(r'data-stat=\"(?P<stat>[A-Za-z0-9_]+)\" >(?P<val>[0-9.]+)<', snippet.group())
+    stat_dict = dict()
+    for stat in stats:
+        if stat[0] in bbref_to_teamstat_map.keys():
+            stat_dict[bbref_to_teamstat_map.get(stat[0])] = stat[1]
+    return stat_dict
+
+
+def legacy_scoreline(scoreline: str, abbr: str) -> dict:
+    bbref_to_teamstat_map = {"1": "x1q_pts", "2": "x2q_pts", "3": "x3q_pts", "4": "x4q_pts"}
+    clean_str = scoreline.replace("/n", "")
+    re_str = abbr + r'<.+(?=<a)|' + abbr + r'<.+(?=</tr)'
+    snippet = re.search(re_str, clean_str)
+    stats = re.findall(r'data-stat=\"(?P<stat>[A-Za-z0-9_]+)\" >(?P<val>[0-9.]+)<', snippet.group())
+    stat_dict = dict()
+    stat_dict["ot_pts"] = 0
+    for stat in stats:
+        if stat[0] in bbref_to_teamstat_map.keys():
+            stat_dict[bbref_to_teamstat_map.get(stat[0])] = stat[1]
+        elif re.match(r'[0-9]OT', stat[0]):
+            stat_dict["ot_pts"] += int(stat[1])
+    stat_dict["ot_pts"] = str(stat_dict["ot_pts"])
+    return stat_dict
+
+
+def legacy_extract(response, teams: List[str]) -> List[dict]:
+    out = []
+    for abbr in teams:
+        four_factor = response.xpath('//div[@id="all_four_factors"]/comment()').get()
+        scoreline = response.xpath('//div[@id="all_line_score"]/comment()').get()
+        out.append({**legacy_four_factor(four_factor, abbr), **legacy_scoreline(scoreline, abbr)})
+    return out
+
+
+def indexed_extract(response, teams: List[str]) -> List[dict]:
+    tables = commented_tables(response)
+    return [
+        {
+            **BBRefSpider.parse_four_factor(tables.row("four_factors", abbr)),
+            **BBRefSpider.parse_scoreline(tables.row("line_score", abbr)),
+        }
+        for abbr in teams
+    ]
+
+
+def legacy_team_box(table_str: List[str], stat_map: dict) -> dict:
+    stats = {}
+    for stat in table_str:
+        match = re.search(r'data-stat=\"(?P<stat>[A-Za-z0-9_]+)\">(?P<val>[0-9.]+)<', stat)
+        if match and match.group("stat") in stat_map.keys():
+            stats[stat_map.get(match.group("stat"))] = match.group("val")
+    return stats
+
+
+def legacy_box_extract(response, teams: List[str]) -> List[dict]:
+    out = []
+    for abbr in teams:
+        basic = response.xpath('//table[@id="box-' + abbr + '-game-basic"]//tfoot//td').getall()
+        advanced = response.xpath('//table[@id="box-' + abbr + '-game-advanced"]//tfoot//td').getall()
+        out.append({**legacy_team_box(basic, BASIC_BOX_MAP), **legacy_team_box(advanced, ADVANCED_BOX_MAP)})
+    return out
+
+
+def box_extract(response, teams: List[str]) -> List[dict]:
+    spider = BBRefSpider(urls=[])
+    boxes = bbref_tables.box_tables(response)
+    out = []
+    for abbr in teams:
+        basic = boxes[(abbr, "game", "basic")]
+        advanced = boxes[(abbr, "game", "advanced")]
+        out.append(
+            {
+                **spider.parse_basic_box(basic.totals),
+                **spider.parse_advanced_box(advanced.totals),
+            }
+        )
+        spider.parse_player_stats(response, abbr, "x")
+    return out
+
+
+def load_pages() -> List[Tuple[HtmlResponse, List[str]]]:
+    # the page DOM is built here, outside the timed loop, since the spider needs it for
+    # the boxscore tables either way
+    pages = []
+    for path in sorted(glob.glob(os.path.join(FIXTURE_DIR, "bbref", "boxscore_*.html"))):
+        with open(path, "rb") as f:
+            response = HtmlResponse(url=f"file://{path}", body=f.read(), encoding="utf-8")
+        teams = response.xpath("//strong/a[@itemprop='name']/@href").re(r"teams/([A-Z]{3})")
+        pages.append((response, teams))
+    return pages
+
+
+def pages_per_sec(extract, pages, rounds: int) -> float:
+    t = time.perf_counter()
+    for _ in range(rounds):
+        # drop the cached tables so every round parses them again
+        bbref_tables._cache.clear()
+        bbref_tables._box_cache.clear()
+        for response, teams in pages:
+            extract(response, teams)
+    return rounds * len(pages) / (time.perf_counter() - t)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    pages = load_pages()
+    for name, legacy, current in (
+        ("commented tables", legacy_extract, indexed_extract),
+        ("box tables", legacy_box_extract, box_extract),
+    ):
+        for response, teams in pages:
+            if legacy(response, teams) != current(response, teams):
+                raise SystemExit(f"{name} output differs from the legacy extraction on {response.url}")
+        before = pages_per_sec(legacy, pages, args.rounds)
+        after = pages_per_sec(current, pages, args.rounds)
+        print(f"{name}: outputs identical over {len(pages)} pages")
+        print(f"  legacy:  {before:,.0f} pages/sec")
+        print(f"  current: {after:,.0f} pages/sec ({after / before:.1f}x)")
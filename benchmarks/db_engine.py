@@ -0,0 +1,89 @@
+"""
+Checks the shared engine from db.engine against a SQLite database (--url, a temporary file
+by default), so it runs without PostgreSQL:
+
+  - unit of work startup: --units short units (build an nbaDB, run the dedupe query
+    nba_scraper runs, close it) with a new engine per nbaDB, the way nbaDB used to connect,
+    and with the process wide engine
+  - the SQLite fallbacks: the fixture games are written with add_record into one database
+    and add_records into another, which must hold the same rows, and writing the batch
+    again must not add any
+
+    python -m benchmarks.db_engine [--units 200] [--url sqlite:///bench.sqlite]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.records import build_records, load_games
+from db import nba
+from db.engine import get_engine, session_scope
+
+TABLES = (nba.Game, nba.Team, nba.Player, nba.TeamStat, nba.PlayerStat)
+
+
+def dedupe_query(session):
+    return session.query(nba.Game.id).filter(nba.Game.id.in_(range(10))).all()
+
+
+def unit_with_own_engine(url: str):
+    # how nbaDB connected before: an engine and session factory per instance
+    engine = create_engine(url)
+    session = sessionmaker(bind=engine)()
+    dedupe_query(session)
+    session.close()
+
+
+def unit_with_shared_engine(url: str):
+    db = nba.nbaDB(engine=get_engine(url))
+    dedupe_query(db.session)
+    db.close()
+
+
+def row_counts(url: str) -> dict:
+    with session_scope(get_engine(url)) as session:
+        return {t.__tablename__: session.execute(select([func.count()]).select_from(t.__table__)).scalar() for t in TABLES}
+
+
+def write(url: str, records: list, bulk: bool) -> int:
+    db = nba.nbaDB(engine=get_engine(url))
+    rows = db.add_records(records) if bulk else sum(db.add_record(r) for r in records)
+    db.commit()
+    db.close()
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--units", type=int, default=200)
+    parser.add_argument("--url", help="database for the startup runs, default a temporary sqlite file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = args.url or f"sqlite:///{os.path.join(tmp, 'startup.sqlite')}"
+        nba.Base.metadata.create_all(get_engine(url))
+        for name, unit in (("engine per nbaDB", unit_with_own_engine), ("shared engine", unit_with_shared_engine)):
+            t = time.perf_counter()
+            for _ in range(args.units):
+                unit(url)
+            elapsed = time.perf_counter() - t
+            print(f"{name}: {1000 * elapsed / args.units:.2f} ms per unit of work over {args.units}")
+
+        records = [build_records(game) for game in load_games()]
+        counts = []
+        for bulk in (False, True):
+            db_url = f"sqlite:///{os.path.join(tmp, f'write-{bulk}.sqlite')}"
+            nba.Base.metadata.create_all(get_engine(db_url))
+            rows = write(db_url, records, bulk)
+            again = write(db_url, records, bulk=True)
+            counts.append(row_counts(db_url))
+            print(
+                f"{'add_records' if bulk else 'add_record'}: {len(records)} games, {rows} rows "
+                f"written, {again} more from writing them again, {counts[-1]}"
+            )
+        if counts[0] != counts[1]:
+            raise SystemExit("add_record and add_records wrote different rows")
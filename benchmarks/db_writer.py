@@ -0,0 +1,142 @@
+"""
+Crawls --games ESPN games from the fixture server into a DBWriterPipeline whose database
+is replaced by a sleep of --write-delay seconds per game (sleeping releases the GIL the
+way a database round trip does), and compares writing on the reactor thread
+(DB_WRITER_QUEUE = 0, how the pipeline used to write) with the background writer.
+
+Reported per run: wall time, the worst reactor lag a 10ms timer saw (how long downloads and
+parsing were stalled at once), games written, the writer queue's peak, and how often and
+how long backpressure paused the engine. --fail-batch makes that batch raise, to check the
+error reaches the stats and the crawl carries on.
+
+    python -m benchmarks.db_writer [--games 300] [--write-delay 0.01] [--queue 4]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.fixture_server import mock_handler, serve
+from game_crawlers.nba.pipelines import DBWriterPipeline
+
+
+class SleepWriterPipeline(DBWriterPipeline):
+    def open_writer(self, spider):
+        self.write_delay = spider.settings.getfloat("PROBE_WRITE_DELAY")
+        self.fail_batch = spider.settings.getint("PROBE_FAIL_BATCH", -1)
+        self.batches = 0
+        self.written = 0
+
+    def write_batch(self, records: list) -> int:
+        self.batches += 1
+        time.sleep(self.write_delay * len(records))
+        if self.batches == self.fail_batch:
+            raise RuntimeError(f"injected failure in batch {self.batches}")
+        return len(records)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close_writer(self, spider):
+        pass
+
+
+def crawl(games: int, write_delay: float, queue: int, fail_batch: int, spill_dir: str):
+    from scrapy.crawler import CrawlerProcess
+    from twisted.internet import reactor, task
+
+    from game_crawlers.nba.espn_crawler import NBAESPNSpider
+
+    lag = {"max": 0.0}
+
+    def probe():
+        now = time.monotonic()
+        if "last" in lag:
+            lag["max"] = max(lag["max"], now - lag["last"] - 0.01)
+        lag["last"] = now
+
+    server = serve(handler=mock_handler(latency=0.02, any_game=True))
+    process = CrawlerProcess(
+        {
+            "LOG_LEVEL": "CRITICAL",
+            "CONCURRENT_REQUESTS": 16,
+            "CONCURRENT_REQUESTS_PER_DOMAIN": 16,
+            "DB_COMMIT_GAMES": 10,
+            "DB_WRITER_QUEUE": queue,
+            "PROBE_WRITE_DELAY": write_delay,
+            "PROBE_FAIL_BATCH": fail_batch,
+            "JOIN_SPILL_PATH": os.path.join(spill_dir, f"spill-{queue}.sqlite"),
+            "ITEM_PIPELINES": {"benchmarks.db_writer.SleepWriterPipeline": 100},
+        }
+    )
+    crawler = process.create_crawler(NBAESPNSpider)
+    process.crawl(
+        crawler,
+        ids=[str(400000000 + i) for i in range(games)],
+        base_url=f"http://127.0.0.1:{server.server_port}",
+    )
+    reactor.callWhenRunning(lambda: task.LoopingCall(probe).start(0.01))
+    t = time.monotonic()
+    process.start()
+    stats = crawler.stats.get_stats()
+    print(
+        json.dumps(
+            {
+                "elapsed": time.monotonic() - t,
+                "max_lag": lag["max"],
+                "games_written": stats.get("db/games_written", 0),
+                "games_lost": stats.get("db/games_lost", 0),
+                "write_errors": stats.get("db/write_errors", 0),
+                "max_queue": stats.get("db/max_writer_queue", 0),
+                "pauses": stats.get("db/writer_pauses", 0),
+                "paused_seconds": stats.get("db/writer_paused_seconds", 0.0),
+            }
+        )
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, default=300)
+    parser.add_argument("--write-delay", type=float, default=0.01)
+    parser.add_argument("--queue", type=int, default=4)
+    parser.add_argument("--fail-batch", type=int, default=-1)
+    parser.add_argument("--run", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--spill-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        crawl(args.games, args.write_delay, args.queue, args.fail_batch, args.spill_dir)
+        sys.exit(0)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # a crawler process can only start the reactor once, so each run is its own process
+        for queue in (0, args.queue):
+            out = subprocess.run(
+                [
+                    sys.executable, "-m", "benchmarks.db_writer", "--run",
+                    "--games", str(args.games),
+                    "--write-delay", str(args.write_delay),
+                    "--queue", str(queue),
+                    "--fail-batch", str(args.fail_batch),
+                    "--spill-dir", tmp,
+                ],
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout
+            r = json.loads(out.strip().splitlines()[-1])
+            label = "reactor thread" if queue == 0 else f"writer thread, DB_WRITER_QUEUE={queue}"
+            print(f"{label}: {r['elapsed']:.2f}s, worst reactor stall {1000 * r['max_lag']:.0f} ms")
+            print(f"  {r['games_written']} games written, {r['games_lost']} lost to {r['write_errors']} write errors")
+            if queue:
+                print(
+                    f"  writer queue peak {r['max_queue']} batches, engine paused {r['pauses']} "
+                    f"times for {r['paused_seconds']:.2f}s"
+                )
@@ -0,0 +1,174 @@
+"""
+Checks the columnar season exports against their sources and times a season scan. --games
+games, built from the saved ESPN games under new ids, are written to a fresh SQLite database
+with add_records and exported twice: from the database with export_season, and from the
+records with record_rows and SeasonExport.append, the way SeasonExportPipeline does.
+
+Checked for every season and table: the rows read back from the memmapped columns (keys
+decoded, null sentinels as None, floats at float32 precision) are exactly the rows
+record_rows made, in both exports.
+
+Timed: season points per player and per team, summed over the memmapped columns with
+numpy, against the GROUP BY queries over the database the exports replace.
+
+    python -m benchmarks.export [--games 2000] [--rounds 20]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+from sqlalchemy import func, select
+
+from benchmarks.load import with_game_id
+from benchmarks.records import load_games
+from db import nba
+from db.engine import get_engine
+from db.export import (
+    GAME_ID_COLUMNS,
+    KEY_COLUMNS,
+    NULL_BOOL,
+    NULL_INT,
+    TABLES,
+    SeasonExport,
+    export_season,
+    record_rows,
+)
+
+# columns identifying a row of each table, for comparing rows in any order
+ROW_KEYS = {"games": ("id",), "team_stats": ("game_id", "team_abbr"), "player_stats": ("game_id", "player_id")}
+
+
+def make_records(games: int) -> list:
+    saved = load_games()
+    records = []
+    for i in range(games):
+        game_id = str(400000000 + i)
+        game = saved[i % len(saved)]
+        records.append({kind: with_game_id(game[kind], game_id) for kind in ("game", "team_stats", "player_stats")})
+    return records
+
+
+def source_value(name: str, dtype: str, v):
+    # a source row value as it reads back from its column
+    if name in KEY_COLUMNS:
+        return None if v is None or v == "" else str(v)
+    if name in GAME_ID_COLUMNS:
+        return int(v)
+    if v is None or v == "":
+        return None
+    if dtype == "<f4":
+        return float(np.float32(float(v)))
+    if dtype == "i1":
+        return bool(v)
+    if dtype == "<i4":
+        return int(float(v))
+    return v
+
+
+def exported_rows(export: SeasonExport, table: str) -> list:
+    columns = {}
+    for name, dtype in export.manifest["tables"][table]["columns"].items():
+        if name in KEY_COLUMNS:
+            values = export.decode(table, name).tolist()
+        else:
+            values = export.column(table, name).tolist()
+            if dtype == "<f4":
+                values = [None if v != v else v for v in values]
+            elif dtype == "i1":
+                values = [None if v == NULL_BOOL else bool(v) for v in values]
+            elif dtype == "<i4":
+                values = [None if v == NULL_INT else v for v in values]
+        columns[name] = values
+    rows = [dict(zip(columns, values)) for values in zip(*columns.values())]
+    return sorted(rows, key=lambda r: tuple(str(r[k]) for k in ROW_KEYS[table]))
+
+
+def expected_rows(export: SeasonExport, table: str, rows: list) -> list:
+    dtypes = export.manifest["tables"][table]["columns"]
+    rows = [{name: source_value(name, dtype, r.get(name)) for name, dtype in dtypes.items()} for r in rows]
+    return sorted(rows, key=lambda r: tuple(str(r[k]) for k in ROW_KEYS[table]))
+
+
+def scan_export(export: SeasonExport) -> tuple:
+    # season points per player id and per team from the columns
+    out = []
+    for table, key, stat in (("player_stats", "player_id", "points"), ("team_stats", "team_abbr", "pts")):
+        codes = export.column(table, key)
+        values = export.column(table, stat)
+        keep = (codes >= 0) & (values != NULL_INT)
+        totals = np.bincount(codes[keep], weights=values[keep], minlength=len(export.keys[KEY_COLUMNS[key]]))
+        out.append({k: int(t) for k, t in zip(export.keys[KEY_COLUMNS[key]], totals) if t})
+    return tuple(out)
+
+
+def scan_db(conn, season: str) -> tuple:
+    games = TABLES["games"]
+    out = []
+    for table, key, stat in (("player_stats", "player_id", "points"), ("team_stats", "team_abbr", "pts")):
+        t = TABLES[table]
+        rows = conn.execute(
+            select([t.c[key], func.sum(t.c[stat])])
+            .select_from(t.join(games, games.c.id == t.c.game_id))
+            .where(games.c.season == season)
+            .group_by(t.c[key])
+        )
+        out.append({str(k): int(total) for k, total in rows if k is not None and total})
+    return tuple(out)
+
+
+def timed(func, rounds: int) -> tuple:
+    t = time.perf_counter()
+    for _ in range(rounds):
+        result = func()
+    return result, (time.perf_counter() - t) / rounds
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, default=2000)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    records = make_records(args.games)
+    by_season = record_rows(records)
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{os.path.join(tmp, 'export.sqlite')}"
+        nba.Base.metadata.create_all(get_engine(url))
+        db = nba.nbaDB(engine=get_engine(url))
+        db.add_records(records)
+        db.commit()
+
+        for season, (games, team_stats, player_stats) in sorted(by_season.items()):
+            t = time.perf_counter()
+            export_season(db, os.path.join(tmp, "from_db"), season)
+            from_db_seconds = time.perf_counter() - t
+            t = time.perf_counter()
+            SeasonExport(os.path.join(tmp, "from_items"), season).append(games, team_stats, player_stats)
+            from_items_seconds = time.perf_counter() - t
+
+            source = {"games": games, "team_stats": team_stats, "player_stats": player_stats}
+            for name in ("from_db", "from_items"):
+                # a fresh SeasonExport reads the manifest and keys back from disk
+                export = SeasonExport(os.path.join(tmp, name), season)
+                for table, rows in source.items():
+                    if exported_rows(export, table) != expected_rows(export, table, rows):
+                        raise SystemExit(f"{season} {table}: {name} export differs from the source rows")
+            print(
+                f"{season}: {len(games)} games, {len(player_stats)} player rows read back identical "
+                f"from both exports (export_season {from_db_seconds:.2f}s, "
+                f"record_rows + append {from_items_seconds:.2f}s)"
+            )
+
+            export = SeasonExport(os.path.join(tmp, "from_db"), season)
+            conn = db.session.connection()
+            columns, column_seconds = timed(lambda: scan_export(export), args.rounds)
+            queried, query_seconds = timed(lambda: scan_db(conn, season), args.rounds)
+            if columns != queried:
+                raise SystemExit(f"{season}: season totals from the export differ from the database")
+            print(
+                f"  season points per player and team: columns {1000 * column_seconds:.2f} ms, "
+                f"database {1000 * query_seconds:.2f} ms ({query_seconds / column_seconds:.1f}x)"
+            )
+        db.close()
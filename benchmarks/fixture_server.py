@@ -0,0 +1,183 @@
+"""
+Serves the saved pages in game_crawlers/nba/fixtures over HTTP using the same paths as the
+live sites, so crawlers can be exercised locally by pointing their base url at it.
+
+    python -m benchmarks.fixture_server [--port 8000]
+
+    http://localhost:8000/nba/scoreboard/_/date/20190123   espn/scoreboard_20190123.html
+    http://localhost:8000/nba/game?gameId=401071119         espn/gamecast_401071119.html
+    http://localhost:8000/nba/boxscore?gameId=401071119     espn/boxscore_401071119.html
+    http://localhost:8000/nba/matchup?gameId=401071119      espn/matchup_401071119.html
+    http://localhost:8000/apis/site/v2/sports/basketball/nba/summary?event=401071119
+                                                            espn/summary_401071119.json
+    http://localhost:8000/boxscores/201902100BOS.html       bbref/boxscore_201902100BOS.html
+
+mock_handler() builds a handler that also behaves like a loaded, rate limited site, see
+its arguments; the command line exposes the same options:
+
+    python -m benchmarks.fixture_server --latency 0.05 --rate 10 --burst 5 --retry-after 2
+"""
+import argparse
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks import FIXTURE_DIR
+
+ROUTES = [
+    (re.compile(r"^/nba/scoreboard/_/date/([0-9]{8})$"), "espn/scoreboard_{}.html"),
+    (re.compile(r"^/nba/game\?gameId=([0-9]+)$"), "espn/gamecast_{}.html"),
+    (re.compile(r"^/nba/boxscore\?gameId=([0-9]+)$"), "espn/boxscore_{}.html"),
+    (re.compile(r"^/nba/matchup\?gameId=([0-9]+)$"), "espn/matchup_{}.html"),
+    (
+        re.compile(r"^/apis/site/v2/sports/basketball/nba/summary\?event=([0-9]+)$"),
+        "espn/summary_{}.json",
+    ),
+    (re.compile(r"^/boxscores/([0-9A-Z]+)\.html$"), "bbref/boxscore_{}.html"),
+]
+
+
+def fixture_for(path: str):
+    for pattern, name in ROUTES:
+        m = pattern.match(path)
+        if m:
+            return os.path.join(FIXTURE_DIR, name.format(m.group(1)))
+    return None
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        path = fixture_for(self.path)
+        if path is None or not os.path.exists(path):
+            self.send_error(404)
+            return
+        with open(path, "rb") as f:
+            body = f.read()
+        content_type = "application/json" if path.endswith(".json") else "text/html; charset=utf-8"
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MockHandler(FixtureHandler):
+    latency = 0.0
+    load_latency = 0.0
+    rate = 0.0
+    burst = 1
+    retry_after = 1
+    error_rate = 0.0
+    fail_rate = 0.0
+    any_game = False
+
+    def do_GET(self):
+        cls = type(self)
+        with cls.lock:
+            cls.in_flight += 1
+            in_flight = cls.in_flight
+            cls.max_in_flight = max(cls.max_in_flight, in_flight)
+            limited = False
+            if cls.rate > 0:
+                now = time.monotonic()
+                cls.tokens = min(cls.burst, cls.tokens + (now - cls.refilled) * cls.rate)
+                cls.refilled = now
+                if cls.tokens >= 1:
+                    cls.tokens -= 1
+                else:
+                    limited = True
+            cls.requests += 1
+            cls.limited += limited
+        try:
+            if limited:
+                self.send_response(429)
+                self.send_header("Retry-After", str(cls.retry_after))
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            if random.random() < cls.error_rate:
+                self.send_error(503)
+                return
+            if random.Random(self.path).random() < cls.fail_rate:
+                self.send_error(404)
+                return
+            if cls.any_game:
+                self.path = re.sub(
+                    r"(gameId|event)=([0-9]+)",
+                    lambda m: f"{m.group(1)}={ANY_GAME[int(m.group(2)) % len(ANY_GAME)]}",
+                    self.path,
+                )
+            time.sleep(random.uniform(0, 2 * cls.latency) + cls.load_latency * (in_flight - 1))
+            super().do_GET()
+        finally:
+            with cls.lock:
+                cls.in_flight -= 1
+
+
+# the saved games any_game maps other game ids to
+ANY_GAME = ["400828991", "401071119"]
+
+
+# mock_handler returns a FixtureHandler that adds, per request:
+#   latency       a uniform random wait averaging this many seconds
+#   load_latency  seconds more for every other request in flight, like an overloaded host
+#   rate, burst   a token bucket of rate requests/sec; requests over it get 429 with a
+#                 Retry-After of retry_after seconds. rate 0 is unlimited
+#   error_rate    share of requests answered 503
+#   fail_rate     share of pages answering 404, the same pages on every request
+#   any_game      serve every game id one of the saved games
+# Each call gets its own counters (requests, limited, max_in_flight) and token bucket.
+def mock_handler(**options) -> type:
+    unknown = set(options) - set(vars(MockHandler))
+    if unknown:
+        raise TypeError(f"unknown mock options {sorted(unknown)}")
+    state = dict(
+        lock=threading.Lock(),
+        in_flight=0,
+        max_in_flight=0,
+        requests=0,
+        limited=0,
+        tokens=float(options.get("burst", MockHandler.burst)),
+        refilled=time.monotonic(),
+    )
+    return type("MockHandler", (MockHandler,), dict(options, **state))
+
+
+def serve(port: int = 0, handler=FixtureHandler) -> ThreadingHTTPServer:
+    # starts the server on a background thread, port 0 picks a free port
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--load-latency", type=float, default=0.0)
+    parser.add_argument("--rate", type=float, default=0.0)
+    parser.add_argument("--burst", type=int, default=1)
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--any-game", action="store_true")
+    args = parser.parse_args()
+    handler = mock_handler(
+        latency=args.latency,
+        load_latency=args.load_latency,
+        rate=args.rate,
+        burst=args.burst,
+        retry_after=args.retry_after,
+        error_rate=args.error_rate,
+        fail_rate=args.fail_rate,
+        any_game=args.any_game,
+    )
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), handler)
+    print(f"serving {FIXTURE_DIR} on http://127.0.0.1:{args.port}")
+    server.serve_forever()
@@ -0,0 +1,217 @@
+"""
+Collects game ids with GameDriverPool from the fixture server's ESPN scoreboards, once with
+one worker and once with --workers, each into a fresh GameIdStore. The dates are the saved
+scoreboards (one with no games) and --days days from 1 January 2019. The server answers
+404 for days without a saved page, like a day without games.
+
+Checked after every run: no date failed, every date has its scoreboard row and the ids
+stored for each date are exactly the ids linked from its saved page. A second run on a
+filled store must skip every date without a request. With the stand-in browser, a run
+against a server that is not listening must report every date failed and store none.
+
+Without selenium installed, the browser is replaced by a stand-in that fetches pages with
+urllib and evaluates GameDriver's xpath with parsel. It is installed when this module is
+imported, so the pool's spawned worker processes, which import it again, get it too. That
+measures the pool and the store rather than Firefox; with selenium and geckodriver installed
+the real browser is used.
+
+    python -m benchmarks.game_ids [--workers 4] [--days 60] [--latency 0.05]
+"""
+import argparse
+import os
+import re
+import sys
+import tempfile
+import time
+import types
+import urllib.error
+import urllib.request
+from datetime import date, datetime, timedelta
+from urllib.parse import urljoin
+
+from benchmarks import FIXTURE_DIR
+from benchmarks.fixture_server import mock_handler, serve
+
+SCOREBOARDS = os.path.join(FIXTURE_DIR, "espn")
+LINK_RE = re.compile(r'mobileScoreboardLink" href="[^"]*gameId=([0-9]+)"')
+
+
+class FakeElement:
+    def __init__(self, attributes: dict):
+        self.attributes = attributes
+
+    def get_attribute(self, name: str):
+        return self.attributes.get(name)
+
+
+class FakeFirefox:
+    # the parts of selenium's Firefox driver GameDriver uses. Like the browser, href
+    # attributes come back as absolute urls and error pages load without raising.
+    def __init__(self, options=None, **kwargs):
+        self.opener = urllib.request.build_opener(urllib.request.ProxyHandler({}))
+        self.url = None
+        self.body = ""
+
+    def set_page_load_timeout(self, seconds):
+        self.timeout = seconds
+
+    def get(self, url: str):
+        from selenium.common.exceptions import WebDriverException
+
+        self.url = url
+        try:
+            with self.opener.open(url, timeout=self.timeout) as r:
+                self.body = r.read().decode("utf-8")
+        except urllib.error.HTTPError as e:
+            self.body = e.read().decode("utf-8", "replace")
+        except urllib.error.URLError as e:
+            raise WebDriverException(f"{url}: {e.reason}")
+
+    def find_elements_by_xpath(self, xpath: str):
+        from parsel import Selector
+
+        return [
+            FakeElement({k: urljoin(self.url, v) if k == "href" else v for k, v in a.attrib.items()})
+            for a in Selector(text=self.body).xpath(xpath)
+        ]
+
+    def quit(self):
+        pass
+
+    close = quit
+
+
+def install_fake_selenium():
+    modules = {
+        name: types.ModuleType(name)
+        for name in (
+            "selenium",
+            "selenium.webdriver",
+            "selenium.webdriver.firefox",
+            "selenium.webdriver.firefox.options",
+            "selenium.common",
+            "selenium.common.exceptions",
+        )
+    }
+    exceptions = modules["selenium.common.exceptions"]
+    exceptions.WebDriverException = type("WebDriverException", (Exception,), {})
+    exceptions.TimeoutException = type("TimeoutException", (exceptions.WebDriverException,), {})
+    webdriver = modules["selenium.webdriver"]
+    webdriver.Firefox = FakeFirefox
+    webdriver.DesiredCapabilities = type("DesiredCapabilities", (), {})
+    webdriver.FirefoxProfile = type("FirefoxProfile", (), {})
+    modules["selenium.webdriver.firefox.options"].Options = type("Options", (), {"headless": True})
+    modules["selenium"].webdriver = webdriver
+    modules["selenium"].common = modules["selenium.common"]
+    modules["selenium.common"].exceptions = exceptions
+    webdriver.firefox = modules["selenium.webdriver.firefox"]
+    webdriver.firefox.options = modules["selenium.webdriver.firefox.options"]
+    sys.modules.update(modules)
+
+
+try:
+    import selenium  # noqa: F401
+
+    BROWSER = "Firefox"
+except ImportError:
+    install_fake_selenium()
+    BROWSER = "a stand-in browser"
+
+from game_crawlers.nba.game_ids import GameDriverPool  # noqa: E402
+from game_crawlers.nba.id_store import GameIdStore  # noqa: E402
+
+
+def expected_ids(d: date) -> list:
+    # the ids linked from the saved scoreboard of d, none for days without one
+    path = os.path.join(SCOREBOARDS, f"scoreboard_{d:%Y%m%d}.html")
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return sorted(set(LINK_RE.findall(f.read())))
+
+
+def saved_dates() -> list:
+    names = (re.match(r"scoreboard_([0-9]{8})\.html$", n) for n in os.listdir(SCOREBOARDS))
+    return sorted(datetime.strptime(m.group(1), "%Y%m%d").date() for m in names if m)
+
+
+def check_store(path: str, dates: list) -> int:
+    # returns the number of ids stored, exits on the first date that does not match
+    store = GameIdStore(path)
+    try:
+        missing = store.missing_dates(dates)
+        if missing:
+            raise SystemExit(f"no scoreboard row for {missing}")
+        total = 0
+        for d in dates:
+            ids = sorted(store.ids_between(d, d))
+            if ids != expected_ids(d):
+                raise SystemExit(f"{d}: stored {ids}, expected {expected_ids(d)}")
+            total += len(ids)
+        return total
+    finally:
+        store.close()
+
+
+def collect(tmp: str, dates: list, workers: int, latency: float) -> dict:
+    handler = mock_handler(latency=latency)
+    server = serve(handler=handler)
+    base_url = f"http://127.0.0.1:{server.server_port}/nba/scoreboard/_/date/"
+    path = os.path.join(tmp, f"game_ids-{workers}.sqlite")
+    try:
+        t = time.monotonic()
+        failed = GameDriverPool(base_url, workers, path, report_every=3600).run(dates)
+        elapsed = time.monotonic() - t
+        if failed:
+            raise SystemExit(f"{workers} workers failed on {failed}")
+        ids = check_store(path, dates)
+        requests = handler.requests
+        GameDriverPool(base_url, workers, path, report_every=3600).run(dates)
+        if handler.requests != requests:
+            raise SystemExit(f"a second run made {handler.requests - requests} requests")
+    finally:
+        server.shutdown()
+    return {"elapsed": elapsed, "ids": ids, "requests": requests}
+
+
+def check_unreachable(tmp: str, dates: list):
+    # with nothing listening, every page load fails: each date must be reported failed and
+    # none stored as a day without games
+    server = serve()
+    base_url = f"http://127.0.0.1:{server.server_port}/nba/scoreboard/_/date/"
+    server.shutdown()
+    server.server_close()
+    path = os.path.join(tmp, "game_ids-unreachable.sqlite")
+    failed = GameDriverPool(base_url, 2, path, report_every=3600).run(dates)
+    if sorted(failed) != sorted(dates):
+        raise SystemExit(f"unreachable scoreboards: {len(failed)} of {len(dates)} dates failed")
+    store = GameIdStore(path)
+    stored = store.stats()["dates"]
+    store.close()
+    if stored:
+        raise SystemExit(f"{stored} dates whose page never loaded were stored")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--days", type=int, default=60, help="dates besides the saved scoreboards")
+    parser.add_argument("--latency", type=float, default=0.05, help="mean page load seconds")
+    args = parser.parse_args()
+
+    days = {date(2019, 1, 1) + timedelta(days=i) for i in range(args.days)}
+    dates = sorted(days | set(saved_dates()))
+    print(f"{len(dates)} dates, {len(saved_dates())} with a saved scoreboard, {BROWSER}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for workers in (1, args.workers):
+            r = collect(tmp, dates, workers, args.latency)
+            print(
+                f"{workers} worker{'s' if workers > 1 else ''}: {r['elapsed']:.2f}s, "
+                f"{len(dates) / r['elapsed']:.1f} dates/sec, {r['requests']} requests, "
+                f"{r['ids']} ids stored and matching the fixtures"
+            )
+        # the stand-in browser fails like a driver when the page cannot be reached, Firefox
+        # would load its own error page
+        if BROWSER != "Firefox":
+            check_unreachable(tmp, saved_dates())
+            print("unreachable scoreboards: every date reported failed, none stored")
@@ -0,0 +1,88 @@
+"""
+Crawls --games ESPN games from the fixture server with the multi-process launcher, once
+with a single worker and once with --workers, under one politeness budget for the server's
+host (--max concurrent requests, at least --delay seconds apart). No pipelines run, so the
+crawl is bound by downloads and parsing.
+
+Reported per run: wall time, pages/sec, the most requests the server had in flight at once
+and its request rate (both must stay within the budget however many workers share it), and
+items and pages from the merged stats, which must match between runs.
+
+    python -m benchmarks.launcher [--games 200] [--workers 4] [--max 8] [--delay 0]
+"""
+import argparse
+import time
+
+from scrapy.settings import Settings
+
+from benchmarks.fixture_server import mock_handler, serve
+from game_crawlers.nba.espn_crawler import NBAESPNSpider
+from game_crawlers.nba.launcher import merge_stats, run_workers, shard_units
+
+HOST = "127.0.0.1"
+
+
+def crawl(games: int, workers: int, max_concurrency: int, delay: float) -> dict:
+    handler = mock_handler(latency=0.02, any_game=True)
+    server = serve(handler=handler)
+    settings = Settings(
+        {
+            "LOG_LEVEL": "ERROR",
+            "COOKIES_ENABLED": False,
+            "CONCURRENT_REQUESTS": 32,
+            "CONCURRENT_REQUESTS_PER_DOMAIN": 1,
+            "DOWNLOAD_DELAY": 0,
+            "ADAPTIVE_CONCURRENCY_ENABLED": True,
+            "ADAPTIVE_CONCURRENCY_HOSTS": {
+                HOST: {"min": 1, "max": max_concurrency, "start": max_concurrency, "delay": delay}
+            },
+            "DOWNLOADER_MIDDLEWARES": {
+                "game_crawlers.nba.throttle.AdaptiveConcurrencyMiddleware": 950
+            },
+        }
+    )
+    ids = [str(400000000 + i) for i in range(games)]
+    # planned like nba_scraper plans seasons, ten units of consecutive games
+    units = [(f"unit-{i}", ids[i::10]) for i in range(10)]
+    t = time.monotonic()
+    stats = run_workers(
+        NBAESPNSpider,
+        settings,
+        shard_units(units, workers),
+        base_url=f"http://{HOST}:{server.server_port}",
+    )
+    elapsed = time.monotonic() - t
+    server.shutdown()
+    merged = merge_stats([s for s in stats if s is not None])
+    return {
+        "elapsed": elapsed,
+        "failed": sum(s is None for s in stats),
+        "requests": handler.requests,
+        "max_in_flight": handler.max_in_flight,
+        "items": merged.get("item_scraped_count", 0),
+        "pages": merged.get("response_received_count", 0),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--max", type=int, default=8, help="concurrency budget for the host")
+    parser.add_argument("--delay", type=float, default=0.0, help="delay budget for the host")
+    args = parser.parse_args()
+
+    runs = {}
+    for workers in (1, args.workers):
+        r = runs[workers] = crawl(args.games, workers, args.max, args.delay)
+        print(
+            f"{workers} worker{'s' if workers > 1 else ''}: {r['elapsed']:.2f}s, "
+            f"{r['pages'] / r['elapsed']:.1f} pages/sec, {r['items']} items, {r['failed']} failed"
+        )
+        print(
+            f"  server saw {r['requests']} requests, at most {r['max_in_flight']} in flight "
+            f"(budget {args.max}), {r['requests'] / r['elapsed']:.1f} requests/sec"
+            + (f" (budget {1 / args.delay:.1f})" if args.delay else "")
+        )
+    if runs[1]["items"] != runs[args.workers]["items"]:
+        raise SystemExit("the workers' merged stats count different items than one worker")
@@ -0,0 +1,165 @@
+"""
+Loads a JSONL item file of --games games, built from the ESPN fixture games under new ids
+with their fragments interleaved the way a crawl writes them, into fresh SQLite databases:
+
+  - the crawl's write path: nbaDB.add_record per game, a commit every 100 games
+  - db.load with one worker and with --workers
+  - db.load killed after its first checkpoint and run again on the same checkpoint
+
+Every run must end with the same rows in the five tables. SQLite has no COPY and lets one
+writer in at a time, so the parallel COPY path itself needs PostgreSQL (set DATABASE_URL
+and pass --url the same).
+
+    python -m benchmarks.load [--games 5000] [--workers 4]
+"""
+import argparse
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+from sqlalchemy import func, select
+
+from benchmarks.records import load_games
+from db import nba
+from db.engine import get_engine
+from db.load import JsonlLoader
+
+TABLES = (nba.Game, nba.Team, nba.Player, nba.TeamStat, nba.PlayerStat)
+KINDS = ("game", "team_stats", "player_stats")
+
+
+def with_game_id(value, game_id: str):
+    if isinstance(value, dict):
+        return {k: game_id if k == "game_id" else with_game_id(v, game_id) for k, v in value.items()}
+    if isinstance(value, list):
+        return [with_game_id(v, game_id) for v in value]
+    return value
+
+
+def write_items(path: str, games: int):
+    # fragments of up to 32 games are in flight at once, like a crawl with MAX_OPEN_GAMES 32
+    saved = load_games()
+    rng = random.Random(0)
+    pending = []
+    with open(path, "w") as f:
+        for i in range(games):
+            game_id = str(400000000 + i)
+            game = saved[i % len(saved)]
+            pending.extend(
+                {"type": kind, "game_id": game_id, "data": with_game_id(game[kind], game_id)}
+                for kind in KINDS
+            )
+            while len(pending) > 3 * 32 or (i == games - 1 and pending):
+                f.write(json.dumps(pending.pop(rng.randrange(len(pending)))) + "\n")
+
+
+def fresh_db(tmp: str, name: str) -> str:
+    url = f"sqlite:///{os.path.join(tmp, name + '.sqlite')}"
+    nba.Base.metadata.create_all(get_engine(url))
+    return url
+
+
+def row_counts(url: str) -> dict:
+    with get_engine(url).connect() as conn:
+        return {
+            t.__tablename__: conn.execute(select([func.count()]).select_from(t.__table__)).scalar()
+            for t in TABLES
+        }
+
+
+def crawl_path(url: str, items: str) -> float:
+    # joins like DBWriterPipeline and writes with add_record, a commit every 100 games
+    from game_crawlers.nba.join_buffer import GameJoinBuffer
+
+    t = time.monotonic()
+    db = nba.nbaDB(engine=get_engine(url))
+    buffer = GameJoinBuffer(url[len("sqlite:///"):] + ".spill")
+    pending = 0
+    with open(items) as f:
+        for line in f:
+            item = json.loads(line)
+            record = buffer.add(item["game_id"], item["type"], item["data"])
+            if record is not None:
+                db.add_record(record)
+                pending += 1
+                if pending == 100:
+                    db.commit()
+                    pending = 0
+    db.commit()
+    db.close()
+    buffer.close()
+    return time.monotonic() - t
+
+
+def load(url: str, items: str, checkpoint: str, workers: int) -> dict:
+    os.environ["DATABASE_URL"] = url
+    return JsonlLoader(checkpoint, workers=workers, batch_games=250, checkpoint_games=1000).load([items])
+
+
+def interrupted_load(url: str, items: str, checkpoint: str, workers: int) -> dict:
+    # kills a load once its first checkpoint is written, then runs it to the end
+    env = dict(os.environ, DATABASE_URL=url)
+    cmd = [
+        sys.executable, "-m", "db.load", items,
+        "--checkpoint", checkpoint,
+        "--workers", str(workers),
+        "--batch-games", "250",
+        "--checkpoint-games", "1000",
+    ]
+    p = subprocess.Popen(cmd, env=env, stdout=subprocess.DEVNULL, start_new_session=True)
+    while not os.path.exists(checkpoint) and p.poll() is None:
+        time.sleep(0.05)
+    os.killpg(p.pid, signal.SIGKILL)
+    p.wait()
+    with open(checkpoint) as f:
+        stopped = json.load(f)
+    out = subprocess.run(cmd, env=env, capture_output=True, text=True, check=True).stdout
+    result = json.loads(out.strip().splitlines()[-1])
+    result["stopped_at"] = list(stopped["files"].values())[0]
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        items = os.path.join(tmp, "items.json")
+        write_items(items, args.games)
+        size = os.path.getsize(items)
+        print(f"{args.games} games, {size / 2 ** 20:.1f} MiB of JSONL")
+
+        counts = {}
+        url = fresh_db(tmp, "crawl")
+        elapsed = crawl_path(url, items)
+        counts["add_record"] = row_counts(url)
+        print(f"add_record, commit every 100: {elapsed:.2f}s, {args.games / elapsed:,.0f} games/sec")
+
+        for workers in (1, args.workers):
+            url = fresh_db(tmp, f"load-{workers}")
+            r = load(url, items, os.path.join(tmp, f"load-{workers}.json"), workers)
+            counts[f"load {workers}"] = row_counts(url)
+            print(
+                f"db.load, {workers} worker{'s' if workers > 1 else ''}: {r['seconds']:.2f}s, "
+                f"{r['games'] / r['seconds']:,.0f} games/sec, {r['batches']} batches, "
+                f"{r['incomplete_games']} incomplete"
+            )
+
+        url = fresh_db(tmp, "resumed")
+        r = interrupted_load(url, items, os.path.join(tmp, "resumed.json"), args.workers)
+        counts["resumed"] = row_counts(url)
+        print(
+            f"db.load killed at byte {r['stopped_at']:,} of {size:,} and resumed: "
+            f"{r['games']} games loaded by the second run"
+        )
+
+        print(f"rows: {counts['add_record']}")
+        if any(c != counts["add_record"] for c in counts.values()):
+            raise SystemExit(f"runs loaded different rows: {counts}")
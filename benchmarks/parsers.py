@@ -0,0 +1,129 @@
+"""
+Offline parser benchmark. Runs the spider callbacks against the saved pages in
+game_crawlers/nba/fixtures and reports pages/sec, p50/p99 latency and peak traced
+allocations per callback.
+
+    python -m benchmarks.parsers [--rounds 50] [--json out.json] [--baseline old.json]
+
+With --baseline the run exits non-zero when a callback's p50 is more than --tolerance
+slower than the saved run, so a parser regression can be caught before a backfill.
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import time
+import tracemalloc
+from types import GeneratorType
+
+from scrapy.http import HtmlResponse
+
+from benchmarks import FIXTURE_DIR
+from game_crawlers.nba.bbref_crawler import BBRefSpider
+from game_crawlers.nba.espn_crawler import NBAESPNSpider
+
+# callback name -> (fixture glob, spider callback lookup)
+CALLBACKS = {
+    "espn.parse_game": ("espn/gamecast_*.html", lambda s: s["espn"].parse_game),
+    "espn.parse_boxscore": ("espn/boxscore_*.html", lambda s: s["espn"].parse_boxscore),
+    "espn.parse_teamstats": ("espn/matchup_*.html", lambda s: s["espn"].parse_teamstats),
+    "bbref.parse_boxscore": ("bbref/boxscore_*.html", lambda s: s["bbref"].parse_boxscore),
+}
+
+
+def load_pages(pattern: str) -> list:
+    pages = []
+    for path in sorted(glob.glob(os.path.join(FIXTURE_DIR, pattern))):
+        game_id = re.search(r"_([0-9A-Z]+)\.html$", path).group(1)
+        with open(path, "rb") as f:
+            pages.append((game_id, path, f.read()))
+    return pages
+
+
+def run_callback(callback, game_id: str, path: str, body: bytes):
+    # a fresh response per call so selector caching does not hide parse cost
+    response = HtmlResponse(url=f"file://{path}", body=body, encoding="utf-8")
+    result = callback(response, game_id)
+    if isinstance(result, GeneratorType):
+        result = list(result)
+    return result
+
+
+def percentile(values: list, p: float) -> float:
+    values = sorted(values)
+    k = min(len(values) - 1, max(0, int(round(p / 100 * (len(values) - 1)))))
+    return values[k]
+
+
+def bench(rounds: int) -> dict:
+    spiders = {"espn": NBAESPNSpider(ids=[]), "bbref": BBRefSpider(urls=[])}
+    report = {}
+    for name, (pattern, lookup) in CALLBACKS.items():
+        callback = lookup(spiders)
+        pages = load_pages(pattern)
+        if not pages:
+            continue
+
+        # warm up and measure peak allocations over one pass of the pages
+        tracemalloc.start()
+        for page in pages:
+            run_callback(callback, *page)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        latencies = []
+        t = time.perf_counter()
+        for _ in range(rounds):
+            for page in pages:
+                start = time.perf_counter()
+                run_callback(callback, *page)
+                latencies.append(time.perf_counter() - start)
+        elapsed = time.perf_counter() - t
+
+        report[name] = {
+            "pages": len(pages),
+            "pages_per_sec": round(len(latencies) / elapsed, 1),
+            "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+            "peak_kib": round(peak / 1024, 1),
+        }
+    return report
+
+
+def print_report(report: dict):
+    print(f"{'callback':<24}{'pages':>6}{'pages/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'peak KiB':>10}")
+    for name, r in report.items():
+        print(
+            f"{name:<24}{r['pages']:>6}{r['pages_per_sec']:>10}{r['p50_ms']:>10}"
+            f"{r['p99_ms']:>10}{r['peak_kib']:>10}"
+        )
+
+
+def regressions(report: dict, baseline: dict, tolerance: float) -> list:
+    slow = []
+    for name, r in report.items():
+        old = baseline.get(name)
+        if old and r["p50_ms"] > old["p50_ms"] * (1 + tolerance):
+            slow.append(f"{name}: p50 {old['p50_ms']}ms -> {r['p50_ms']}ms")
+    return slow
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=50)
+    parser.add_argument("--json", help="write the report to this file")
+    parser.add_argument("--baseline", help="report from an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    report = bench(args.rounds)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            slow = regressions(report, json.load(f), args.tolerance)
+        if slow:
+            raise SystemExit("parser regressions:\n" + "\n".join(slow))
@@ -0,0 +1,120 @@
+"""
+Compares NBAESPNSpider.new_player_stats against the original per-column regex extractor on
+the ESPN boxscore fixtures. Output must be identical, and rows/sec is reported for both.
+
+    python -m benchmarks.player_stats [--rounds 200]
+"""
+import argparse
+import glob
+import os
+import re
+import time
+from typing import List
+
+from scrapy.http import HtmlResponse
+
+from benchmarks import FIXTURE_DIR
+from game_crawlers.nba.espn_crawler import NBAESPNSpider
+from game_crawlers.nba.fields import Player, PlayerStats
+ROW_XPATHS = [
+    '//div[@class="col column-two gamepackage-home-wrap"]//tbody//tr',
+    '//div[@class="col column-one gamepackage-away-wrap"]//tbody//tr',
+]
+
+
+# legacy_player_stats is the extractor new_player_stats replaced, kept as the reference
+def legacy_player_stats(game_id: int, boxscore: List[str]) -> List[dict]:
+    name_re = r"id/(?P<pid>[0-9]+)/(?P<first>[a-z]+)-(?P<last>[a-z]+).*position\">(?P<pos>[A-Z]{1,2})"
+
+    players = list()
+    fields = PlayerStats().fields
+    for line in boxscore:
+        re_name = re.search(name_re, line)
+        if not re_name:
+            continue
+        player = Player(
+            player_id=re_name.group("pid"),
+            first_name=re_name.group("first"),
+            last_name=re_name.group("last"),
+            position=re_name.group("pos"),
+        )
+        p_stat_kwargs = {"player": dict(player), "game_id": game_id}
+        try:
+            ft_re = re.search(r"\"ft\">(?P<m>[0-9]{1,2})-(?P<a>[0-9]{1,2})", line)
+            x3p_re = re.search(r"\"3pt\">(?P<m>[0-9]{1,2})-(?P<a>[0-9]{1,2})", line)
+            fg_re = re.search(r"\"fg\">(?P<m>[0-9]{1,2})-(?P<a>[0-9]{1,2})", line)
+
+            p_stat_kwargs["fta"] = int(ft_re.group("a"))
+            p_stat_kwargs["ftm"] = int(ft_re.group("m"))
+            if p_stat_kwargs["fta"] != 0:
+                p_stat_kwargs["ft_per"] = int(ft_re.group("m")) / int(ft_re.group("a"))
+            else:
+                p_stat_kwargs["ft_per"] = 0
+
+            p_stat_kwargs["fga"] = int(fg_re.group("a"))
+            p_stat_kwargs["fgm"] = int(fg_re.group("m"))
+            if p_stat_kwargs["fga"] != 0:
+                p_stat_kwargs["fg_per"] = int(fg_re.group("m")) / int(fg_re.group("a"))
+            else:
+                p_stat_kwargs["fg_per"] = 0
+
+            p_stat_kwargs["x3pa"] = int(x3p_re.group("a"))
+            p_stat_kwargs["x3pm"] = int(x3p_re.group("m"))
+            if p_stat_kwargs["x3pa"] != 0:
+                p_stat_kwargs["x3p_per"] = int(x3p_re.group("m")) / int(x3p_re.group("a"))
+            else:
+                p_stat_kwargs["x3p_per"] = 0
+
+            for stat in ["min", "pts", "oreb", "dreb", "reb", "ast", "stl", "blk", "pf"]:
+                p_stat_kwargs[stat] = re.search(
+                    r"\"" + stat + r"\">{0,1}([0-9]{1,3})", line
+                ).group(1)
+            pm = re.search(r"\"plusminus\">\+{0,1}([0-9-]{1,3})", line).group(1)
+            p_stat_kwargs["plusminus"] = pm if (pm != "--") else 0
+        except AttributeError:
+            pass
+
+        ps = PlayerStats()
+        for k in fields:
+            if k not in ["player", "game_id"]:
+                ps[k] = p_stat_kwargs.get(k, 0)
+            else:
+                ps[k] = p_stat_kwargs.get(k, None)
+        players.append(dict(ps))
+    return players
+
+
+def load_rows() -> List[List[str]]:
+    tables = []
+    for path in sorted(glob.glob(os.path.join(FIXTURE_DIR, "espn", "boxscore_*.html"))):
+        with open(path, "rb") as f:
+            response = HtmlResponse(url=f"file://{path}", body=f.read(), encoding="utf-8")
+        for xpath in ROW_XPATHS:
+            tables.append(response.xpath(xpath).getall())
+    return tables
+
+
+def rows_per_sec(extract, tables: List[List[str]], rounds: int) -> float:
+    rows = 0
+    t = time.perf_counter()
+    for _ in range(rounds):
+        for table in tables:
+            rows += len(extract(1, table))
+    return rows / (time.perf_counter() - t)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    tables = load_rows()
+    for table in tables:
+        if legacy_player_stats(1, table) != NBAESPNSpider.new_player_stats(1, table):
+            raise SystemExit("new_player_stats output differs from the legacy extractor")
+    print(f"outputs identical over {sum(len(t) for t in tables)} rows")
+
+    before = rows_per_sec(legacy_player_stats, tables, args.rounds)
+    after = rows_per_sec(NBAESPNSpider.new_player_stats, tables, args.rounds)
+    print(f"legacy:  {before:,.0f} rows/sec")
+    print(f"current: {after:,.0f} rows/sec ({after / before:.1f}x)")
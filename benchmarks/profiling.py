@@ -0,0 +1,109 @@
+"""
+Crawls --games ESPN games from the fixture server with ProfilingMiddleware sampling one
+in --sample callbacks, lists the reports it wrote and prints the head of one. The game ids
+are put in a game id store on STORE_DATE, so every request carries its season in meta and
+every report must be filed under that season, none under unknown. Also times a profiled()
+function against the plain function with profiling off, which is the cost
+nbaDB.add_record pays on every call when nobody is profiling.
+
+    python -m benchmarks.profiling [--games 200] [--sample 5]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+from datetime import date
+
+from benchmarks.fixture_server import mock_handler, serve
+from db.profiling import profiled
+from game_crawlers.nba.id_store import GameIdStore
+from game_crawlers.nba.seasons import season_index
+
+# the date the crawled ids are stored on, in a season other than the fixture games'
+STORE_DATE = date(2005, 11, 1)
+
+
+def game_ids(games: int) -> list:
+    return [str(400000000 + i) for i in range(games)]
+
+
+def crawl(games: int, sample: int, out_dir: str, store_path: str):
+    from scrapy.crawler import CrawlerProcess
+
+    from game_crawlers.nba.espn_crawler import NBAESPNSpider
+
+    server = serve(handler=mock_handler(any_game=True))
+    process = CrawlerProcess(
+        {
+            "LOG_LEVEL": "ERROR",
+            "PROFILE_ENABLED": True,
+            "PROFILE_DIR": out_dir,
+            "PROFILE_SAMPLE": sample,
+            "PROFILE_TOP": 10,
+            "SPIDER_MIDDLEWARES": {"game_crawlers.nba.profiling.ProfilingMiddleware": 980},
+        }
+    )
+    process.crawl(
+        NBAESPNSpider,
+        ids=game_ids(games),
+        base_url=f"http://127.0.0.1:{server.server_port}",
+        id_store=store_path,
+    )
+    process.start()
+
+
+def add(a, b):
+    return a + b
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, default=200)
+    parser.add_argument("--sample", type=int, default=5)
+    parser.add_argument("--out", help=argparse.SUPPRESS)
+    parser.add_argument("--store", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.out:
+        crawl(args.games, args.sample, args.out, args.store)
+        sys.exit(0)
+
+    with tempfile.TemporaryDirectory() as tmp, tempfile.TemporaryDirectory() as store_dir:
+        store_path = os.path.join(store_dir, "game_ids.sqlite")
+        store = GameIdStore(store_path)
+        store.append(STORE_DATE, game_ids(args.games))
+        store.close()
+        season = season_index.season(STORE_DATE)
+        t = time.monotonic()
+        # a crawler process can only start the reactor once, so the crawl is its own process
+        subprocess.run(
+            [
+                sys.executable, "-m", "benchmarks.profiling",
+                "--games", str(args.games),
+                "--sample", str(args.sample),
+                "--out", tmp,
+                "--store", store_path,
+            ],
+            check=True,
+        )
+        print(f"crawl took {time.monotonic() - t:.1f}s")
+        reports = sorted(os.listdir(tmp))
+        other = [n for n in reports if n.rsplit(".", 2)[1] != season]
+        if other:
+            raise SystemExit(f"reports filed under a season other than {season}: {other}")
+        print(f"{len(reports)} report files, all under the stored season {season}:")
+        for name in reports:
+            print(f"  {name} ({os.path.getsize(os.path.join(tmp, name)):,} bytes)")
+        txt = [n for n in reports if n.endswith(".txt")]
+        if txt:
+            with open(os.path.join(tmp, txt[0])) as f:
+                print("\n" + "".join(f.readlines()[:20]))
+
+    n = 1000000
+    plain = min(timeit.repeat(lambda: add(1, 2), number=n, repeat=5))
+    wrapped = profiled("add")(add)
+    off = min(timeit.repeat(lambda: wrapped(1, 2), number=n, repeat=5))
+    print(f"profiled() with profiling off: {1e9 * (off - plain) / n:.0f} ns/call over the plain call")
@@ -0,0 +1,180 @@
+"""
+Compares the slot records the spiders now emit against the scrapy Item -> dict copies they
+replaced, on the games in the ESPN fixtures. Each game's three fragments are built from the
+same parsed values both ways, so regex parsing is left out, then joined in a
+GameJoinBuffer and mapped to rows by the nbaDB row mappers:
+
+  - memory per game: traced bytes held by the fragments of one joined game
+  - items/sec: Items or records built, joined and mapped to rows per second
+
+The rows mapped from both must be identical.
+
+    python -m benchmarks.records [--games 2000] [--rounds 20]
+"""
+import argparse
+import glob
+import os
+import re
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, List, Tuple
+
+from scrapy.http import HtmlResponse
+
+from benchmarks import FIXTURE_DIR
+from db.nba import nbaDB
+from game_crawlers.nba import fields, records
+from game_crawlers.nba.espn_crawler import NBAESPNSpider
+from game_crawlers.nba.join_buffer import GameJoinBuffer
+
+PAGES = {"game": "gamecast", "team_stats": "matchup", "player_stats": "boxscore"}
+CALLBACKS = {
+    "game": NBAESPNSpider.parse_game,
+    "team_stats": NBAESPNSpider.parse_teamstats,
+    "player_stats": NBAESPNSpider.parse_boxscore,
+}
+
+
+def load_games() -> List[dict]:
+    # parses each fixture game once and keeps its fragments as plain values
+    spider = NBAESPNSpider(ids=[])
+    games = []
+    for path in sorted(glob.glob(os.path.join(FIXTURE_DIR, "espn", "gamecast_*.html"))):
+        game_id = re.search(r"_([0-9]+)\.html$", path).group(1)
+        game = {}
+        for kind, page in PAGES.items():
+            page_path = os.path.join(FIXTURE_DIR, "espn", f"{page}_{game_id}.html")
+            with open(page_path, "rb") as f:
+                response = HtmlResponse(url=f"file://{page_path}", body=f.read(), encoding="utf-8")
+            game[kind] = plain(CALLBACKS[kind](spider, response, game_id)["data"])
+        games.append(game)
+    return games
+
+
+def plain(v):
+    if isinstance(v, records.SlotRecord):
+        return v.to_dict()
+    if isinstance(v, dict):
+        return {k: plain(x) for k, x in v.items()}
+    if isinstance(v, list):
+        return [plain(x) for x in v]
+    return v
+
+
+# build_* rebuild the fragments of a game from plain values, build_items the way the spiders
+# did before (Item, then dict(item) at every level) and build_records the way they do now
+def build_items(game: dict) -> dict:
+    def team_stats(ts):
+        return dict(fields.TeamStats(ts, team=dict(fields.Team(ts["team"]))))
+
+    def player_stats(ps):
+        return dict(fields.PlayerStats(ps, player=dict(fields.Player(ps["player"]))))
+
+    g = game["game"]
+    return {
+        "game": dict(
+            fields.Game(
+                g,
+                **{k: dict(fields.Record(g[k])) for k in g if k.endswith("record")},
+                line=dict(fields.Line(g["line"])),
+            )
+        ),
+        "team_stats": {k: team_stats(v) for k, v in game["team_stats"].items()},
+        "player_stats": {
+            k: [player_stats(ps) for ps in v] for k, v in game["player_stats"].items()
+        },
+    }
+
+
+def build_records(game: dict) -> dict:
+    def team_stats(ts):
+        return records.TeamStats(**dict(ts, team=records.Team(**ts["team"])))
+
+    def player_stats(ps):
+        return records.PlayerStats(**dict(ps, player=records.Player(**ps["player"])))
+
+    g = game["game"]
+    return {
+        "game": records.Game(
+            **dict(
+                g,
+                **{k: records.Record(**g[k]) for k in g if k.endswith("record")},
+                line=records.Line(**g["line"]),
+            )
+        ),
+        "team_stats": {k: team_stats(v) for k, v in game["team_stats"].items()},
+        "player_stats": {
+            k: [player_stats(ps) for ps in v] for k, v in game["player_stats"].items()
+        },
+    }
+
+
+def map_rows(record: dict) -> tuple:
+    team_data = record["team_stats"]
+    player_data = record["player_stats"]
+    home = team_data["home_stats"]["team"]["abbreviation"]
+    away = team_data["away_stats"]["team"]["abbreviation"]
+    return (
+        nbaDB.game_row(record),
+        nbaDB.team_stat_rows(team_data),
+        nbaDB.player_stat_rows(player_data, home, away),
+        nbaDB.player_rows(player_data),
+        nbaDB.team_rows(team_data),
+    )
+
+
+def items_per_game(game: dict) -> int:
+    # every Item or record built for the game, nested ones included
+    players = sum(len(v) for v in game["player_stats"].values())
+    return 6 + 4 + 2 * players
+
+
+def run(build: Callable, games: List[dict], n: int, spill_path: str) -> Tuple[float, list]:
+    buffer = GameJoinBuffer(spill_path)
+    rows = []
+    t = time.perf_counter()
+    for i in range(n):
+        game = games[i % len(games)]
+        fragments = build(game)
+        for kind in PAGES:
+            record = buffer.add(i, kind, fragments[kind])
+            if record is not None:
+                rows.append(map_rows(record))
+    elapsed = time.perf_counter() - t
+    buffer.close()
+    return elapsed, rows
+
+
+def bytes_per_game(build: Callable, games: List[dict], n: int) -> float:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    held = [build(games[i % len(games)]) for i in range(n)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del held
+    return (after - before) / n
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, default=2000)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    games = load_games()
+    for game in games:
+        if map_rows(build_items(game)) != map_rows(build_records(game)):
+            raise SystemExit("records map to different rows than the legacy dicts")
+    print(f"mapped rows identical over {len(games)} games")
+
+    items = sum(items_per_game(games[i % len(games)]) for i in range(args.games))
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, build in (("legacy dicts", build_items), ("records", build_records)):
+            best = min(
+                run(build, games, args.games, os.path.join(tmp, f"{name}-{r}.sqlite"))[0]
+                for r in range(args.rounds)
+            )
+            print(f"{name}:")
+            print(f"  {bytes_per_game(build, games, args.games):,.0f} bytes/game")
+            print(f"  {items / best:,.0f} items/sec ({args.games / best:,.0f} games/sec)")
@@ -0,0 +1,119 @@
+"""
+Crawls the fixture server's ESPN scoreboards with ESPNScoreboardSpider into a fresh
+GameIdStore and checks what it stored:
+
+  - the saved scoreboards each get their row and exactly the ids listed in EXPECTED;
+    2019-02-15 (the All-Star break) is stored as a day without games
+  - days without a saved page answer 404 and are left out, so they stay missing
+  - the ids read from the scoreboardData JSON, for pages without mobileScoreboardLink
+    links, are the same as the ids read from the links
+  - a second crawl with skip_existing only requests the days still missing
+
+    python -m benchmarks.scoreboard
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+from datetime import date
+
+from scrapy.http import HtmlResponse
+
+from benchmarks import FIXTURE_DIR
+from benchmarks.fixture_server import mock_handler, serve
+from game_crawlers.nba.id_store import GameIdStore
+from game_crawlers.nba.scoreboard_crawler import ESPNScoreboardSpider, parse_date
+
+EXPECTED = {
+    date(2005, 11, 1): ["400827888", "400827889", "400827890"],
+    date(2019, 1, 23): [str(i) for i in range(401071110, 401071120)],
+    date(2019, 2, 15): [],
+}
+# days around the saved ones the server has no page for
+UNSAVED = [date(2005, 11, 2), date(2019, 1, 22), date(2019, 1, 24)]
+
+
+def crawl(port: int, store_path: str, dates: list):
+    from scrapy.crawler import CrawlerProcess
+
+    process = CrawlerProcess({"LOG_LEVEL": "ERROR", "RETRY_ENABLED": False})
+    process.crawl(
+        ESPNScoreboardSpider,
+        dates=dates,
+        base_url=f"http://127.0.0.1:{port}/nba/scoreboard/_/date/",
+        store_path=store_path,
+    )
+    process.start()
+
+
+def run_crawl(port: int, store_path: str, dates: list):
+    # a crawler process can only start the reactor once, so each crawl is its own process
+    subprocess.run(
+        [sys.executable, "-m", "benchmarks.scoreboard", "--run", "--port", str(port),
+         "--store", store_path, *[d.isoformat() for d in dates]],
+        check=True,
+    )
+
+
+def check_json_ids():
+    # the same page with its links renamed, so only the embedded JSON is left to read
+    with open(os.path.join(FIXTURE_DIR, "espn", "scoreboard_20190123.html"), "rb") as f:
+        body = f.read().replace(b"mobileScoreboardLink", b"scoreboardLink")
+    response = HtmlResponse(url="http://127.0.0.1/nba/scoreboard/_/date/20190123", body=body)
+    ids = ESPNScoreboardSpider.game_ids(response)
+    if ids != EXPECTED[date(2019, 1, 23)]:
+        raise SystemExit(f"scoreboardData ids {ids} differ from the links")
+
+
+def check_store(store_path: str):
+    store = GameIdStore(store_path)
+    try:
+        for d, expected in EXPECTED.items():
+            if not store.has_date(d):
+                raise SystemExit(f"{d} has no scoreboard row")
+            ids = store.ids_between(d, d)
+            if sorted(ids) != sorted(expected):
+                raise SystemExit(f"{d}: stored {ids}, expected {expected}")
+        if store.missing_dates(UNSAVED) != UNSAVED:
+            raise SystemExit(f"days without a page were stored: {UNSAVED}")
+        return store.stats()
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--run", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--store", help=argparse.SUPPRESS)
+    parser.add_argument("dates", nargs="*", type=parse_date, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        crawl(args.port, args.store, args.dates)
+        sys.exit(0)
+
+    check_json_ids()
+    handler = mock_handler()
+    server = serve(handler=handler)
+    dates = sorted(list(EXPECTED) + UNSAVED)
+    with tempfile.TemporaryDirectory() as tmp:
+        store_path = os.path.join(tmp, "game_ids.sqlite")
+        try:
+            run_crawl(server.server_port, store_path, dates)
+            first = handler.requests
+            check_store(store_path)
+            run_crawl(server.server_port, store_path, dates)
+            second = handler.requests - first
+        finally:
+            server.shutdown()
+        stats = check_store(store_path)
+    if first != len(dates):
+        raise SystemExit(f"the first crawl made {first} requests for {len(dates)} dates")
+    if second != len(UNSAVED):
+        raise SystemExit(f"the second crawl made {second} requests, {len(UNSAVED)} days were missing")
+    print(
+        f"{len(dates)} dates crawled: {stats['dates']} stored with {stats['game_ids']} ids, "
+        f"{len(UNSAVED)} without a page left missing; the second crawl requested only those"
+    )
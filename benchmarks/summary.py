@@ -0,0 +1,82 @@
+"""
+Checks NBAESPNSpider's summary mode against the three page mode on the ESPN fixtures. Each
+summary_<id>.json must map to exactly the rows the gamecast, boxscore and matchup pages of
+the same game map to, through the same nbaDB row mappers. Parse time per game is reported
+for both modes, alongside the requests each makes.
+
+    python -m benchmarks.summary [--rounds 200]
+"""
+import argparse
+import glob
+import os
+import re
+import time
+from typing import List
+
+from scrapy.http import HtmlResponse, TextResponse
+
+from benchmarks import FIXTURE_DIR
+from benchmarks.records import map_rows
+from game_crawlers.nba.espn_crawler import NBAESPNSpider
+
+PAGES = {"game": "gamecast", "team_stats": "matchup", "player_stats": "boxscore"}
+
+
+def load(game_id: str) -> dict:
+    responses = {}
+    for kind, page in dict(PAGES, summary="summary").items():
+        ext = "json" if kind == "summary" else "html"
+        path = os.path.join(FIXTURE_DIR, "espn", f"{page}_{game_id}.{ext}")
+        cls = TextResponse if kind == "summary" else HtmlResponse
+        with open(path, "rb") as f:
+            responses[kind] = cls(url=f"file://{path}", body=f.read(), encoding="utf-8")
+    return responses
+
+
+def from_pages(spider: NBAESPNSpider, game_id: str, responses: dict) -> dict:
+    callbacks = {
+        "game": spider.parse_game,
+        "team_stats": spider.parse_teamstats,
+        "player_stats": spider.parse_boxscore,
+    }
+    return {kind: callbacks[kind](responses[kind], game_id)["data"] for kind in PAGES}
+
+
+def from_summary(spider: NBAESPNSpider, game_id: str, responses: dict) -> dict:
+    item = spider.parse_summary(responses["summary"], game_id)
+    assert item["type"] == "game_summary" and item["game_id"] == game_id
+    return item["data"]
+
+
+def game_ids() -> List[str]:
+    paths = glob.glob(os.path.join(FIXTURE_DIR, "espn", "summary_*.json"))
+    return sorted(re.search(r"summary_([0-9]+)\.json$", p).group(1) for p in paths)
+
+
+def ms_per_game(parse, spider, games: dict, rounds: int) -> float:
+    t = time.perf_counter()
+    for _ in range(rounds):
+        for game_id, responses in games.items():
+            parse(spider, game_id, responses)
+    return (time.perf_counter() - t) * 1000 / (rounds * len(games))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    spider = NBAESPNSpider(ids=[], summary=True)
+    games = {g: load(g) for g in game_ids()}
+    for game_id, responses in games.items():
+        pages = map_rows(from_pages(spider, game_id, responses))
+        summary = map_rows(from_summary(spider, game_id, responses))
+        for name, a, b in zip(("game", "team_stats", "player_stats", "players", "teams"), pages, summary):
+            if a != b:
+                raise SystemExit(f"{game_id}: summary {name} rows differ from the pages\n{a}\n{b}")
+    print(f"summary rows identical to the page rows over {len(games)} games")
+
+    pages_ms = ms_per_game(from_pages, spider, games, args.rounds)
+    summary_ms = ms_per_game(from_summary, spider, games, args.rounds)
+    print(f"pages:   3 requests/game, {pages_ms:.2f} ms/game parse")
+    print(f"summary: 1 request/game,  {summary_ms:.2f} ms/game parse")
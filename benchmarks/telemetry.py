@@ -0,0 +1,115 @@
+"""
+Crawls --games ESPN games from the fixture server into a DBWriterPipeline whose database
+is replaced by a sleep of --commit-delay seconds per game, with CrawlTelemetry on, and
+prints what the exported snapshot says about download, parse and commit time. The same
+crawl is run without telemetry to report its overhead.
+
+    python -m benchmarks.telemetry [--games 300] [--commit-delay 0.005]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.fixture_server import mock_handler, serve
+from game_crawlers.nba.pipelines import DBWriterPipeline
+
+
+class SleepWriterPipeline(DBWriterPipeline):
+    def open_writer(self, spider):
+        self.commit_delay = spider.settings.getfloat("PROBE_COMMIT_DELAY")
+
+    def write_batch(self, records: list) -> int:
+        time.sleep(self.commit_delay * len(records))
+        return len(records)
+
+    def commit(self):
+        pass
+
+    def close_writer(self, spider):
+        pass
+
+
+def crawl(games: int, commit_delay: float, telemetry: bool, out_dir: str):
+    from scrapy.crawler import CrawlerProcess
+
+    from game_crawlers.nba.espn_crawler import NBAESPNSpider
+
+    server = serve(handler=mock_handler(latency=0.02, any_game=True))
+    process = CrawlerProcess(
+        {
+            "LOG_LEVEL": "ERROR",
+            "CONCURRENT_REQUESTS": 16,
+            "CONCURRENT_REQUESTS_PER_DOMAIN": 16,
+            "DB_COMMIT_GAMES": 25,
+            "PROBE_COMMIT_DELAY": commit_delay,
+            "JOIN_SPILL_PATH": os.path.join(out_dir, "spill.sqlite"),
+            "ITEM_PIPELINES": {"benchmarks.telemetry.SleepWriterPipeline": 100},
+            "TELEMETRY_ENABLED": telemetry,
+            "TELEMETRY_DIR": out_dir,
+            "EXTENSIONS": {"game_crawlers.nba.telemetry.CrawlTelemetry": 500},
+            "SPIDER_MIDDLEWARES": {"game_crawlers.nba.telemetry.ParseTimingMiddleware": 990},
+        }
+    )
+    process.crawl(
+        NBAESPNSpider,
+        ids=[str(400000000 + i) for i in range(games)],
+        base_url=f"http://127.0.0.1:{server.server_port}",
+    )
+    t = time.monotonic()
+    process.start()
+    print(json.dumps({"elapsed": time.monotonic() - t}))
+
+
+def run(games: int, commit_delay: float, telemetry: bool, out_dir: str) -> float:
+    # a crawler process can only start the reactor once, so each run is its own process
+    out = subprocess.run(
+        [
+            sys.executable, "-m", "benchmarks.telemetry", "--run",
+            "--games", str(games),
+            "--commit-delay", str(commit_delay),
+            "--out", out_dir,
+        ] + (["--telemetry"] if telemetry else []),
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])["elapsed"]
+
+
+def ms(h: dict) -> str:
+    return f"mean {1000 * (h['mean'] or 0):.2f} ms, max {1000 * h['max']:.2f} ms over {h['count']}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, default=300)
+    parser.add_argument("--commit-delay", type=float, default=0.005)
+    parser.add_argument("--run", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--telemetry", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--out", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        crawl(args.games, args.commit_delay, args.telemetry, args.out)
+        sys.exit(0)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        plain = run(args.games, args.commit_delay, False, tmp)
+        elapsed = run(args.games, args.commit_delay, True, tmp)
+        with open(os.path.join(tmp, "nba_boxscores.json")) as f:
+            snapshot = json.load(f)
+        with open(os.path.join(tmp, "nba_boxscores.prom")) as f:
+            prom = f.read().splitlines()
+
+    print(f"{args.games} games: {plain:.2f}s without telemetry, {elapsed:.2f}s with")
+    print(f"  items/sec:    {snapshot['items_per_second']:,.0f} ({snapshot['items']} items)")
+    print(f"  download:     {ms(snapshot['download_seconds'])}")
+    for callback, h in snapshot["parse_seconds"].items():
+        print(f"  {callback + ':':<38} {ms(h)}")
+    print(f"  db flush:     {ms(snapshot['db_flush_seconds'])}")
+    print(f"  item latency: {ms(snapshot['item_latency_seconds'])}")
+    print(f"  {snapshot['games_committed']} games committed, {len(prom)} lines in nba_boxscores.prom")
@@ -0,0 +1,118 @@
+"""
+Crawls --games ESPN games (three pages each) from a rate limited mock of the fixture
+server and compares the crawl settings nba_scraper.py used (DOWNLOAD_DELAY = 1 with
+AutoThrottle) against AdaptiveConcurrencyMiddleware. The mock allows --rate requests/sec
+with bursts of --burst, answers 429 with Retry-After past that, and slows down as more
+requests are in flight.
+
+Reported per run: wall time, pages/sec, 429s served, games lost after retries and the
+controller's decisions and final concurrency/delay.
+
+    python -m benchmarks.throttle [--games 40] [--rate 12] [--burst 4]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from benchmarks.fixture_server import mock_handler, serve
+
+HOST = "127.0.0.1"
+
+RUNS = {
+    "before": {
+        "DOWNLOAD_DELAY": 1,
+        "AUTOTHROTTLE_ENABLED": True,
+    },
+    "adaptive": {
+        "DOWNLOAD_DELAY": 0,
+        "AUTOTHROTTLE_ENABLED": False,
+        "ADAPTIVE_CONCURRENCY_ENABLED": True,
+        "ADAPTIVE_CONCURRENCY_HOSTS": {HOST: {"min": 1, "max": 16, "start": 2, "delay": 0.0}},
+        "ADAPTIVE_CONCURRENCY_TARGET_LATENCY": 1.0,
+        "DOWNLOADER_MIDDLEWARES": {
+            "game_crawlers.nba.throttle.AdaptiveConcurrencyMiddleware": 950,
+        },
+    },
+}
+
+
+def crawl(run: str, games: int, rate: float, burst: int, retry_after: int):
+    from scrapy.crawler import CrawlerProcess
+
+    from game_crawlers.nba.espn_crawler import NBAESPNSpider
+
+    handler = mock_handler(
+        latency=0.05, load_latency=0.02, rate=rate, burst=burst, retry_after=retry_after,
+        any_game=True,
+    )
+    server = serve(handler=handler)
+    settings = {
+        "LOG_LEVEL": os.environ.get("LOG_LEVEL", "ERROR"),
+        "CONCURRENT_REQUESTS": 32,
+        "CONCURRENT_REQUESTS_PER_DOMAIN": 8,
+        "RETRY_TIMES": 5,
+    }
+    settings.update(RUNS[run])
+    process = CrawlerProcess(settings)
+    crawler = process.create_crawler(NBAESPNSpider)
+    process.crawl(
+        crawler,
+        ids=[str(400000000 + i) for i in range(games)],
+        base_url=f"http://{HOST}:{server.server_port}",
+    )
+    t = time.monotonic()
+    process.start()
+    elapsed = time.monotonic() - t
+
+    stats = crawler.stats.get_stats()
+    print(
+        json.dumps(
+            {
+                "elapsed": elapsed,
+                "pages": stats.get("response_received_count", 0),
+                "served": handler.requests,
+                "limited": handler.limited,
+                "incomplete": stats.get("games/incomplete", 0),
+                "throttle": {
+                    k.split("/")[-1]: v for k, v in stats.items() if k.startswith(f"throttle/{HOST}/")
+                },
+            }
+        )
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, default=40)
+    parser.add_argument("--rate", type=float, default=12)
+    parser.add_argument("--burst", type=int, default=4)
+    parser.add_argument("--retry-after", type=int, default=2)
+    parser.add_argument("--run", choices=list(RUNS), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        crawl(args.run, args.games, args.rate, args.burst, args.retry_after)
+        sys.exit(0)
+
+    # a crawler process can only start the reactor once, so each run is its own process
+    for run in RUNS:
+        out = subprocess.run(
+            [
+                sys.executable, "-m", "benchmarks.throttle", "--run", run,
+                "--games", str(args.games),
+                "--rate", str(args.rate),
+                "--burst", str(args.burst),
+                "--retry-after", str(args.retry_after),
+            ],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        r = json.loads(out.strip().splitlines()[-1])
+        print(f"{run}: {r['pages']} pages in {r['elapsed']:.1f}s ({r['pages'] / r['elapsed']:.1f} pages/sec)")
+        print(f"  {r['served']} requests served, {r['limited']} answered 429, {r['incomplete']} games incomplete")
+        if r["throttle"]:
+            print(f"  controller: {r['throttle']}")
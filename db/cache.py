@@ -0,0 +1,45 @@
+from collections import OrderedDict
+from typing import Hashable
+
+
+class EntityCache:
+    """
+    Bounded LRU set of primary keys that are known to exist in the database. nbaDB uses it
+    to skip the existence query for players and teams it has already seen or written.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._keys = OrderedDict()
+
+    def __contains__(self, key: Hashable) -> bool:
+        if key in self._keys:
+            self._keys.move_to_end(key)
+            self.hits += 1
+            return True
+        self.misses += 1
+        return False
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def add(self, key: Hashable):
+        self._keys[key] = None
+        self._keys.move_to_end(key)
+        if len(self._keys) > self.maxsize:
+            self._keys.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self._keys.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._keys),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,123 @@
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+# One engine per database for the whole process, so the pool, and the connections in it, are
+# shared by every nbaDB, pipeline and script instead of each building its own engine and
+# paying for new connections. Everything is configured from the environment:
+#
+#     DATABASE_URL          full SQLAlchemy URL, e.g. sqlite:///bench.sqlite for local
+#                           benchmarking. Without it the PostgreSQL database below is used.
+#     dbName, dbPass        PostgreSQL user and password
+#     DB_HOST, DB_PORT      default localhost, 5432
+#     DB_DATABASE           default nba_stats
+#     DB_POOL_SIZE          connections kept open, default 5
+#     DB_MAX_OVERFLOW       extra connections opened under load, default 5
+#     DB_POOL_RECYCLE       seconds before a connection is replaced, default 1800
+#     DB_POOL_PRE_PING      check connections as they are checked out, default 1
+#     DB_STATEMENT_TIMEOUT  milliseconds before PostgreSQL cancels a statement, 0 (default)
+#                           for no limit
+#     DB_ECHO               log every statement, default 0
+#
+# SQLite has no pool settings or statement timeout: a file database gets a connection per
+# session, and sqlite:// (in memory) one connection shared by every session, so all of them
+# see the same tables.
+
+_engines: Dict[Tuple[int, str], Engine] = {}
+_sessions: Dict[Engine, sessionmaker] = {}
+_lock = threading.Lock()
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.environ.get(name, default))
+
+
+def database_url(user: Optional[str] = None, password: Optional[str] = None) -> str:
+    # the configured database, or the local PostgreSQL one as user with password
+    if user is None and password is None and os.environ.get("DATABASE_URL"):
+        return os.environ["DATABASE_URL"]
+    user = user if user is not None else os.environ["dbName"]
+    password = password if password is not None else os.environ["dbPass"]
+    host = os.environ.get("DB_HOST", "localhost")
+    port = os.environ.get("DB_PORT", "5432")
+    database = os.environ.get("DB_DATABASE", "nba_stats")
+    return f"postgresql://{user}:{password}@{host}:{port}/{database}"
+
+
+def _create(url: str) -> Engine:
+    echo = bool(_env_int("DB_ECHO", 0))
+    if make_url(url).get_backend_name() == "sqlite":
+        # sessions are handed to the pipeline's writer thread, so they must not be pinned
+        # to the thread that connected, and parallel loaders wait for each other's writes
+        args = {"check_same_thread": False, "timeout": 60}
+        if make_url(url).database in (None, "", ":memory:"):
+            return create_engine(url, echo=echo, connect_args=args, poolclass=StaticPool)
+        return create_engine(url, echo=echo, connect_args=args)
+
+    args = {}
+    timeout = _env_int("DB_STATEMENT_TIMEOUT", 0)
+    if timeout > 0:
+        args["options"] = f"-c statement_timeout={timeout}"
+    return create_engine(
+        url,
+        echo=echo,
+        connect_args=args,
+        pool_size=_env_int("DB_POOL_SIZE", 5),
+        max_overflow=_env_int("DB_MAX_OVERFLOW", 5),
+        pool_recycle=_env_int("DB_POOL_RECYCLE", 1800),
+        pool_pre_ping=bool(_env_int("DB_POOL_PRE_PING", 1)),
+    )
+
+
+def get_engine(url: Optional[str] = None) -> Engine:
+    # the process's engine for url, the configured database by default. Engines are kept
+    # per process id: a forked child must open its own connections, and the parent's engine
+    # stays referenced so the child never closes the sockets it shares with the parent.
+    url = url or database_url()
+    key = (os.getpid(), url)
+    with _lock:
+        engine = _engines.get(key)
+        if engine is None:
+            engine = _engines[key] = _create(url)
+        return engine
+
+
+def new_session(engine: Optional[Engine] = None) -> Session:
+    engine = engine or get_engine()
+    with _lock:
+        factory = _sessions.get(engine)
+        if factory is None:
+            factory = _sessions[engine] = sessionmaker(bind=engine)
+    return factory()
+
+
+@contextmanager
+def session_scope(engine: Optional[Engine] = None):
+    # a session for one unit of work: committed if the block succeeds, rolled back if it
+    # raises, and closed either way so its connection goes back to the pool
+    session = new_session(engine)
+    try:
+        yield session
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+def dispose():
+    # closes the pooled connections of this process's engines, for scripts that are done
+    # with the database but keep running
+    pid = os.getpid()
+    with _lock:
+        for (owner, _), engine in _engines.items():
+            if owner == pid:
+                engine.dispose()
@@ -0,0 +1,254 @@
+import argparse
+import json
+import os
+from typing import Dict, Iterable, List
+
+import numpy as np
+from sqlalchemy import Boolean, Date, Float, Integer, select
+
+from db import nba
+
+# sentinel for a missing value in integer and key columns, float columns use NaN
+NULL_INT = np.iinfo(np.int32).min
+NULL_KEY = -1
+NULL_BOOL = -1
+
+# games written per database round trip by export_season
+EXPORT_CHUNK_GAMES = 500
+
+TABLES = {
+    "games": nba.Game.__table__,
+    "team_stats": nba.TeamStat.__table__,
+    "player_stats": nba.PlayerStat.__table__,
+}
+# surrogate keys and per season constants are not exported
+SKIP_COLUMNS = {"games": {"season"}, "team_stats": {"id"}, "player_stats": {"id"}}
+# string and id columns stored as int32 codes into a per season dictionary
+KEY_COLUMNS = {"team_abbr": "teams", "favorite": "teams", "player_id": "players"}
+GAME_ID_COLUMNS = {"id", "game_id"}
+
+
+def column_dtype(name: str, column) -> str:
+    if name in KEY_COLUMNS:
+        return "<i4"
+    if name in GAME_ID_COLUMNS:
+        return "<i8"
+    if isinstance(column.type, Boolean):
+        return "i1"
+    if isinstance(column.type, Integer):
+        return "<i4"
+    if isinstance(column.type, Float):
+        return "<f4"
+    if isinstance(column.type, Date):
+        return "<M8[D]"
+    raise ValueError(f"no export type for column {name} ({column.type})")
+
+
+def _to_int(v):
+    if v is None or v == "":
+        return NULL_INT
+    return int(float(v))
+
+
+def _to_float(v):
+    if v is None or v == "":
+        return np.nan
+    return float(v)
+
+
+def _to_bool(v):
+    if v is None:
+        return NULL_BOOL
+    return 1 if v else 0
+
+
+class SeasonExport:
+    """
+    Columnar export of one season. Every column of the games, team_stats and player_stats
+    tables is a raw little endian array in <root>/<season>/<table>/<column>.bin, team and
+    player keys are int32 codes into keys.json and manifest.json records the dtypes, the row
+    count of each table and the games exported so far.
+
+    Games are appended without rewriting what is already on disk: column files are only
+    ever extended and the manifest is replaced last, so it is the commit point. Bytes past
+    the manifest row count, left by an interrupted append, are ignored by readers and
+    truncated by the next append. One writer per season at a time.
+
+        export = SeasonExport("exports", "18-19")
+        pts = export.column("team_stats", "pts")       # numpy.memmap, no copy
+        teams = export.decode("team_stats", "team_abbr")
+    """
+
+    def __init__(self, root: str, season: str):
+        self.season = season
+        self.path = os.path.join(root, season)
+        self.manifest_path = os.path.join(self.path, "manifest.json")
+        self.keys_path = os.path.join(self.path, "keys.json")
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as f:
+                self.manifest = json.load(f)
+        else:
+            self.manifest = {
+                "season": season,
+                "tables": {
+                    table: {
+                        "rows": 0,
+                        "columns": {
+                            c.name: column_dtype(c.name, c)
+                            for c in t.columns
+                            if c.name not in SKIP_COLUMNS[table]
+                        },
+                    }
+                    for table, t in TABLES.items()
+                },
+                "games": [],
+            }
+        self.keys = {"teams": [], "players": []}
+        if os.path.exists(self.keys_path):
+            with open(self.keys_path) as f:
+                self.keys = json.load(f)
+        self.codes = {k: {v: i for i, v in enumerate(vs)} for k, vs in self.keys.items()}
+        self.games = set(self.manifest["games"])
+
+    def _encode_key(self, dictionary: str, v) -> int:
+        if v is None or v == "":
+            return NULL_KEY
+        v = str(v)
+        codes = self.codes[dictionary]
+        code = codes.get(v)
+        if code is None:
+            code = codes[v] = len(self.keys[dictionary])
+            self.keys[dictionary].append(v)
+        return code
+
+    def _encode(self, name: str, dtype: str, values: list) -> np.ndarray:
+        if name in KEY_COLUMNS:
+            return np.array([self._encode_key(KEY_COLUMNS[name], v) for v in values], dtype)
+        if dtype == "<M8[D]":
+            return np.array(values, dtype)
+        if dtype == "<f4":
+            return np.array([_to_float(v) for v in values], dtype)
+        if dtype == "i1":
+            return np.array([_to_bool(v) for v in values], dtype)
+        if name in GAME_ID_COLUMNS:
+            return np.array([int(v) for v in values], dtype)
+        return np.array([_to_int(v) for v in values], dtype)
+
+    def append(self, games: List[dict], team_stats: List[dict], player_stats: List[dict]) -> int:
+        # appends the rows of games not exported yet, returns the number of new games
+        new = {str(g["id"]) for g in games} - self.games
+        if not new:
+            return 0
+        rows = {
+            "games": [g for g in games if str(g["id"]) in new],
+            "team_stats": [t for t in team_stats if str(t["game_id"]) in new],
+            "player_stats": [p for p in player_stats if str(p["game_id"]) in new],
+        }
+        for table, values in rows.items():
+            self._append_table(table, values)
+
+        self._write_json(self.keys_path, self.keys)
+        self.games.update(new)
+        self.manifest["games"].extend(sorted(new))
+        for table, values in rows.items():
+            self.manifest["tables"][table]["rows"] += len(values)
+        self._write_json(self.manifest_path, self.manifest)
+        return len(new)
+
+    def _append_table(self, table: str, values: List[dict]):
+        meta = self.manifest["tables"][table]
+        table_dir = os.path.join(self.path, table)
+        os.makedirs(table_dir, exist_ok=True)
+        for name, dtype in meta["columns"].items():
+            path = os.path.join(table_dir, f"{name}.bin")
+            committed = meta["rows"] * np.dtype(dtype).itemsize
+            with open(path, "ab") as f:
+                f.truncate(committed)
+                if values:
+                    f.write(self._encode(name, dtype, [v.get(name) for v in values]).tobytes())
+
+    @staticmethod
+    def _write_json(path: str, data: dict):
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+
+    def rows(self, table: str) -> int:
+        return self.manifest["tables"][table]["rows"]
+
+    def column(self, table: str, name: str) -> np.ndarray:
+        meta = self.manifest["tables"][table]
+        dtype = np.dtype(meta["columns"][name])
+        if meta["rows"] == 0:
+            return np.empty(0, dtype)
+        path = os.path.join(self.path, table, f"{name}.bin")
+        return np.memmap(path, dtype=dtype, mode="r", shape=(meta["rows"],))
+
+    def table(self, table: str) -> Dict[str, np.ndarray]:
+        return {name: self.column(table, name) for name in self.manifest["tables"][table]["columns"]}
+
+    def decode(self, table: str, name: str) -> np.ndarray:
+        # maps a key column back to its team abbreviations or player ids, None where missing
+        keys = np.array(self.keys[KEY_COLUMNS[name]] + [None], dtype=object)
+        return keys[self.column(table, name)]
+
+
+def export_season(db: nba.nbaDB, root: str, season: str, chunk_games: int = EXPORT_CHUNK_GAMES) -> int:
+    # exports the games of season that are not in the export yet, chunk_games at a time,
+    # reading rows with core selects rather than ORM objects. Returns the games added.
+    export = SeasonExport(root, season)
+    conn = db.session.connection()
+    games_t, team_t, player_t = TABLES["games"], TABLES["team_stats"], TABLES["player_stats"]
+    ids = [
+        r[0]
+        for r in conn.execute(
+            select([games_t.c.id]).where(games_t.c.season == season).order_by(games_t.c.date, games_t.c.id)
+        )
+        if str(r[0]) not in export.games
+    ]
+    added = 0
+    for i in range(0, len(ids), chunk_games):
+        chunk = ids[i : i + chunk_games]
+        games = [dict(r) for r in conn.execute(select([games_t]).where(games_t.c.id.in_(chunk)))]
+        team_stats = [
+            dict(r) for r in conn.execute(select([team_t]).where(team_t.c.game_id.in_(chunk)))
+        ]
+        player_stats = [
+            dict(r) for r in conn.execute(select([player_t]).where(player_t.c.game_id.in_(chunk)))
+        ]
+        games.sort(key=lambda g: (g["date"], g["id"]))
+        added += export.append(games, team_stats, player_stats)
+    return added
+
+
+def record_rows(records: Iterable[dict]) -> Dict[str, tuple]:
+    # groups pipeline records by season into (games, team_stats, player_stats) rows, using
+    # the same row mappers as the database writers
+    seasons = {}
+    for record in records:
+        team_data = record.get("team_stats")
+        player_data = record.get("player_stats")
+        game = nba.nbaDB.game_row(record)
+        games, team_stats, player_stats = seasons.setdefault(game["season"], ([], [], []))
+        games.append(game)
+        team_stats.extend(nba.nbaDB.team_stat_rows(team_data))
+        player_stats.extend(
+            nba.nbaDB.player_stat_rows(
+                player_data,
+                team_data.get("home_stats", {}).get("team", {}).get("abbreviation", ""),
+                team_data.get("away_stats", {}).get("team", {}).get("abbreviation", ""),
+            )
+        )
+    return seasons
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="export seasons to columnar numpy files")
+    parser.add_argument("--season", action="append", required=True, help="season to export, e.g. 05-06")
+    parser.add_argument("--out", default="exports")
+    args = parser.parse_args()
+
+    db = nba.nbaDB()
+    for season in args.season:
+        print(f"{season}: exported {export_season(db, args.out, season)} new games")
@@ -0,0 +1,193 @@
+import argparse
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+import traceback
+from collections import deque
+from typing import Dict, List, Tuple
+
+from db import nba
+from db.engine import get_engine
+from game_crawlers.nba.join_buffer import GameJoinBuffer
+from game_crawlers.nba.records import json_default
+
+# the nbaDB a loader worker process writes with
+_db = None
+
+
+def _open_worker():
+    global _db
+    _db = nba.nbaDB()
+    _db.warm_cache()
+
+
+def load_batch(records: List[dict]) -> Tuple[int, int]:
+    # runs in a loader worker: writes one batch of joined games in a transaction of its own,
+    # the stats tables with COPY on PostgreSQL. Returns (games, rows written).
+    try:
+        rows = _db.add_records(records, use_copy=True)
+        _db.commit()
+    except Exception:
+        _db.rollback()
+        # database exceptions do not always survive pickling back to the loader
+        raise RuntimeError(f"batch of {len(records)} games failed:\n{traceback.format_exc()}")
+    return len(records), rows
+
+
+class JsonlLoader:
+    """
+    Loads JSONL item files, as JsonWriterPipeline writes them, into the database. Files are
+    streamed a line at a time and the game, team_stats and player_stats fragments are joined
+    in a GameJoinBuffer, the way DBWriterPipeline joins them during a crawl. Every
+    batch_games joined games go to a pool of worker processes. Each worker writes its batch
+    with nbaDB.add_records, which uses ON CONFLICT for the games, players and teams and COPY
+    for the stats tables.
+
+    Every checkpoint_games games, and at the end of each file, the loader waits for the
+    batches in flight and then records in the checkpoint file how far into each file it has
+    loaded, together with the fragments of games not yet complete. A load that stops is
+    resumed from there, mid-file. add_records skips games already in the database, so
+    batches that were in flight when the load stopped are written again without duplicating
+    rows. A last line without a newline is taken to be still being written and is left for
+    the next load.
+    """
+
+    def __init__(self, checkpoint_path: str, workers: int = 4, batch_games: int = 500,
+                 checkpoint_games: int = 10000):
+        self.checkpoint_path = checkpoint_path
+        self.workers = max(1, workers)
+        self.batch_games = batch_games
+        self.checkpoint_games = checkpoint_games
+        self.state = self.read_checkpoint()
+        self.stats = dict(lines=0, skipped=0, bad_lines=0, games=0, rows=0, batches=0)
+
+        self.pool = None
+        self.in_flight = deque()
+        self.batch: List[dict] = []
+        self.since_checkpoint = 0
+
+    def read_checkpoint(self) -> dict:
+        if os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path) as f:
+                return json.load(f)
+        return {"files": {}, "partial": {}, "games": 0, "rows": 0}
+
+    def write_checkpoint(self, buffer: GameJoinBuffer):
+        self.state["partial"] = dict(buffer.partial())
+        tmp = f"{self.checkpoint_path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.state, f, default=json_default)
+        os.replace(tmp, self.checkpoint_path)
+
+    def load(self, paths: List[str]) -> Dict[str, int]:
+        t = time.monotonic()
+        spill_fd, spill_path = tempfile.mkstemp(suffix=".sqlite", prefix="load_spill_")
+        os.close(spill_fd)
+        buffer = GameJoinBuffer(spill_path)
+        for game_id, fragments in self.state["partial"].items():
+            for kind, data in fragments.items():
+                buffer.add(game_id, kind, data)
+        # a pool whose workers cannot connect would restart them forever, fail here instead
+        get_engine().connect().close()
+        ctx = multiprocessing.get_context("spawn")
+        try:
+            with ctx.Pool(self.workers, initializer=_open_worker) as self.pool:
+                for path in paths:
+                    self.load_file(path, buffer)
+                self.pool.close()
+                self.pool.join()
+        finally:
+            buffer.close()
+            os.remove(spill_path)
+        self.stats["incomplete_games"] = len(self.state["partial"])
+        self.stats["seconds"] = round(time.monotonic() - t, 3)
+        return self.stats
+
+    def load_file(self, path: str, buffer: GameJoinBuffer):
+        # loads path from where the last load of it stopped, so a file that has grown since
+        # only has its new lines read
+        key = os.path.abspath(path)
+        offset = self.state["files"].get(key, 0)
+        if os.path.getsize(path) < offset:
+            print(f"{path} is shorter than when it was last loaded, loading it from the start")
+            offset = 0
+        with open(path, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                self.add_line(line, buffer)
+                offset = f.tell()
+                if self.since_checkpoint >= self.checkpoint_games:
+                    self.drain()
+                    self.state["files"][key] = offset
+                    self.write_checkpoint(buffer)
+        self.drain()
+        self.state["files"][key] = offset
+        self.write_checkpoint(buffer)
+
+    def add_line(self, line: bytes, buffer: GameJoinBuffer):
+        self.stats["lines"] += 1
+        try:
+            item = json.loads(line)
+        except ValueError:
+            self.stats["bad_lines"] += 1
+            return
+        kind = item.get("type")
+        if kind == "game_summary":
+            # summary items already hold the whole game
+            self.add_game(item.get("data"))
+        elif kind in GameJoinBuffer.FIELDS:
+            record = buffer.add(item.get("game_id"), kind, item.get("data"))
+            if record is not None:
+                self.add_game(record)
+        else:
+            # game_incomplete and anything else; partial games stay in the checkpoint
+            self.stats["skipped"] += 1
+
+    def add_game(self, record: dict):
+        self.batch.append(record)
+        self.since_checkpoint += 1
+        if len(self.batch) >= self.batch_games:
+            self.submit()
+
+    def submit(self):
+        if not self.batch:
+            return
+        self.in_flight.append(self.pool.apply_async(load_batch, (self.batch,)))
+        self.batch = []
+        # bounds the batches held in memory while the workers catch up
+        while len(self.in_flight) > 2 * self.workers:
+            self.collect(self.in_flight.popleft())
+
+    def drain(self):
+        # writes the partial batch and waits for every batch in flight
+        self.submit()
+        while self.in_flight:
+            self.collect(self.in_flight.popleft())
+        self.since_checkpoint = 0
+
+    def collect(self, result):
+        games, rows = result.get()
+        self.stats["batches"] += 1
+        self.stats["games"] += games
+        self.stats["rows"] += rows
+        self.state["games"] += games
+        self.state["rows"] += rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="load crawled JSONL item files into the database")
+    parser.add_argument("paths", nargs="+", help="JSONL item files, loaded in order")
+    parser.add_argument("--checkpoint", default="load_checkpoint.json")
+    parser.add_argument("--workers", type=int, default=4, help="processes writing batches")
+    parser.add_argument("--batch-games", type=int, default=500, help="games per transaction")
+    parser.add_argument(
+        "--checkpoint-games", type=int, default=10000, help="games between checkpoints"
+    )
+    args = parser.parse_args()
+
+    loader = JsonlLoader(args.checkpoint, args.workers, args.batch_games, args.checkpoint_games)
+    print(json.dumps(loader.load(args.paths)))
@@ -0,0 +1,219 @@
+import atexit
+import cProfile
+import functools
+import io
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from collections import OrderedDict, defaultdict
+from datetime import date, datetime
+from typing import Callable, Dict, Optional
+
+from game_crawlers.nba.seasons import parse_game_date, season_index
+
+# Sampling profiler shared by the database code and the crawlers. It imports nothing from
+# scrapy, so db and scripts that are not crawls can use profiled() and enable_from_env();
+# the spider middleware that profiles callbacks is game_crawlers.nba.profiling.
+
+# the profiler profiled() and ProfilingMiddleware report to, None when profiling is off
+active = None
+
+UNKNOWN_SEASON = "unknown"
+
+
+class Sample:
+    """
+    Profiles of one (kind, season): the merged cProfile stats of every sampled call, the
+    bytes and blocks each allocation site gained over those calls, and per call wall time
+    and peak traced memory.
+    """
+
+    def __init__(self):
+        self.stats: Optional[pstats.Stats] = None
+        self.sites: Dict[tuple, list] = defaultdict(lambda: [0, 0])
+        self.calls = 0
+        self.seconds = 0.0
+        self.max_peak = 0
+
+    def add(self, profile: cProfile.Profile, allocations: list, seconds: float, peak: int):
+        if self.stats is None:
+            self.stats = pstats.Stats(profile)
+        else:
+            self.stats.add(profile)
+        for stat in allocations:
+            frame = stat.traceback[0]
+            site = self.sites[(frame.filename, frame.lineno)]
+            site[0] += stat.size
+            site[1] += stat.count
+        self.calls += 1
+        self.seconds += seconds
+        self.max_peak = max(self.max_peak, peak)
+
+
+class Profiler:
+    """
+    Samples one in every sample_every calls of each kind (a spider callback, nbaDB.add_record)
+    under cProfile, with tracemalloc tracing for the length of the call, and groups the
+    samples by kind and season. write_reports() writes, for every (kind, season), a
+    <kind>.<season>.txt report of the top functions by cumulative time and the top
+    allocation sites, and the merged stats as <kind>.<season>.prof for pstats or snakeviz.
+    Calls that are not sampled only pay for the sample count; a call that starts while
+    another is sampled, on this thread (nested) or another (the pipeline's writer thread),
+    is not sampled itself. If tracemalloc was already started by someone
+    else, samples have no allocation data.
+    """
+
+    def __init__(self, out_dir: str, sample_every: int = 10, top: int = 25, frames: int = 1):
+        self.out_dir = out_dir
+        self.sample_every = max(1, sample_every)
+        self.top = top
+        self.frames = frames
+        self.seen: Dict[str, int] = defaultdict(int)
+        self.samples: Dict[tuple, Sample] = defaultdict(Sample)
+        # game id -> season, for pages that do not carry the game's date themselves
+        self.game_seasons: OrderedDict = OrderedDict()
+        self.lock = threading.Lock()  # one sample at a time, tracemalloc is process wide
+
+    # run calls func, profiling it if this call of kind is sampled. season(result) names
+    # the season the call is reported under. Results that are generators are run to the end
+    # inside the profile and returned as a list.
+    def run(self, kind: str, season: Callable, func: Callable, *args, **kwargs):
+        self.seen[kind] += 1
+        if (self.seen[kind] - 1) % self.sample_every or not self.lock.acquire(blocking=False):
+            return func(*args, **kwargs)
+
+        # tracing only for the call, so the snapshot holds just the blocks it allocated
+        # and kept, and nothing else pays for tracemalloc
+        tracing = not tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.start(self.frames)
+        profile = cProfile.Profile()
+        t = time.perf_counter()
+        profile.enable()
+        try:
+            result = func(*args, **kwargs)
+            if hasattr(result, "__next__"):
+                result = list(result)
+        finally:
+            profile.disable()
+            seconds = time.perf_counter() - t
+            allocations, peak = [], 0
+            if tracing:
+                peak = tracemalloc.get_traced_memory()[1]
+                own = (tracemalloc.Filter(False, __file__),)
+                allocations = tracemalloc.take_snapshot().filter_traces(own).statistics("lineno")
+                tracemalloc.stop()
+            self.lock.release()
+
+        self.samples[(kind, season(result) or UNKNOWN_SEASON)].add(profile, allocations, seconds, peak)
+        return result
+
+    def remember_season(self, game_id, season: str):
+        self.game_seasons[game_id] = season
+        if len(self.game_seasons) > 10000:
+            self.game_seasons.popitem(last=False)
+
+    def write_reports(self):
+        os.makedirs(self.out_dir, exist_ok=True)
+        for (kind, season), sample in sorted(self.samples.items()):
+            if sample.stats is None:
+                continue
+            path = os.path.join(self.out_dir, f"{kind}.{season}")
+            sample.stats.dump_stats(path + ".prof")
+            with open(path + ".txt", "w") as f:
+                f.write(self.report(kind, season, sample))
+
+    def report(self, kind: str, season: str, sample: Sample) -> str:
+        out = io.StringIO()
+        out.write(f"{kind}, season {season}\n")
+        out.write(
+            f"{sample.calls} sampled of {self.seen[kind]} calls of {kind} (all seasons), "
+            f"{1000 * sample.seconds / sample.calls:.2f} ms/call profiled, "
+            f"peak traced memory {sample.max_peak / 1024:,.1f} KiB\n\n"
+        )
+        out.write(f"top {self.top} functions by cumulative time\n")
+        stats = pstats.Stats(stream=out)
+        stats.add(sample.stats)
+        stats.sort_stats("cumulative").print_stats(self.top)
+
+        out.write(f"\ntop {self.top} allocation sites by bytes allocated and still held after the call\n")
+        sites = sorted(sample.sites.items(), key=lambda kv: kv[1][0], reverse=True)[: self.top]
+        for (filename, lineno), (size, count) in sites:
+            out.write(
+                f"{size / sample.calls:>12,.0f} B/call {count / sample.calls:>8,.1f} blocks/call"
+                f"  {filename}:{lineno}\n"
+            )
+        return out.getvalue()
+
+
+def enable(out_dir: str, sample_every: int = 10, top: int = 25, frames: int = 1) -> Profiler:
+    global active
+    if active is None:
+        active = Profiler(out_dir, sample_every, top, frames)
+    return active
+
+
+def disable():
+    # writes the reports
+    global active
+    if active is not None:
+        active.write_reports()
+        active = None
+
+
+# enable_from_env turns profiling on when PROFILE_DIR is set, for scripts that are not
+# crawls, and writes the reports when the script exits
+def enable_from_env() -> Optional[Profiler]:
+    out_dir = os.environ.get("PROFILE_DIR")
+    if not out_dir:
+        return None
+    atexit.register(disable)
+    return enable(
+        out_dir,
+        sample_every=int(os.environ.get("PROFILE_SAMPLE", 10)),
+        top=int(os.environ.get("PROFILE_TOP", 25)),
+    )
+
+
+def season_of(value) -> Optional[str]:
+    # the season of a game date: a date, a datetime or an ESPN timestamp
+    if isinstance(value, datetime):
+        value = value.date()
+    elif isinstance(value, str):
+        try:
+            value = parse_game_date(value)
+        except ValueError:
+            return None
+    if not isinstance(value, date):
+        return None
+    return season_index.season(value)
+
+
+def record_season(record) -> Optional[str]:
+    # the season of a joined game record, or of the items the spiders emit
+    if not hasattr(record, "get"):
+        return None
+    game = record.get("game") or record.get("game_data")
+    if game is None and record.get("type") == "game":
+        game = record.get("data")
+    elif game is None and record.get("type") == "game_summary":
+        game = (record.get("data") or {}).get("game")
+    return season_of(game.get("date")) if game is not None else None
+
+
+# profiled wraps a function so that, while a profiler is active, its calls are sampled as
+# kind and reported under the season season(args, result) returns. Disabled, the wrapper
+# only checks the profiler.
+def profiled(kind: str, season: Callable = lambda args, result: None):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if active is None:
+                return func(*args, **kwargs)
+            return active.run(kind, lambda result: season(args, result), func, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
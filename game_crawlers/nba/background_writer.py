@@ -0,0 +1,108 @@
+import queue
+import threading
+import time
+from typing import Callable, List
+
+from twisted.internet import defer
+from twisted.python.failure import Failure
+
+_STOP = object()
+
+
+class BackgroundWriter:
+    """
+    Runs write(batch) for every submitted batch, one at a time and in order, on a dedicated
+    thread, so the reactor thread never waits on the database. Everything but write runs on
+    the reactor thread: submit(), and the on_done(batch, result, seconds) and
+    on_error(batch, failure, seconds) callbacks, which are called back through the reactor.
+
+    At most max_batches batches are queued or being written. full() says when that is
+    reached, on_full() is called as it is and on_room() once a batch finishes below it, and
+    when_room() returns a Deferred that fires then. close() returns a Deferred that fires
+    once every submitted batch is done and the thread has exited.
+    """
+
+    def __init__(
+        self,
+        write: Callable,
+        max_batches: int,
+        on_done: Callable,
+        on_error: Callable,
+        on_full: Callable = lambda: None,
+        on_room: Callable = lambda: None,
+        name: str = "db-writer",
+    ):
+        self.write = write
+        self.max_batches = max(1, max_batches)
+        self.on_done = on_done
+        self.on_error = on_error
+        self.on_full = on_full
+        self.on_room = on_room
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self.queued = 0  # batches submitted and not done yet, reactor thread only
+        self.waiting: List[defer.Deferred] = []
+        self.stopped = None
+
+    def start(self):
+        from twisted.internet import reactor
+
+        self.reactor = reactor
+        self.thread.start()
+
+    def full(self) -> bool:
+        return self.queued >= self.max_batches
+
+    def submit(self, batch):
+        self.queued += 1
+        self.queue.put(batch)
+        if self.queued == self.max_batches:
+            self.on_full()
+
+    def when_room(self) -> defer.Deferred:
+        d = defer.Deferred()
+        if self.full():
+            self.waiting.append(d)
+        else:
+            d.callback(None)
+        return d
+
+    def close(self) -> defer.Deferred:
+        if self.stopped is None:
+            self.stopped = defer.Deferred()
+            self.queue.put(_STOP)
+        return self.stopped
+
+    def _run(self):
+        while True:
+            batch = self.queue.get()
+            if batch is _STOP:
+                break
+            t = time.perf_counter()
+            try:
+                result = self.write(batch)
+            except Exception:
+                self.reactor.callFromThread(self._failed, batch, Failure(), time.perf_counter() - t)
+            else:
+                self.reactor.callFromThread(self._written, batch, result, time.perf_counter() - t)
+        self.reactor.callFromThread(self.stopped.callback, None)
+
+    def _written(self, batch, result, seconds: float):
+        self.queued -= 1
+        try:
+            self.on_done(batch, result, seconds)
+        finally:
+            self._room()
+
+    def _failed(self, batch, failure: Failure, seconds: float):
+        self.queued -= 1
+        try:
+            self.on_error(batch, failure, seconds)
+        finally:
+            self._room()
+
+    def _room(self):
+        if self.queued == self.max_batches - 1:
+            self.on_room()
+        while self.waiting and not self.full():
+            self.waiting.pop(0).callback(None)
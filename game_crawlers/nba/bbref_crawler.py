@@ -5,8 +5,9 @@ from typing import List, Dict
 import re
 from datetime import datetime, timedelta
 
-from game_crawlers.nba.seasons import Seasons
-from game_crawlers.nba.fields import (
+from game_crawlers.nba.bbref_tables import box_tables, commented_tables
+from game_crawlers.nba.seasons import season_index
+from game_crawlers.nba.records import (
     Game,
     Record,
     Line,
@@ -16,6 +17,51 @@ from game_crawlers.nba.fields import (
     TeamStats,
 )
 
+# maps the field names from basketball reference basic boxscore to the expected
+# field name specified in the scrapy TeamStats and PlayerStats objects.
+BASIC_BOX_MAP = {
+    "fg": "fgm",
+    "fga": "fga",
+    "fg_pct": "fg_per",
+    "fg3": "x3pm",
+    "fg3a": "x3pa",
+    "fg3_pct": "x3p_per",
+    "ft": "ftm",
+    "fta": "fta",
+    "ft_pct": "ft_per",
+    "orb": "oreb",
+    "drb": "dreb",
+    "trb": "reb",
+    "ast": "ast",
+    "stl": "stl",
+    "blk": "blk",
+    "tov": "to",
+    "pf": "pf",
+    "pts": "pts"
+}
+
+# maps the field names from basketball reference advanced boxscore to the expected
+# field name specified in the scrapy TeamStats and PlayerStats objects.
+ADVANCED_BOX_MAP = {
+    "ts_pct": "ts_per",
+    "efg_pct": "efg_per",
+    "fg3a_per_fga_pct": "x3p_ar",
+    "fta_per_fga_pct": "ft_ar",
+    "orb_pct": "oreb_per",
+    "drb_pct": "dreb_per",
+    "trb_pct": "reb_per",
+    "ast_pct": "ast_per",
+    "stl_per": "stl_per",
+    "blk_pct": "blk_per",
+    "tov_pct": "tov_per",
+    "usg_pct": "usg_per",
+    "off_rtg": "off_rating",
+    "def_rtg": "def_rating",
+}
+
+PLAYER_BASIC_MAP = dict(BASIC_BOX_MAP, plus_minus="plusminus")
+PLAYER_ADVANCED_MAP = dict(ADVANCED_BOX_MAP, stl_pct="stl_per", bpm="bpm")
+
 
 class BBRefScoreboard:
     """
@@ -28,28 +74,11 @@ class BBRefScoreboard:
         pass
 
     def get_scoreboard_urls(self):
-        url_list = list()
-        for _, v in Seasons.season_info.items():
-            url_list = url_list + list(
-                self._get_bbref_url(v["regular_season_start"], v["regular_season_end"])
-            )
-            url_list = url_list + list(
-                self._get_bbref_url(v["post_season_start"], v["post_season_end"])
-            )
-        return url_list
+        return [self.get_urls_date(d) for d in season_index.dates()]
 
     def get_urls_date(self, date: datetime):
         return f"https://www.basketball-reference.com/boxscores/?month={date.month}&day={date.day}&year={date.year}"
 
-    def _get_bbref_url(self, start, end):
-        for d in self._get_dates(start, end):
-            yield f"https://www.basketball-reference.com/boxscores/?month={d.month}&day={d.day}&year={d.year}"
-
-    @staticmethod
-    def _get_dates(start: datetime, end: datetime) -> List[datetime]:
-        d = (end + timedelta(days=1) - start).days
-        return [start + timedelta(days=i) for i in range(d)]
-
 
 class BBRefSpider(Spider):
     """
@@ -103,7 +132,8 @@ class BBRefSpider(Spider):
 
         return Game(game_id = game_id, date = date, home_record = hr, away_record = ar)
     
-    def get_team_stats(self, response, game_id: str):
+    @staticmethod
+    def get_teams(response):
         # team_information contains len = 2 list of strings with team name information
         team_information = response.xpath("//strong/a[@itemprop='name']").getall()
 
@@ -111,6 +141,10 @@ class BBRefSpider(Spider):
         # POR -> "abbr", Portland Trail Blazers -> "name"
         away = re.search(r'teams/(?P<abbr>[A-Z]{3}).*>(?P<name>[A-Za-z ]+)<', team_information[0])
         home = re.search(r'teams/(?P<abbr>[A-Z]{3}).*>(?P<name>[A-Za-z ]+)<', team_information[1])
+        return away, home
+
+    def get_team_stats(self, response, game_id: str):
+        away, home = self.get_teams(response)
 
         away_team = Team(name = away.group("name"), abbreviation = away.group("abbr"))
         home_team = Team(name = home.group("name"), abbreviation = home.group("abbr"))
@@ -118,198 +152,147 @@ class BBRefSpider(Spider):
         away_stats = self.parse_team_stats(response, away.group("abbr"))
         home_stats = self.parse_team_stats(response, home.group("abbr"))
 
-        away_stat_obj = TeamStats(team = dict(away_team), game_id = game_id, home = False, **away_stats)
-        home_stat_obj = TeamStats(team = dict(home_team), game_id = game_id, home = True, **home_stats)
+        away_stat_obj = TeamStats(team = away_team, game_id = game_id, home = False, **away_stats)
+        home_stat_obj = TeamStats(team = home_team, game_id = game_id, home = True, **home_stats)
 
-        return {"home_stats": dict(home_stat_obj), "away_stats": dict(away_stat_obj)}
-    
+        return {"home_stats": home_stat_obj, "away_stats": away_stat_obj}
 
     def get_player_stats(self, response, game_id):
-        return {}
-
+        away, home = self.get_teams(response)
+        return {
+            "home_stats": self.parse_player_stats(response, home.group("abbr"), game_id),
+            "away_stats": self.parse_player_stats(response, away.group("abbr"), game_id),
+        }
 
-    def parse_player_stats(self, response, team_abbr: str):
-        # xpath is dynamically named after the teams abbreviation, so that needs to get passed into the 
-        # function so that we can accurately pull statistics. Player stats are found in body of table
-        # and xpath will return a list of stats to parse.
-        basic_xpath_str = '//table[@id="box-' + team_abbr + '-game-basic"]//tbody/tr[not(@class="thead")]'
-        advanced_xpath_str = '//table[@id="box-' + team_abbr + '-game-advanced"]//tbody/tr[not(@class="thead")]'
+    def parse_player_stats(self, response, team_abbr: str, game_id) -> List[PlayerStats]:
+        # the basic and advanced tables list the same players in the same order, so a
+        # player's stats are the same row index in both. Players that did not play are
+        # left out.
+        tables = box_tables(response)
+        basic = tables.get((team_abbr, "game", "basic"))
+        advanced = tables.get((team_abbr, "game", "advanced"))
+        if basic is None:
+            return []
+        stat_columns = [
+            (field, basic.columns[stat])
+            for stat, field in PLAYER_BASIC_MAP.items()
+            if stat in basic.columns
+        ]
+        if advanced is not None and advanced.players == basic.players:
+            stat_columns += [
+                (field, advanced.columns[stat])
+                for stat, field in PLAYER_ADVANCED_MAP.items()
+                if stat in advanced.columns
+            ]
+        fields = [field for field, _ in stat_columns]
+        rows = zip(
+            basic.players,
+            basic.names,
+            basic.columns.get("mp", [""] * len(basic)),
+            *(values for _, values in stat_columns),
+        )
+
+        players = []
+        for player_id, name, mp, *values in rows:
+            if not mp:
+                continue
+            first, _, last = name.partition(" ")
+            ps = PlayerStats(
+                player=Player(player_id=player_id, first_name=first, last_name=last),
+                game_id=game_id,
+                min=self.parse_minutes(mp),
+            )
+            for field, v in zip(fields, values):
+                if v:
+                    setattr(ps, field, v)
+            players.append(ps)
+        return players
 
+    @staticmethod
+    def parse_minutes(mp: str) -> int:
+        # minutes played are given as mm:ss, rounded to whole minutes like the ESPN boxscore
+        m, _, sec = mp.partition(":")
+        return int(m) + (1 if sec and int(sec) >= 30 else 0)
 
     def parse_team_stats(self, response, team_abbr: str):
-        # xpath is dynamically named after the teams abbreviation, so that needs to get passed into the 
-        # function so that we can accurately pull statistics. Team stats are found in foot of table
-        # and xpath will return a list of stats to parse
-        basic_xpath_str = '//table[@id="box-' + team_abbr + '-game-basic"]//tfoot//td'
-        advanced_xpath_str = '//table[@id="box-' + team_abbr + '-game-advanced"]//tfoot//td'
-
-        # something is strange with the html in the four_fact and scoreline tables, scrapy
-        # is unable to find the link when referencing the id directly to the table. The
-        # current workaround will use the string comment from the section above the table
-        # which has all the required data.
-        four_factor_xpath = '//div[@id="all_four_factors"]/comment()'
-        scoreline_xpath = '//div[@id="all_line_score"]/comment()'
-
-        basic_box = response.xpath(basic_xpath_str).getall()
-        advanced_box = response.xpath(advanced_xpath_str).getall()
-        four_factor = response.xpath(four_factor_xpath).get()
-        scoreline = response.xpath(scoreline_xpath).get()
+        # box tables are named after the teams abbreviation, so that needs to get passed into
+        # the function so that we can accurately pull statistics. Team stats are the totals
+        # found in the foot of each table.
+        boxes = box_tables(response)
+        basic_box = boxes.get((team_abbr, "game", "basic"))
+        advanced_box = boxes.get((team_abbr, "game", "advanced"))
+
+        # the four factor and line score tables are inside html comments, so they are read
+        # from the response's parsed commented tables instead of the page
+        tables = commented_tables(response)
+        four_factor = tables.row("four_factors", team_abbr)
+        scoreline = tables.row("line_score", team_abbr)
 
         team_stat_dict = {}
-        team_stat_dict.update(self.parse_basic_box(basic_box))
-        team_stat_dict.update(self.parse_advanced_box(advanced_box))
-        team_stat_dict.update(self.parse_four_factor(four_factor, team_abbr))
-        team_stat_dict.update(self.parse_scoreline(scoreline, team_abbr)) 
+        team_stat_dict.update(self.parse_basic_box(basic_box.totals if basic_box else {}))
+        team_stat_dict.update(self.parse_advanced_box(advanced_box.totals if advanced_box else {}))
+        team_stat_dict.update(self.parse_four_factor(four_factor))
+        team_stat_dict.update(self.parse_scoreline(scoreline))
 
         return team_stat_dict
 
-    def parse_basic_box(self, basic_box: List[str]) -> dict:
-        # basic_box is a list of cells from the basic box score table
-        # each looks like this '<td class="right " data-stat="mp">240</td>'
-        
-        # maps the field names from basketball reference  basic boxscore to the expected
-        # field name specified in the spacy TeamStats object.
-        bbref_to_teamstat_map = {
-            "fg": "fgm",
-            "fga": "fga",
-            "fg_pct": "fg_per",
-            "fg3": "x3pm",
-            "fg3a": "x3pa",
-            "fg3_pct": "x3p_per",
-            "ft": "ftm",
-            "fta": "fta",
-            "ft_pct": "ft_per",
-            "orb": "oreb",
-            "drb": "dreb",
-            "trb": "reb",
-            "ast": "ast",
-            "stl": "stl",
-            "blk": "blk",
-            "tov": "to",
-            "pf": "pf",
-            "pts": "pts"
-        }
-        return self.parse_team_box(basic_box, bbref_to_teamstat_map)
-
-    def parse_advanced_box(self, advanced_box: str) -> dict:
-        # advanced_box is a list of cells from the advanced box score table
-        # each looks like this '<td class="right " data-stat="mp">240</td>'
-        
-        # maps the field names from basketball reference advanced boxscore to the expected
-        # field name specified in the spacy TeamStats object.
-        bbref_to_teamstat_map = {
-            "ts_pct": "ts_per",
-            "efg_pct": "efg_per",
-            "fg3a_per_fga_pct": "x3p_ar",
-            "fta_per_fga_pct": "ft_ar",
-            "orb_pct": "oreb_per",
-            "drb_pct": "dreb_per", 
-            "trb_pct": "reb_per",
-            "ast_pct": "ast_per",
-            "stl_per": "stl_per",
-            "blk_pct": "blk_per",
-            "tov_pct": "tov_per",
-            "usg_pct": "usg_per",
-            "off_rtg": "off_rating",
-            "def_rtg": "def_rating",
-        }
-        return self.parse_team_box(advanced_box, bbref_to_teamstat_map)
-    
+    def parse_basic_box(self, basic_box: dict) -> dict:
+        # basic_box is the Team Totals row of the basic box score table, keyed by data-stat
+        return self.parse_team_box(basic_box, BASIC_BOX_MAP)
+
+    def parse_advanced_box(self, advanced_box: dict) -> dict:
+        # advanced_box is the Team Totals row of the advanced box score table, keyed by data-stat
+        return self.parse_team_box(advanced_box, ADVANCED_BOX_MAP)
+
     @staticmethod
-    def parse_team_box(table_str: List[str], stat_map: dict) -> dict:
-        stats = {}
-        for stat in table_str:
-            match = re.search(r'data-stat=\"(?P<stat>[A-Za-z0-9_]+)\">(?P<val>[0-9.]+)<', stat)
-            if match.group("stat") in stat_map.keys():
-                stats[stat_map.get(match.group("stat"))] = match.group("val")
-        return stats
+    def parse_team_box(totals: dict, stat_map: dict) -> dict:
+        # empty cells such as the team plus_minus are not in totals
+        return {field: totals[stat] for stat, field in stat_map.items() if stat in totals}
 
     @staticmethod
-    def parse_four_factor(four_factor: str, abbr: str) -> dict:
-        # map for stats in the four factor group to map to scrapy fields
+    def parse_four_factor(four_factor: dict) -> dict:
+        # four_factor is the team's row of the four_factors table, keyed by data-stat
+        #     {"team_id": "NJN", "pace": "93.2", "efg_pct": ".395", "tov_pct": "13.8",
+        #      "orb_pct": "12.5", "ft_rate": ".224", "off_rtg": "82.6"}
         bbref_to_teamstat_map = {
             "pace": "pace",
             "ft_rate": "ft_per_fga"
         }
-        # FourFactor is a string comment from the html that contains all the stats since the html 
-        # table can't be found via xpath. Below regex path will pull the four factor stats for the
-        # given team. 
-        # Sample string: 
-        #     'NJN</a></th><td class="right " data-stat="pace" >93.2</td><td class="right minus" 
-        #     data-stat="efg_pct" >.395</td><td class="right plus" data-stat="tov_pct" >13.8</td>
-        #     <td class="right minus" data-stat="orb_pct" >12.5</td><td class="right plus" data-stat="ft_rate" >
-        #     .224</td><td class="right " data-stat="off_rtg" >82.6</td></tr><tr ><th scope="row" class="left " 
-        #     data-stat="team_id" >'
-        clean_str = four_factor.replace("/n", "")
-        re_str = abbr + r'<.+(?=\<a)|' + abbr + r'<.+(?=</tr)'
-        snippet = re.search(re_str, clean_str)
-
-        # Given the snippet, this will return a list of tuples [(stat, value)] with the stat values
-        # returns:
-        #   [('pace', '93.2'),
-        #  ('efg_pct', '.395'),
-        #  ('tov_pct', '13.8'),
-        #  ('orb_pct', '12.5'),
-        #  ('ft_rate', '.224'),
-        #  ('off_rtg', '82.6')]
-
-        stats = re.findall(r'data-stat=\"(?P<stat>[A-Za-z0-9_]+)\" >(?P<val>[0-9.]+)<', snippet.group())
-        stat_dict = dict()
-        for stat in stats:
-            if stat[0] in bbref_to_teamstat_map.keys():
-                stat_dict[bbref_to_teamstat_map.get(stat[0])] = stat[1]
-        return stat_dict
-    
+        return {
+            field: four_factor[stat]
+            for stat, field in bbref_to_teamstat_map.items()
+            if four_factor.get(stat)
+        }
+
     @staticmethod
-    def parse_scoreline(scoreline: str, abbr: str) -> dict:
-        # map for stats in the four factor group to map to scrapy fields
+    def parse_scoreline(scoreline: dict) -> dict:
+        # scoreline is the team's row of the line_score table, keyed by data-stat
+        #     {"team": "GSW", "1": "24", "2": "26", "3": "22", "4": "21", "1OT": "9",
+        #      "2OT": "8", "T": "110"}
         bbref_to_teamstat_map = {
             "1": "x1q_pts",
             "2": "x2q_pts",
             "3": "x3q_pts",
             "4": "x4q_pts"
         }
-        
-        ot_match = r'[0-9]OT'
-        # scoreline is a string comment from the html that contains all the stats since the html 
-        # table can't be found via xpath. Below regex path will pull the four factor stats for the
-        # given team. 
-        # Sample string: 
-        #     'NJN</a></th><td class="right " data-stat="pace" >93.2</td><td class="right minus" 
-        #     data-stat="efg_pct" >.395</td><td class="right plus" data-stat="tov_pct" >13.8</td>
-        #     <td class="right minus" data-stat="orb_pct" >12.5</td><td class="right plus" data-stat="ft_rate" >
-        #     .224</td><td class="right " data-stat="off_rtg" >82.6</td></tr><tr ><th scope="row" class="left " 
-        #     data-stat="team_id" >'
-        clean_str = scoreline.replace("/n", "")
-        re_str = abbr + r'<.+(?=<a)|' + abbr + r'<.+(?=</tr)'
-        snippet = re.search(re_str, clean_str)
-
-        # Given the snippet, this will return a list of tuples [(stat, value)] with the stat values
-        # returns:
-        #   [('1', '25'),
-        #  ('2', '25'),
-        #  ('3', '25'),
-        #  ('4', '25'),
-        #  ('1OT', '25'),
-        #  ('T', '125')]
-
-        stats = re.findall(r'data-stat=\"(?P<stat>[A-Za-z0-9_]+)\" >(?P<val>[0-9.]+)<', snippet.group())
-        stat_dict = dict()
-        stat_dict["ot_pts"] = 0
-        for stat in stats:
-            if stat[0] in bbref_to_teamstat_map.keys():
-                stat_dict[bbref_to_teamstat_map.get(stat[0])] = stat[1]
-            elif re.match(ot_match, stat[0]):
-                stat_dict["ot_pts"] += int(stat[1])
-        stat_dict["ot_pts"] = str(stat_dict["ot_pts"])
+        stat_dict = {
+            field: scoreline[stat]
+            for stat, field in bbref_to_teamstat_map.items()
+            if scoreline.get(stat)
+        }
+        # overtime periods are summed into a single field
+        stat_dict["ot_pts"] = str(
+            sum(int(v) for k, v in scoreline.items() if k.endswith("OT") and v.isdigit())
+        )
         return stat_dict
 
     @staticmethod
     def get_away_home_records(record_string: List[str], scores: List[int]):
         # record_string = ['away_wins-away_losses', 'home_wins'-'home_losses']
         # scores = [away_score, home_score]
-        split_away = record_string[0].split("-") # results in ['away_wins', 'away_losses']
-        split_home = record_string[1].split("-") # results in ['home_wins', 'home_losses']
+        split_away = [int(i) for i in record_string[0].split("-")] # results in [away_wins, away_losses]
+        split_home = [int(i) for i in record_string[1].split("-")] # results in [home_wins, home_losses]
+        scores = [int(i) for i in scores]
 
         # BasketballReference record includes the result of the game in question
         # we need to determine game winner and update the record values for wins
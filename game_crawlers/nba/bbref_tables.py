@@ -0,0 +1,189 @@
+import re
+import weakref
+from typing import Dict, Iterator, List, Tuple
+
+from lxml import etree
+
+# parsed tables per response, dropped with the response
+_cache = weakref.WeakKeyDictionary()
+_box_cache = weakref.WeakKeyDictionary()
+
+# box-BOS-game-basic, box-BOS-q1-basic, box-BOS-h2-advanced ...
+BOX_ID_RE = re.compile(r"box-(?P<team>[A-Z]{3})-(?P<section>[a-z0-9]+)-(?P<kind>basic|advanced)$")
+
+
+class CommentedTables:
+    """
+    basketball-reference ships most secondary tables (line score, four factors, ...) inside
+    HTML comments that are only uncommented by javascript, so xpath on the page cannot reach
+    them. CommentedTables keeps the text of each commented all_<id> block and only parses a
+    table when it is first asked for, indexing its body rows by the text of their first cell,
+    which is the team abbreviation for team tables:
+
+        tables.rows("four_factors") -> {"GSW": {"team_id": "GSW", "pace": "93.5", ...}, ...}
+
+    The spider reads two of the page's commented tables, so the rest are never parsed.
+    """
+
+    def __init__(self, response):
+        # all_<id> block id -> comment text. Walking the page's comments is much cheaper
+        # than an xpath over the whole tree.
+        self.comments = {}
+        for c in response.selector.root.iter(etree.Comment):
+            block = c.getparent().get("id") or ""
+            if block.startswith("all_"):
+                self.comments[block[4:]] = c.text
+        self._rows = {}
+
+    def table(self, table_id: str):
+        # the table is in the block named after it, other blocks are only searched when it
+        # is not. Only the body rows are indexed, so just the table's tbody is parsed when
+        # it can be cut out of the text, which skips the caption, colgroup and headers.
+        ids = [table_id] if table_id in self.comments else []
+        for block in ids + [b for b in self.comments if b != table_id]:
+            text = self.comments[block] or ""
+            start = text.find(f'id="{table_id}"')
+            if start < 0:
+                continue
+            body_start = text.find("<tbody", start)
+            body_end = text.find("</tbody>", body_start)
+            if 0 <= body_start < body_end < text.find("</table>", start):
+                text = f"<table>{text[body_start:body_end + 8]}</table>"
+                return next(etree.HTML(text).iter("table"))
+            for table in etree.HTML(text).iter("table"):
+                if table.get("id") == table_id:
+                    return table
+        return None
+
+    def rows(self, table_id: str) -> Dict[str, Dict[str, str]]:
+        rows = self._rows.get(table_id)
+        if rows is None:
+            rows = {}
+            table = self.table(table_id)
+            for tr in table.iterfind("tbody/tr") if table is not None else ():
+                cells = {}
+                for cell in tr:
+                    stat = cell.get("data-stat")
+                    if stat:
+                        cells[stat] = "".join(cell.itertext()).strip()
+                if len(tr):
+                    rows["".join(tr[0].itertext()).strip()] = cells
+            self._rows[table_id] = rows
+        return rows
+
+    def row(self, table_id: str, key: str) -> Dict[str, str]:
+        return self.rows(table_id).get(key, {})
+
+
+# commented_tables returns the CommentedTables of a response, parsing it on first use so each
+# team's lookups share one parse
+def commented_tables(response) -> CommentedTables:
+    tables = _cache.get(response)
+    if tables is None:
+        tables = CommentedTables(response)
+        _cache[response] = tables
+    return tables
+
+
+class BoxTable:
+    """
+    One basketball-reference box score table decoded into columns. players, names and every
+    list in columns are aligned by row, and totals holds the non empty cells of the Team
+    Totals row from the table foot. Empty cells, and every stat of a player that did not
+    play, are "".
+    """
+
+    __slots__ = ("team", "section", "kind", "players", "names", "columns", "totals")
+
+    def __init__(self, team: str, section: str, kind: str):
+        self.team = team
+        self.section = section
+        self.kind = kind
+        self.players: List[str] = []
+        self.names: List[str] = []
+        self.columns: Dict[str, List[str]] = {}
+        self.totals: Dict[str, str] = {}
+
+    def __len__(self) -> int:
+        return len(self.players)
+
+    def rows(self) -> Iterator[Dict[str, str]]:
+        for i in range(len(self.players)):
+            yield {stat: values[i] for stat, values in self.columns.items()}
+
+
+# compiled once and evaluated per page or per box score table. The body xpaths return python
+# strings rather than elements, which saves a proxy object for each of the ~700 cells of a
+# page: players and names one per row, and cells the text of each td without child elements,
+# or the td itself when it is empty, in document order.
+BOX_TABLES_XPATH = etree.XPath("//table[starts-with(@id, 'box-')]")
+BOX_STATS_XPATH = etree.XPath("thead/tr[last()]/th[position() > 1]/@data-stat")
+BOX_ROWS_XPATH = etree.XPath("tbody/tr[not(@class = 'thead')]")
+BOX_PLAYERS_XPATH = etree.XPath("tbody/tr[not(@class = 'thead')]/th/@data-append-csv", smart_strings=False)
+BOX_NAMES_XPATH = etree.XPath("tbody/tr[not(@class = 'thead')]/th//text()", smart_strings=False)
+BOX_CELLS_XPATH = etree.XPath(
+    "tbody/tr[not(@class = 'thead')]/td[not(*)]/text() | tbody/tr[not(@class = 'thead')]/td[not(node())]",
+    smart_strings=False,
+)
+BOX_TOTALS_XPATH = etree.XPath("tfoot/tr[1]")
+
+
+# cell_text is xpath's normalize-space of a cell
+def cell_text(cell) -> str:
+    text = "".join(cell.itertext()) if len(cell) else cell.text
+    return " ".join(text.split()) if text else ""
+
+
+# box_rows returns the players, names and cell values of a table's body rows. When every row
+# is a th with one player id and one text followed by td cells without child elements that
+# hold one text node or none, the counts of the xpath results line up with the rows and they
+# are split by row. Otherwise each row is read cell by cell.
+def box_rows(table) -> Tuple[List[str], List[str], List[List[str]]]:
+    rows = BOX_ROWS_XPATH(table)
+    players = BOX_PLAYERS_XPATH(table)
+    names = BOX_NAMES_XPATH(table)
+    cells = BOX_CELLS_XPATH(table)
+    sizes = [len(tr) - 1 for tr in rows]
+    if len(players) == len(names) == len(rows) and len(cells) == sum(sizes):
+        values = []
+        i = 0
+        for size in sizes:
+            values.append([" ".join(v.split()) if type(v) is str else "" for v in cells[i:i + size]])
+            i += size
+        return players, [" ".join(name.split()) for name in names], values
+    players, names, values = [], [], []
+    for tr in rows:
+        th = tr.find("th")
+        players.append(th.get("data-append-csv", "") if th is not None else "")
+        names.append(cell_text(th) if th is not None else "")
+        values.append([cell_text(td) for td in tr.iterfind("td")])
+    return players, names, values
+
+
+# decode_box_table decodes one box score table, transposing its rows into columns
+def decode_box_table(table, box: BoxTable) -> BoxTable:
+    stats = BOX_STATS_XPATH(table)
+    blank = [""] * len(stats)
+    box.players, box.names, values = box_rows(table)
+    # a did not play row only has its reason
+    rows = [v if len(v) == len(stats) else blank for v in values]
+    box.columns = dict(zip(stats, map(list, zip(*rows)))) if rows else {k: [] for k in stats}
+    for tr in BOX_TOTALS_XPATH(table):
+        box.totals = {k: v for k, v in zip(stats, (cell_text(td) for td in tr.iterfind("td"))) if v}
+    return box
+
+
+# box_tables returns every box score table of a response keyed by (team, section, kind),
+# e.g. ("BOS", "game", "basic"). All tables are extracted in one pass over the page and the
+# result is cached on the response.
+def box_tables(response) -> Dict[Tuple[str, str, str], BoxTable]:
+    tables = _box_cache.get(response)
+    if tables is None:
+        tables = {}
+        for table in BOX_TABLES_XPATH(response.selector.root):
+            m = BOX_ID_RE.match(table.get("id"))
+            if m is not None:
+                box = decode_box_table(table, BoxTable(m.group("team"), m.group("section"), m.group("kind")))
+                tables[(box.team, box.section, box.kind)] = box
+        _box_cache[response] = tables
+    return tables
@@ -2,9 +2,11 @@ import scrapy
 from scrapy.crawler import CrawlerProcess
 from scrapy.utils.project import get_project_settings
 from typing import List, Dict
+import json
 import re
 
-from game_crawlers.nba.fields import (
+from game_crawlers.nba.id_store import GameIdStore
+from game_crawlers.nba.records import (
     Game,
     Record,
     Line,
@@ -14,40 +16,197 @@ from game_crawlers.nba.fields import (
     TeamStats,
 )
 
+# compiled patterns and column layout used by NBAESPNSpider.new_player_stats
+NAME_RE = re.compile(
+    r"id/(?P<pid>[0-9]+)/(?P<first>[a-z]+)-(?P<last>[a-z]+).*position\">(?P<pos>[A-Z]{1,2})"
+)
+CELL_RE = re.compile(r"class=\"(?P<cls>[a-z0-9]+)\">(?P<val>[^<]*)")
+SHOT_RE = re.compile(r"([0-9]{1,2})-([0-9]{1,2})")
+COUNT_RE = re.compile(r"[0-9]{1,3}")
+PLUSMINUS_RE = re.compile(r"\+?([0-9-]{1,3})")
+SUMMARY_NAME_RE = re.compile(r"id/(?P<pid>[0-9]+)/(?P<first>[a-z]+)-(?P<last>[a-z]+)")
+
+# boxscore cell class -> (made, attempted, percentage) PlayerStats fields
+SHOT_COLUMNS = {
+    "ft": ("ftm", "fta", "ft_per"),
+    "fg": ("fgm", "fga", "fg_per"),
+    "3pt": ("x3pm", "x3pa", "x3p_per"),
+}
+COUNT_COLUMNS = ("min", "pts", "oreb", "dreb", "reb", "ast", "stl", "blk", "pf")
+# TeamStats fields the matchup table does not fill
+TEAM_NO_DEFAULT = ("team", "game_id", "home", "pts")
+
+# ESPN team stat names, used by both the matchup table and the summary payload -> TeamStats
+# fields
+TEAM_STAT_MAP = {
+    "fieldGoalsMade": "fgm",
+    "fieldGoalsAttempted": "fga",
+    "fieldGoalPct": "fg_per",
+    "threePointFieldGoalsMade": "x3pm",
+    "threePointFieldGoalsAttempted": "x3pa",
+    "threePointFieldGoalPct": "x3p_per",
+    "freeThrowsMade": "ftm",
+    "freeThrowsAttempted": "fta",
+    "freeThrowPct": "ft_per",
+    "totalRebounds": "reb",
+    "offensiveRebounds": "oreb",
+    "defensiveRebounds": "dreb",
+    "assists": "ast",
+    "steals": "stl",
+    "blocks": "blk",
+    "totalTurnovers": "to",
+    "turnoverPoints": "pts_off_to",
+    "fastBreakPoints": "fast_break_pts",
+    "pointsInPaint": "points_in_paint",
+    "fouls": "pf",
+    "technicalFouls": "technical",
+    "flagrantFouls": "flagrant",
+    "largestLead": "largest_lead",
+}
+TEAM_SHOT_STATS = (
+    "fieldGoalsMade-fieldGoalsAttempted",
+    "threePointFieldGoalsMade-threePointFieldGoalsAttempted",
+    "freeThrowsMade-freeThrowsAttempted",
+)
+
+ESPN_BASE_URL = "https://www.espn.com"
+ESPN_SUMMARY_URL = "https://site.api.espn.com/apis/site/v2/sports/basketball/nba/summary?event="
+# summary boxscore column labels -> the boxscore page cell classes new_player_stats reads
+SUMMARY_LABELS = {"+/-": "plusminus"}
+
 
 class NBAESPNSpider(scrapy.Spider):
+    """
+    Scrapes ESPN games. By default each game is three pages (gamecast, boxscore and matchup)
+    whose fragments the pipeline joins back together. With summary=True each game is a
+    single request for ESPN's summary JSON, parsed into one complete game item.
+
+    Games are admitted MAX_OPEN_GAMES at a time: the next game's requests are only issued
+    once an open game has had every request answered or failed, and all requests of a game
+    share a priority that puts earlier games first. The pipeline's join buffer then holds
+    at most MAX_OPEN_GAMES partial games, however long the crawl. MAX_OPEN_GAMES = 0 issues
+    every game up front.
+
+    With id_store, the path of the game id store, every request carries the season of its
+    game in meta["season"], so the response cache can file and prune ESPN pages by season.
+    """
+
     name = "nba_boxscores"
 
-    def __init__(self, ids: List[int], *args, **kwargs):
+    def __init__(
+        self,
+        ids: List[int],
+        summary: bool = False,
+        summary_url: str = ESPN_SUMMARY_URL,
+        base_url: str = ESPN_BASE_URL,
+        id_store: str = None,
+        *args,
+        **kwargs,
+    ):
         super(NBAESPNSpider, self).__init__(*args, **kwargs)
         self.game_ids = ids
+        self.summary = summary
+        self.summary_url = summary_url
+        self.base_url = base_url
+        self.id_store = id_store
+        self.seasons = {}  # game_id -> season, for the response cache
+        self.open_games = {}  # game_id -> requests not answered yet
+        self.failed_games = set()
+        self.admitted = 0
 
     @staticmethod
-    def get_urls(game_id: int):
+    def get_urls(game_id: int, base_url: str = ESPN_BASE_URL):
         return {
-            "gamecast": f"https://www.espn.com/nba/game?gameId={game_id}",
-            "boxscore": f"https://www.espn.com/nba/boxscore?gameId={game_id}",
-            "teamstats": f"https://www.espn.com/nba/matchup?gameId={game_id}",
+            "gamecast": f"{base_url}/nba/game?gameId={game_id}",
+            "boxscore": f"{base_url}/nba/boxscore?gameId={game_id}",
+            "teamstats": f"{base_url}/nba/matchup?gameId={game_id}",
         }
 
     def start_requests(self):
-        for g in self.game_ids:
-            urls = self.get_urls(g)
-            yield scrapy.Request(
-                url=urls["gamecast"],
-                callback=self.parse_game,
-                cb_kwargs=dict(game_id=g),
-            )
-            yield scrapy.Request(
-                url=urls["boxscore"],
-                callback=self.parse_boxscore,
-                cb_kwargs=dict(game_id=g),
-            )
-            yield scrapy.Request(
-                url=urls["teamstats"],
-                callback=self.parse_teamstats,
+        self.max_open_games = self.settings.getint("MAX_OPEN_GAMES", 32)
+        self.pending_games = iter(self.game_ids)
+        if self.id_store:
+            store = GameIdStore(self.id_store)
+            self.seasons = store.seasons_of(self.game_ids)
+            store.close()
+        yield from self.admit_games()
+
+    # admit_games issues the requests of the next games while fewer than max_open_games
+    # are open
+    def admit_games(self):
+        while self.max_open_games <= 0 or len(self.open_games) < self.max_open_games:
+            g = next(self.pending_games, None)
+            if g is None:
+                return
+            if g in self.open_games:
+                continue
+            requests = self.game_requests(g, priority=-self.admitted)
+            self.open_games[g] = len(requests)
+            self.admitted += 1
+            self.crawler.stats.inc_value("games/admitted", spider=self)
+            self.crawler.stats.max_value("games/max_open", len(self.open_games), spider=self)
+            yield from requests
+
+    def game_requests(self, g, priority: int = 0) -> List[scrapy.Request]:
+        if self.summary:
+            pages = [(f"{self.summary_url}{g}", self.parse_summary)]
+        else:
+            urls = self.get_urls(g, self.base_url)
+            pages = [
+                (urls["gamecast"], self.parse_game),
+                (urls["boxscore"], self.parse_boxscore),
+                (urls["teamstats"], self.parse_teamstats),
+            ]
+        meta = {"season": self.seasons[str(g)]} if str(g) in self.seasons else {}
+        return [
+            scrapy.Request(
+                url=url,
+                callback=self.parse_tracked,
+                errback=self.request_failed,
+                priority=priority,
                 cb_kwargs=dict(game_id=g),
+                meta=dict(meta, game_parse=parse.__name__),
             )
+            for url, parse in pages
+        ]
+
+    # parse_tracked runs the page's parse method, then admits new games if this was the
+    # last outstanding request of its game. A page that fails to parse counts as a failed
+    # request, scrapy calls no errback for callback errors and the game would hold its slot
+    # forever. The gamecast, boxscore and matchup callbacks are unchanged and can still be
+    # called directly.
+    def parse_tracked(self, response, game_id):
+        try:
+            result = getattr(self, response.meta["game_parse"])(response, game_id)
+        except Exception:
+            self.logger.exception(f"game {game_id}: failed to parse {response.url}")
+            self.crawler.stats.inc_value("games/parse_errors", spider=self)
+            self.failed_games.add(game_id)
+            result = None
+        if result is not None:
+            yield result
+        yield from self.request_done(game_id)
+
+    def request_failed(self, failure):
+        # download errors and http errors left after retries still close out the request
+        game_id = failure.request.cb_kwargs["game_id"]
+        self.logger.warning(f"game {game_id}: {failure.request.url} failed: {failure.value!r}")
+        self.crawler.stats.inc_value("games/failed_requests", spider=self)
+        self.failed_games.add(game_id)
+        yield from self.request_done(game_id)
+
+    def request_done(self, game_id):
+        self.open_games[game_id] -= 1
+        if self.open_games[game_id] == 0:
+            del self.open_games[game_id]
+            if game_id in self.failed_games:
+                # tells the pipeline the rest of the game is not coming in this crawl
+                self.failed_games.discard(game_id)
+                self.crawler.stats.inc_value("games/incomplete", spider=self)
+                yield {"type": "game_incomplete", "game_id": game_id}
+            else:
+                self.crawler.stats.inc_value("games/completed", spider=self)
+            yield from self.admit_games()
 
     # Parses game information located in the gamecast tab of a game ESPN recorded
     def parse_game(self, response, game_id):
@@ -89,19 +248,19 @@ class NBAESPNSpider(scrapy.Spider):
             else Line(favorite="n/a", spread=0, ou=0)
         )
 
-        game = Game(game_id=game_id)
-        game["date"] = game_time
-        game["home_record"] = dict(home_record)
-        game["home_home_record"] = dict(home_home_record)
-        game["away_record"] = dict(away_record)
-        game["away_away_record"] = dict(away_away_record)
-        game["line"] = dict(game_line)
-        return {"type": "game", "game_id": game_id, "data": dict(game)}
+        game = Game(
+            game_id=game_id,
+            date=game_time,
+            home_record=home_record,
+            home_home_record=home_home_record,
+            away_record=away_record,
+            away_away_record=away_away_record,
+            line=game_line,
+        )
+        return {"type": "game", "game_id": game_id, "data": game}
 
     # parse_matchup parses the nba matchup tab and returns team summary statistics
     def parse_teamstats(self, response, game_id):
-        fields = TeamStats().fields
-
         away_html_str = response.xpath(
             '//div[@class="team away"]//a[@class="team-name"]'
         ).get()
@@ -129,25 +288,15 @@ class NBAESPNSpider(scrapy.Spider):
 
         team_stat_strings = response.xpath("//tr[@data-stat-attr]").getall()
 
-        away_team_stat = TeamStats(
-            team=dict(away_team), game_id=game_id, pts=away_score, home=False
-        )
-        home_team_stat = TeamStats(
-            team=dict(home_team), game_id=game_id, pts=home_score, home=True
-        )
-
         stats_dict = self.new_team_stats(team_stat_strings)
-        # work through stats and set default value if stat not found
-
-        no_default = ["team", "game_id", "home", "pts"]
-        for field in fields:
-            if field not in no_default:
-                home_team_stat[field] = stats_dict.get("home").get(field, 0)
-                away_team_stat[field] = stats_dict.get("away").get(field, 0)
 
         team_stats = dict()
-        team_stats["home_stats"] = dict(home_team_stat)
-        team_stats["away_stats"] = dict(away_team_stat)
+        team_stats["home_stats"] = self.new_team_stat(
+            home_team, game_id, home_score, True, stats_dict.get("home")
+        )
+        team_stats["away_stats"] = self.new_team_stat(
+            away_team, game_id, away_score, False, stats_dict.get("away")
+        )
         return {"type": "team_stats", "game_id": game_id, "data": team_stats}
 
     # parse_boxscore parses the nba boxscore html page and returns lists of player stats.
@@ -169,39 +318,122 @@ class NBAESPNSpider(scrapy.Spider):
         player_stats["away_stats"] = away_team_stats
         return {"type": "player_stats", "game_id": game_id, "data": player_stats}
 
-    def new_team_stats(self, team_stat: List[str]) -> Dict:
-        stat_map = {
-            "fieldGoalsMade": "fgm",
-            "fieldGoalsAttempted": "fga",
-            "fieldGoalPct": "fg_per",
-            "threePointFieldGoalsMade": "x3pm",
-            "threePointFieldGoalsAttempted": "x3pa",
-            "threePointFieldGoalPct": "x3p_per",
-            "freeThrowsMade": "ftm",
-            "freeThrowsAttempted": "fta",
-            "freeThrowPct": "ft_per",
-            "totalRebounds": "reb",
-            "offensiveRebounds": "oreb",
-            "defensiveRebounds": "dreb",
-            "assists": "ast",
-            "steals": "stl",
-            "blocks": "blk",
-            "totalTurnovers": "to",
-            "turnoverPoints": "pts_off_to",
-            "fastBreakPoints": "fast_break_pts",
-            "pointsInPaint": "points_in_paint",
-            "fouls": "pf",
-            "technicalFouls": "technical",
-            "flagrantFouls": "flagrant",
-            "largestLead": "largest_lead",
+    # parse_summary parses the summary JSON of a game into the game, team_stats and
+    # player_stats fragments the three pages produce, and returns them as one item
+    def parse_summary(self, response, game_id):
+        summary = json.loads(response.text)
+        competition = summary["header"]["competitions"][0]
+        competitors = {c["homeAway"]: c for c in competition["competitors"]}
+        # the boxscore lists teams and players by team id, not home and away
+        sides = {c["team"]["id"]: side for side, c in competitors.items()}
+
+        records = {
+            side: {r["type"]: self.new_record(r.get("summary")) for r in c.get("record", [])}
+            for side, c in competitors.items()
         }
+        odds = summary.get("pickcenter") or []
+        game = Game(
+            game_id=game_id,
+            date=competition["date"],
+            home_record=records["home"].get("total", Record()),
+            home_home_record=records["home"].get("home", Record()),
+            away_record=records["away"].get("total", Record()),
+            away_away_record=records["away"].get("road", records["away"].get("away", Record())),
+            line=self.summary_line(odds[0]) if odds else Line(favorite="n/a", spread=0, ou=0),
+        )
 
-        shot_list = [
-            "fieldGoalsMade-fieldGoalsAttempted",
-            "threePointFieldGoalsMade-threePointFieldGoalsAttempted",
-            "freeThrowsMade-freeThrowsAttempted",
-        ]
+        # home first, like the pages
+        team_stats = dict.fromkeys(["home_stats", "away_stats"])
+        for t in summary["boxscore"].get("teams", []):
+            side = sides[t["team"]["id"]]
+            stats = {}
+            for stat in t.get("statistics", []):
+                name, value = stat["name"], stat["displayValue"]
+                if name in TEAM_SHOT_STATS:
+                    for n, v in zip(self.split_stat_name(name), self.split_shots(value)):
+                        stats[TEAM_STAT_MAP[n]] = v
+                elif name in TEAM_STAT_MAP:
+                    stats[TEAM_STAT_MAP[name]] = value
+            team = competitors[side]["team"]
+            team_stats[f"{side}_stats"] = self.new_team_stat(
+                Team(
+                    location=team["location"],
+                    name=team["name"],
+                    abbreviation=team["abbreviation"],
+                ),
+                game_id,
+                competitors[side].get("score"),
+                side == "home",
+                stats,
+            )
 
+        if None in team_stats.values():
+            # games not played yet, or postponed, have no box score
+            self.logger.warning(f"summary for game {game_id} has no box score, skipped")
+            return None
+
+        player_stats = {"home_stats": [], "away_stats": []}
+        for t in summary["boxscore"].get("players", []):
+            rows = player_stats[f"{sides[t['team']['id']]}_stats"]
+            for table in t.get("statistics", []):
+                columns = [SUMMARY_LABELS.get(l, l.lower()) for l in table["labels"]]
+                for a in table.get("athletes", []):
+                    rows.append(
+                        self.new_player_stat(
+                            game_id, self.summary_player(a["athlete"]), dict(zip(columns, a["stats"]))
+                        )
+                    )
+
+        return {
+            "type": "game_summary",
+            "game_id": game_id,
+            "data": {"game": game, "team_stats": team_stats, "player_stats": player_stats},
+        }
+
+    # summary_player reads the name from the player's page link, like the boxscore page
+    # rows, and falls back to the display name
+    @staticmethod
+    def summary_player(athlete: dict) -> Player:
+        position = (athlete.get("position") or {}).get("abbreviation")
+        for link in athlete.get("links", []):
+            name = SUMMARY_NAME_RE.search(link.get("href", ""))
+            if name:
+                return Player(
+                    player_id=name.group("pid"),
+                    first_name=name.group("first"),
+                    last_name=name.group("last"),
+                    position=position,
+                )
+        first, _, last = athlete.get("displayName", "").lower().partition(" ")
+        return Player(
+            player_id=str(athlete["id"]), first_name=first, last_name=last, position=position
+        )
+
+    # summary_line reads the favorite and spread from the odds details, e.g. "MIL -6.5", and
+    # the whole points of the over/under like new_line
+    @staticmethod
+    def summary_line(odds: dict) -> Line:
+        details = odds.get("details") or ""
+        if details.upper() == "EVEN":
+            favorite, spread = "EVEN", 0
+        elif " " in details:
+            favorite, spread = details.split()[0], float(details.split()[1])
+        else:
+            favorite, spread = None, None
+        ou = odds.get("overUnder")
+        return Line(favorite=favorite, spread=spread, ou=int(ou) if ou is not None else None)
+
+    # new_team_stat builds one team's TeamStats from its stats keyed by field, every field
+    # not found is set to 0
+    @staticmethod
+    def new_team_stat(team: Team, game_id, pts, home: bool, stats: Dict) -> TeamStats:
+        team_stat = TeamStats(team=team, game_id=game_id, pts=pts, home=home)
+        for field in TeamStats.fields:
+            if field not in TEAM_NO_DEFAULT:
+                team_stat[field] = stats.get(field, 0)
+        return team_stat
+
+    def new_team_stats(self, team_stat: List[str]) -> Dict:
         stat_re = r"data-stat-attr.*\"(?P<stat>[a-zA-Z-]*)\".*>(?P<away>[0-9-]+).*>(?P<home>[0-9-]+)"
         combined_stat_dict = {"home": dict(), "away": dict()}
 
@@ -210,19 +442,19 @@ class NBAESPNSpider(scrapy.Spider):
             s = re.sub(r"[\s]", "", s)
             stats = re.search(stat_re, s)
 
-            if stats.group("stat") in shot_list:
+            if stats.group("stat") in TEAM_SHOT_STATS:
                 stat_made, stat_attempt = self.split_stat_name(stats.group("stat"))
                 home_made_val, home_att_val = self.split_shots(stats.group("home"))
                 away_made_val, away_att_val = self.split_shots(stats.group("away"))
-                mapped_stat_made = stat_map.get(stat_made)
-                mapped_stat_att = stat_map.get(stat_attempt)
+                mapped_stat_made = TEAM_STAT_MAP.get(stat_made)
+                mapped_stat_att = TEAM_STAT_MAP.get(stat_attempt)
                 combined_stat_dict["home"][mapped_stat_made] = home_made_val
                 combined_stat_dict["home"][mapped_stat_att] = home_att_val
                 combined_stat_dict["away"][mapped_stat_made] = away_made_val
                 combined_stat_dict["away"][mapped_stat_att] = away_att_val
 
             else:
-                mapped_stat = stat_map.get(stats.group("stat"))
+                mapped_stat = TEAM_STAT_MAP.get(stats.group("stat"))
                 combined_stat_dict["home"][mapped_stat] = stats.group("home")
                 combined_stat_dict["away"][mapped_stat] = stats.group("away")
 
@@ -239,16 +471,14 @@ class NBAESPNSpider(scrapy.Spider):
         return (s[0], s[1])
 
     # new_player_stats parses the boxscore html table and returns player stats corresponding
-    # to each row in the table
+    # to each row in the table. Each row is tokenized once into its class="..." cells and
+    # every column is filled from that single pass.
     @staticmethod
     def new_player_stats(game_id: int, boxscore: List[str]) -> List[PlayerStats]:
-        name_re = r"id/(?P<pid>[0-9]+)/(?P<first>[a-z]+)-(?P<last>[a-z]+).*position\">(?P<pos>[A-Z]{1,2})"
-
         players = list()
-        fields = PlayerStats().fields
         for line in boxscore:
             # find name information on the table row
-            re_name = re.search(name_re, line)
+            re_name = NAME_RE.search(line)
             if not re_name:
                 continue
             player = Player(
@@ -257,94 +487,47 @@ class NBAESPNSpider(scrapy.Spider):
                 last_name=re_name.group("last"),
                 position=re_name.group("pos"),
             )
-            p_stat_kwargs = {"player": dict(player), "game_id": game_id}
-
-            # check whether play was a DNP and then pull stats
-            try:
-                # define the regex statements for shooting statistics per line
-                ft_re = re.search(r"\"ft\">(?P<m>[0-9]{1,2})-(?P<a>[0-9]{1,2})", line)
-                x3p_re = re.search(r"\"3pt\">(?P<m>[0-9]{1,2})-(?P<a>[0-9]{1,2})", line)
-                fg_re = re.search(r"\"fg\">(?P<m>[0-9]{1,2})-(?P<a>[0-9]{1,2})", line)
-
-                # parse and calculate shooting fields
-
-                p_stat_kwargs["fta"] = int(ft_re.group("a"))
-                p_stat_kwargs["ftm"] = int(ft_re.group("m"))
-                if p_stat_kwargs["fta"] != 0:
-                    p_stat_kwargs["ft_per"] = int(ft_re.group("m")) / int(
-                        ft_re.group("a")
-                    )
-                else:
-                    p_stat_kwargs["ft_per"] = 0
 
-                p_stat_kwargs["fga"] = int(fg_re.group("a"))
-                p_stat_kwargs["fgm"] = int(fg_re.group("m"))
-                if p_stat_kwargs["fga"] != 0:
-                    p_stat_kwargs["fg_per"] = int(fg_re.group("m")) / int(
-                        fg_re.group("a")
-                    )
-                else:
-                    p_stat_kwargs["fg_per"] = 0
-
-                p_stat_kwargs["x3pa"] = int(x3p_re.group("a"))
-                p_stat_kwargs["x3pm"] = int(x3p_re.group("m"))
-                if p_stat_kwargs["x3pa"] != 0:
-                    p_stat_kwargs["x3p_per"] = int(x3p_re.group("m")) / int(
-                        x3p_re.group("a")
-                    )
-                else:
-                    p_stat_kwargs["x3p_per"] = 0
-
-                # parse general statistic fields
-                p_stat_kwargs["min"] = re.search(
-                    r"\"min\">{0,1}([0-9]{1,3})", line
-                ).group(1)
-                p_stat_kwargs["pts"] = re.search(
-                    r"\"pts\">{0,1}([0-9]{1,3})", line
-                ).group(1)
-                p_stat_kwargs["oreb"] = re.search(
-                    r"\"oreb\">{0,1}([0-9]{1,3})", line
-                ).group(1)
-                p_stat_kwargs["dreb"] = re.search(
-                    r"\"dreb\">{0,1}([0-9]{1,3})", line
-                ).group(1)
-                p_stat_kwargs["reb"] = re.search(
-                    r"\"reb\">{0,1}([0-9]{1,3})", line
-                ).group(1)
-                p_stat_kwargs["ast"] = re.search(
-                    r"\"ast\">{0,1}([0-9]{1,3})", line
-                ).group(1)
-                p_stat_kwargs["stl"] = re.search(
-                    r"\"stl\">{0,1}([0-9]{1,3})", line
-                ).group(1)
-                p_stat_kwargs["blk"] = re.search(
-                    r"\"blk\">{0,1}([0-9]{1,3})", line
-                ).group(1)
-                p_stat_kwargs["pf"] = re.search(
-                    r"\"pf\">{0,1}([0-9]{1,3})", line
-                ).group(1)
-                pm = re.search(r"\"plusminus\">\+{0,1}([0-9-]{1,3})", line).group(1)
-                p_stat_kwargs["plusminus"] = pm if (pm != "--") else 0
-            except AttributeError:
-                pass
-
-            ps = PlayerStats()
-
-            # work through stats and set default value if stat not found
-            for k in fields:
-                if k not in ["player", "game_id"]:
-                    ps[k] = p_stat_kwargs.get(k, 0)
-                else:
-                    ps[k] = p_stat_kwargs.get(k, None)
-            players.append(dict(ps))
+            cells = {}
+            for cell in CELL_RE.finditer(line):
+                cells.setdefault(cell.group("cls"), cell.group("val"))
+            players.append(NBAESPNSpider.new_player_stat(game_id, player, cells))
         return players
 
+    # new_player_stat fills a player's PlayerStats from the cells of their boxscore row,
+    # keyed by the column class (fg, 3pt, min, plusminus, ...)
+    @staticmethod
+    def new_player_stat(game_id, player: Player, cells: Dict[str, str]) -> PlayerStats:
+        ps = PlayerStats(player=player, game_id=game_id)
+
+        # DNP rows have none of the stat cells and fall through to the defaults below
+        for col, (made, att, per) in SHOT_COLUMNS.items():
+            shots = SHOT_RE.match(cells.get(col, ""))
+            if shots is None:
+                continue
+            m, a = int(shots.group(1)), int(shots.group(2))
+            ps[made] = m
+            ps[att] = a
+            ps[per] = m / a if a else 0
+
+        for col in COUNT_COLUMNS:
+            count = COUNT_RE.match(cells.get(col, ""))
+            if count is not None:
+                ps[col] = count.group(0)
+
+        pm = PLUSMINUS_RE.match(cells.get("plusminus", ""))
+        if pm is not None:
+            ps.plusminus = pm.group(1) if (pm.group(1) != "--") else 0
+
+        # work through stats and set default value if stat not found
+        return ps.setdefaults(0)
+
     # new_record splits the record string and returns a Record object.
     @staticmethod
     def new_record(record: str) -> Record:
         if record is not None:
             r = record.split("-")
-            return Record(losses=r[0], wins=r[1])
+            return Record(wins=r[0], losses=r[1])
         return Record()
 
     # new_team parses the team html string, including location, full name, and abbreviation
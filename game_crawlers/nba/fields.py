@@ -5,7 +5,9 @@ class Game(scrapy.Item):
     game_id = scrapy.Field()
     date = scrapy.Field()
     home_record = scrapy.Field()
+    home_home_record = scrapy.Field()
     away_record = scrapy.Field()
+    away_away_record = scrapy.Field()
     line = scrapy.Field()
 
 
@@ -23,6 +25,7 @@ class Line(scrapy.Item):
 class Team(scrapy.Item):
     location = scrapy.Field()
     name = scrapy.Field()
+    abbreviation = scrapy.Field()
 
 class TeamStats(scrapy.Item):
     team = scrapy.Field()
@@ -63,7 +66,7 @@ class TeamStats(scrapy.Item):
     oreb_per = scrapy.Field()
     dreb_per = scrapy.Field()
     reb_per = scrapy.Field()
-    ast_per = scrapy.Field
+    ast_per = scrapy.Field()
     stl_per = scrapy.Field()
     blk_per = scrapy.Field()
     tov_per = scrapy.Field()
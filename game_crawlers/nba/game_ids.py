@@ -1,17 +1,23 @@
 from selenium import webdriver
 from selenium.webdriver import DesiredCapabilities, FirefoxProfile
 from selenium.webdriver.firefox.options import Options
-from selenium.common.exceptions import TimeoutException
+from selenium.common.exceptions import TimeoutException, WebDriverException
 from datetime import datetime, timedelta
-from typing import List
+from typing import Dict, Iterable, List
 from itertools import chain
+import argparse
+import multiprocessing
+import queue
 import re
 import os
 import json
+import time
 from calendar import monthrange
 from datetime import datetime
 
-from nba_seasons import Seasons
+from game_crawlers.nba.seasons import Seasons, season_index
+from game_crawlers.nba.id_store import GAME_ID_STORE, GameIdStore
+from game_crawlers.nba.scoreboard_crawler import ESPN_SCOREBOARD_URL
 
 
 """
@@ -21,37 +27,45 @@ games from ESPN given a range of dates.
 
 
 class GameDriver:
-    def __init__(self, url, options):
+    def __init__(self, url, options, store_path: str = GAME_ID_STORE):
         self.driver = webdriver.Firefox(options=options)
         self.driver.set_page_load_timeout(30)
         self.base_url = url
+        self.store = GameIdStore(store_path)
 
     def get_games_daterange(self, start: datetime, end: datetime) -> List[str]:
         if start > end:
             raise ValueError("start date cannot be later than end date")
-        d = self._get_dates(start, end)
-        for date in d:
+        self.get_games_dates(self._get_dates(start, end))
+
+    def get_games_dates(self, dates: Iterable[datetime]):
+        # a date whose page could not be loaded is not written, so it is fetched next time
+        for date in dates:
             print(f"getting game urls for {date}")
-            games = self._get_games_url(date)
+            try:
+                games = self._get_games_url(date)
+            except WebDriverException as e:
+                print(f"failed to get game urls for {date}: {e}")
+                continue
             self.write_to_file(games, date)
 
     def _date_to_url(self, d: datetime) -> str:
         return f"{self.base_url}{d.year}{d.month :02d}{d.day :02d}"
 
+    # _get_games_url raises TimeoutException once the page has timed out three times, and
+    # lets any other driver error through, so a page that never loaded is not read as a
+    # day without games
     def _get_games_url(self, date: str) -> List[str]:
-        retry = 0
         t = datetime.now()
         u = self._date_to_url(date)
-        while retry < 3:
+        for _ in range(3):
             try:
                 self.driver.get(u)
-                retry = 3
+                break
             except TimeoutException:
                 print("timed out, retrying")
-                retry += 1
-            except Exception as e:
-                print(e)
-                retry = 3
+        else:
+            raise TimeoutException(f"{u} timed out 3 times")
 
         l = self.driver.find_elements_by_xpath('//a[@class="mobileScoreboardLink"]')
         out = [re.findall(r"gameId=([0-9]+)", i.get_attribute("href")) for i in l]
@@ -65,39 +79,174 @@ class GameDriver:
         d = (end + timedelta(days=1) - start).days
         return [start + timedelta(days=i) for i in range(d)]
 
-    @staticmethod
-    def _dt_to_str(date: datetime) -> str:
-        return f"game_ids_{date.year}{date.month}{date.day}"
-
     def write_to_file(self, games: dict, date: datetime):
-        if not os.path.exists("/mnt/game_ids"):
-            os.makedirs("/mnt/game_ids")
-        with open(
-            os.path.join("/mnt/game_ids", f"{self._dt_to_str(date)}.json"), "w"
-        ) as f:
-            json.dump(games, f)
+        self.store.append(date, games)
         print(f"wrote game ids for {date} to file")
 
+    def close(self):
+        self.store.close()
+        try:
+            self.driver.quit()
+        except WebDriverException:
+            pass
 
-if __name__ == "__main__":
 
+def headless_options(headless: bool = True) -> Options:
     options = Options()
-    options.headless = True
-    u = "https://www.espn.com/nba/scoreboard/_/date/"
-    g_driver = GameDriver(u, options)
-    for k in Seasons.season_info.keys():
-        try:
-            g_driver.get_games_daterange(
-                Seasons.season_info[k].get("regular_season_start"),
-                Seasons.season_info[k].get("regular_season_end"),
-            )
-            g_driver.get_games_daterange(
-                Seasons.season_info[k].get("post_season_start"),
-                Seasons.season_info[k].get("post_season_end"),
-            )
-        except Exception as e:
-            print(e)
-            print(f"failed to get game_ids for season {k}")
-    g_driver.driver.close()
+    options.headless = headless
+    return options
+
+
+def _pool_worker(wid: int, base_url: str, headless: bool, store_path: str, tasks, events):
+    # pulls dates until it receives None. A driver that fails, or a page that keeps timing
+    # out, is shut down and replaced and the date is retried on the new browser. A date that
+    # fails three times is reported failed and not written to the store.
+    g_driver = None
+    store = GameIdStore(store_path)
+    while True:
+        date = tasks.get()
+        if date is None:
+            break
+        events.put(("start", wid, date))
+        if store.has_date(date):
+            events.put(("done", wid, date, 0))
+            continue
+        for _ in range(3):
+            try:
+                if g_driver is None:
+                    g_driver = GameDriver(base_url, headless_options(headless), store_path)
+                games = g_driver._get_games_url(date)
+                g_driver.write_to_file(games, date)
+                events.put(("done", wid, date, len(games)))
+                break
+            except WebDriverException as e:
+                print(f"worker {wid} driver failed on {date}, restarting: {e}")
+                if g_driver is not None:
+                    g_driver.close()
+                g_driver = None
+        else:
+            events.put(("failed", wid, date))
+    store.close()
+    if g_driver is not None:
+        g_driver.close()
+
+
+class GameDriverPool:
+    """
+    Runs GameDriver browsers in worker processes. Dates are handed out from a shared queue
+    so the season date ranges are sharded dynamically across workers; a worker process that
+    dies is replaced and its in flight date is queued again. Dates already in the GameIdStore
+    are skipped, so every date is written once.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        workers: int,
+        store_path: str = GAME_ID_STORE,
+        headless: bool = True,
+        report_every: float = 60,
+    ):
+        self.base_url = base_url
+        self.workers = workers
+        self.store_path = store_path
+        self.headless = headless
+        self.report_every = report_every
+        self.ctx = multiprocessing.get_context("spawn")
+
+    def _start(self, wid: int, tasks, events):
+        p = self.ctx.Process(
+            target=_pool_worker,
+            args=(wid, self.base_url, self.headless, self.store_path, tasks, events),
+            daemon=True,
+        )
+        p.start()
+        return p
+
+    def run(self, dates: Iterable[datetime]) -> List[datetime]:
+        # returns the dates that could not be fetched
+        store = GameIdStore(self.store_path)
+        remaining = set(store.missing_dates(dates))
+        store.close()
+        tasks = self.ctx.Queue()
+        events = self.ctx.Queue()
+        for d in sorted(remaining):
+            tasks.put(d)
+
+        procs = {wid: self._start(wid, tasks, events) for wid in range(self.workers)}
+        in_flight: Dict[int, datetime] = {}
+        completed = {wid: 0 for wid in procs}
+        failed = []
+        started = last_report = time.monotonic()
+
+        while remaining:
+            try:
+                event = events.get(timeout=5)
+            except queue.Empty:
+                event = None
+
+            if event is not None:
+                kind, wid, date = event[:3]
+                if kind == "start":
+                    in_flight[wid] = date
+                else:
+                    in_flight.pop(wid, None)
+                    remaining.discard(date)
+                    if kind == "done":
+                        completed[wid] += 1
+                    else:
+                        failed.append(date)
+
+            for wid, p in procs.items():
+                if not p.is_alive() and remaining:
+                    date = in_flight.pop(wid, None)
+                    print(f"worker {wid} exited with {p.exitcode}, restarting")
+                    if date in remaining:
+                        tasks.put(date)
+                    procs[wid] = self._start(wid, tasks, events)
+
+            now = time.monotonic()
+            if now - last_report >= self.report_every:
+                last_report = now
+                self.report(completed, now - started, len(remaining))
+
+        for _ in procs:
+            tasks.put(None)
+        for p in procs.values():
+            p.join()
+        self.report(completed, time.monotonic() - started, 0)
+        return failed
+
+    @staticmethod
+    def report(completed: Dict[int, int], elapsed: float, remaining: int):
+        minutes = max(elapsed / 60, 1e-9)
+        rates = ", ".join(
+            f"worker {wid}: {n / minutes:.1f}/min" for wid, n in completed.items()
+        )
+        print(f"{sum(completed.values())} dates done, {remaining} remaining - {rates}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="collect ESPN game ids for each date")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--season", action="append", help="season to collect, e.g. 05-06")
+    parser.add_argument("--base-url", default=ESPN_SCOREBOARD_URL)
+    parser.add_argument("--store", default=GAME_ID_STORE)
+    args = parser.parse_args()
+
+    if args.workers > 1:
+        pool = GameDriverPool(args.base_url, args.workers, args.store)
+        failed = pool.run(season_index.dates(seasons=args.season))
+        if failed:
+            print(f"failed to get game_ids for {len(failed)} dates: {failed}")
+    else:
+        g_driver = GameDriver(args.base_url, headless_options(), args.store)
+        for k in args.season or Seasons.season_info.keys():
+            try:
+                g_driver.get_games_dates(season_index.dates(seasons=[k]))
+            except Exception as e:
+                print(e)
+                print(f"failed to get game_ids for season {k}")
+        g_driver.driver.close()
 
     print("wrote game ids to file")
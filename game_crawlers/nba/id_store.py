@@ -0,0 +1,160 @@
+import argparse
+import json
+import os
+import re
+import sqlite3
+from datetime import date
+from typing import Dict, Iterable, List, Tuple
+
+from game_crawlers.nba.seasons import season_index
+
+# directory the legacy per date game id files were written to
+GAME_ID_DIR = os.environ.get("GAME_ID_DIR", "/mnt/game_ids")
+GAME_ID_STORE = os.environ.get("GAME_ID_STORE", os.path.join(GAME_ID_DIR, "game_ids.sqlite"))
+
+
+# file_dates returns the dates a legacy game id file can belong to. The files are named
+# game_ids_{year}{month}{day} without zero padding, so neither part starts with 0 and
+# game_ids_2019111.json could be Jan 11 or Nov 1. Every valid reading is returned.
+def file_dates(name: str) -> List[date]:
+    m = re.match(r"game_ids_([0-9]{4})([0-9]{2,4})\.json$", name)
+    if not m:
+        return []
+    year, md = int(m.group(1)), m.group(2)
+    dates = []
+    for i in range(1, len(md)):
+        if md[i] == "0":
+            continue
+        try:
+            dates.append(date(year, int(md[:i]), int(md[i:])))
+        except ValueError:
+            continue
+    return dates
+
+
+class GameIdStore:
+    """
+    Append-only store of the ESPN game ids found on each date. Every fetched date gets a row
+    in scoreboards, including days without games, so missing dates can be told apart from
+    empty ones. Ids are indexed by date for range queries. The database runs in WAL mode so
+    several crawler processes can append while others read.
+    """
+
+    def __init__(self, path: str = GAME_ID_STORE):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=60)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS scoreboards (
+                date TEXT PRIMARY KEY,
+                games INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS game_ids (
+                date TEXT NOT NULL,
+                game_id TEXT NOT NULL,
+                PRIMARY KEY (date, game_id)
+            );
+            """
+        )
+        self.conn.commit()
+
+    # append records the ids found for d in one transaction, so a date is either fully
+    # stored or not at all
+    def append(self, d: date, ids: Iterable[str]):
+        ids = list(dict.fromkeys(str(i) for i in ids))
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO scoreboards VALUES (?, ?)", (d.isoformat(), len(ids))
+            )
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO game_ids VALUES (?, ?)",
+                [(d.isoformat(), i) for i in ids],
+            )
+
+    def has_date(self, d: date) -> bool:
+        row = self.conn.execute(
+            "SELECT 1 FROM scoreboards WHERE date = ?", (d.isoformat(),)
+        ).fetchone()
+        return row is not None
+
+    def ids_between(self, start: date = None, end: date = None) -> List[str]:
+        start = start.isoformat() if start else "0000-00-00"
+        end = end.isoformat() if end else "9999-99-99"
+        return [
+            r[0]
+            for r in self.conn.execute(
+                "SELECT game_id FROM game_ids WHERE date BETWEEN ? AND ? ORDER BY date, game_id",
+                (start, end),
+            )
+        ]
+
+    def seasons_of(self, ids: Iterable[str], chunk_size: int = 500) -> Dict[str, str]:
+        # the season of each id, from the date it was found on. Ids not in the store, or
+        # found on a date outside every season, are left out.
+        ids = [str(i) for i in ids]
+        seasons = {}
+        for i in range(0, len(ids), chunk_size):
+            chunk = ids[i : i + chunk_size]
+            rows = self.conn.execute(
+                f"SELECT game_id, date FROM game_ids WHERE game_id IN ({','.join('?' * len(chunk))})",
+                chunk,
+            )
+            for game_id, d in rows:
+                season = season_index.season(date.fromisoformat(d))
+                if season is not None:
+                    seasons[game_id] = season
+        return seasons
+
+    def missing_dates(self, dates: Iterable[date]) -> List[date]:
+        fetched = {r[0] for r in self.conn.execute("SELECT date FROM scoreboards")}
+        return [d for d in dates if d.isoformat() not in fetched]
+
+    def import_dir(self, fp: str) -> Tuple[int, int]:
+        # one-shot import of the legacy game_ids_*.json files. A file name that reads as
+        # two dates is assigned to the one inside a season. Returns (files, ids) imported.
+        files = ids = 0
+        for f in sorted(os.listdir(fp)):
+            dates = file_dates(f)
+            if not dates:
+                continue
+            in_season = [d for d in dates if season_index.lookup(d)]
+            d = (in_season or dates)[0]
+            with open(os.path.join(fp, f)) as js:
+                games = json.load(js)
+            self.append(d, games)
+            files += 1
+            ids += len(games)
+        return files, ids
+
+    def stats(self) -> dict:
+        dates, first, last = self.conn.execute(
+            "SELECT COUNT(*), MIN(date), MAX(date) FROM scoreboards"
+        ).fetchone()
+        ids = self.conn.execute("SELECT COUNT(*) FROM game_ids").fetchone()[0]
+        return {"dates": dates, "game_ids": ids, "first": first, "last": last}
+
+    def close(self):
+        self.conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="manage the game id store")
+    parser.add_argument("command", choices=["import", "missing", "stats"])
+    parser.add_argument("--store", default=GAME_ID_STORE)
+    parser.add_argument("--dir", default=GAME_ID_DIR, help="directory of game_ids_*.json files")
+    parser.add_argument("--season", action="append", help="season to check, e.g. 05-06")
+    args = parser.parse_args()
+
+    store = GameIdStore(args.store)
+    if args.command == "import":
+        files, ids = store.import_dir(args.dir)
+        print(f"imported {ids} game ids from {files} files")
+    elif args.command == "missing":
+        for d in store.missing_dates(season_index.dates(seasons=args.season)):
+            print(d.isoformat())
+    else:
+        print(json.dumps(store.stats(), indent=2))
+    store.close()
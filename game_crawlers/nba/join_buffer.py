@@ -0,0 +1,140 @@
+import json
+import sqlite3
+import time
+import zlib
+from collections import OrderedDict
+from typing import Optional
+
+from game_crawlers.nba.records import json_default
+
+
+class GameJoinBuffer:
+    """
+    Holds the game, team_stats and player_stats fragments for each game until all three have
+    arrived. The in memory buffer is capped by an estimated size in bytes and by fragment
+    age; partial games that go over either limit are spilled to a compressed sqlite store
+    and pulled back in, as plain dicts, if the rest of their fragments show up later. Partial
+    games left at close are kept in the spill store so a later run can still complete them.
+    """
+
+    FIELDS = frozenset(["game", "team_stats", "player_stats"])
+
+    def __init__(self, spill_path: str, max_bytes: int = 64 * 2 ** 20, max_age: float = 600):
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.games = OrderedDict()  # game_id -> (first seen time, size per kind, fragments)
+        self.size = 0
+        self.completed = 0
+        self.spilled_total = 0
+        self.abandoned = 0
+
+        self.store = sqlite3.connect(spill_path)
+        self.store.execute(
+            "CREATE TABLE IF NOT EXISTS partial_games "
+            "(game_id TEXT PRIMARY KEY, fragments BLOB NOT NULL, spilled_at REAL NOT NULL)"
+        )
+        self.store.commit()
+        self.spilled = {
+            r[0] for r in self.store.execute("SELECT game_id FROM partial_games")
+        }
+
+    def add(self, game_id, kind: str, data) -> Optional[dict]:
+        """
+        Adds a fragment and returns the joined record once the game is complete, otherwise
+        None.
+        """
+        key = str(game_id)
+        if key in self.games:
+            # updated in place below, so the game keeps its place in age order for evict
+            first_seen, sizes, fragments = self.games[key]
+        elif key in self.spilled:
+            fragments = self._unspill(key)
+            first_seen = time.monotonic()
+            sizes = {k: self._size(v) for k, v in fragments.items()}
+            self.size += sum(sizes.values())
+        else:
+            fragments = {}
+            first_seen = time.monotonic()
+            sizes = {}
+
+        fragments[kind] = data
+        if self.FIELDS.issubset(fragments.keys()):
+            self.games.pop(key, None)
+            self.size -= sum(sizes.values())
+            self.completed += 1
+            return fragments
+
+        # only the new fragment is measured, the game's other fragments keep their size
+        size = self._size(data)
+        self.size += size - sizes.get(kind, 0)
+        sizes[kind] = size
+        self.games[key] = (first_seen, sizes, fragments)
+        self.evict()
+        return None
+
+    def spill(self, game_id):
+        # moves a partial game to the spill store now, for games known to be incomplete
+        key = str(game_id)
+        if key in self.games:
+            self._spill(key)
+            self.store.commit()
+
+    def evict(self):
+        # spills the oldest partial games while over the byte cap or past max_age
+        now = time.monotonic()
+        while self.games:
+            key, (first_seen, _, _) = next(iter(self.games.items()))
+            if self.size <= self.max_bytes and now - first_seen < self.max_age:
+                break
+            self._spill(key)
+        self.store.commit()
+
+    def partial(self):
+        # every partial game, held in memory or spilled, as (game id, fragments)
+        for key, (_, _, fragments) in self.games.items():
+            yield key, fragments
+        for key, blob in self.store.execute("SELECT game_id, fragments FROM partial_games"):
+            yield key, json.loads(zlib.decompress(blob).decode("utf-8"))
+
+    def close(self):
+        for key in list(self.games.keys()):
+            self._spill(key)
+        self.store.commit()
+        self.abandoned = len(self.spilled)
+        self.store.close()
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self.games),
+            "pending_bytes": self.size,
+            "spilled": len(self.spilled),
+            "spilled_total": self.spilled_total,
+            "completed": self.completed,
+            "abandoned": self.abandoned,
+        }
+
+    def _spill(self, key: str):
+        _, sizes, fragments = self.games.pop(key)
+        self.size -= sum(sizes.values())
+        blob = zlib.compress(json.dumps(fragments, default=json_default).encode("utf-8"))
+        self.store.execute(
+            "INSERT OR REPLACE INTO partial_games VALUES (?, ?, ?)",
+            (key, blob, time.time()),
+        )
+        self.spilled.add(key)
+        self.spilled_total += 1
+
+    @staticmethod
+    def _size(data) -> int:
+        # estimated bytes of a fragment, as the length of its json
+        return len(json.dumps(data, default=json_default))
+
+    def _unspill(self, key: str) -> dict:
+        row = self.store.execute(
+            "SELECT fragments FROM partial_games WHERE game_id = ?", (key,)
+        ).fetchone()
+        self.store.execute("DELETE FROM partial_games WHERE game_id = ?", (key,))
+        self.spilled.discard(key)
+        if row is None:
+            return {}
+        return json.loads(zlib.decompress(row[0]).decode("utf-8"))
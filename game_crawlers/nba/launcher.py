@@ -0,0 +1,181 @@
+import math
+import multiprocessing
+import os
+import queue
+import signal
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from scrapy.settings import Settings
+
+from game_crawlers.nba.throttle import DEFAULT_HOST_BUDGETS, split_budgets
+
+# stats that are gauges, not counters, and merge by taking the largest
+PEAK_NAMES = ("delay", "latency", "elapsed_time_seconds")
+
+# a shard is the part of the crawl one worker process runs: (unit label, game ids) pairs
+Shard = List[Tuple[str, List[str]]]
+
+
+def shard_units(units: List[Tuple[str, List[str]]], workers: int) -> List[Shard]:
+    # splits the planned units (seasons or date ranges) between at most workers shards of
+    # about the same number of games. Units larger than a fair share are cut into runs of
+    # consecutive ids first, so a single date range still uses every worker, and the pieces
+    # go largest first to the shard with the fewest games.
+    total = sum(len(ids) for _, ids in units)
+    if total == 0:
+        return []
+    share = math.ceil(total / workers)
+    pieces = [
+        (label, ids[i : i + share]) for label, ids in units for i in range(0, len(ids), share)
+    ]
+    shards: List[Shard] = [[] for _ in range(workers)]
+    games = [0] * workers
+    for label, ids in sorted(pieces, key=lambda p: len(p[1]), reverse=True):
+        w = games.index(min(games))
+        shards[w].append((label, ids))
+        games[w] += len(ids)
+    return [s for s in shards if s]
+
+
+def worker_settings(settings: Settings, workers: int, index: int) -> dict:
+    # the settings of one of workers processes crawling side by side: the per host
+    # politeness budget, download delay and per domain concurrency are divided between the
+    # workers so together they are as polite as one process, and files each crawl writes
+    # go to a directory of their own
+    values = settings.copy_to_dict()
+    budgets = dict(DEFAULT_HOST_BUDGETS)
+    budgets.update(settings.getdict("ADAPTIVE_CONCURRENCY_HOSTS"))
+    values["ADAPTIVE_CONCURRENCY_HOSTS"] = split_budgets(budgets, workers)
+    values["DOWNLOAD_DELAY"] = settings.getfloat("DOWNLOAD_DELAY") * workers
+    values["AUTOTHROTTLE_TARGET_CONCURRENCY"] = (
+        settings.getfloat("AUTOTHROTTLE_TARGET_CONCURRENCY", 1.0) / workers
+    )
+    for name in ("CONCURRENT_REQUESTS_PER_DOMAIN", "CONCURRENT_REQUESTS_PER_IP"):
+        if settings.getint(name) > 0:
+            values[name] = max(1, settings.getint(name) // workers)
+    for name in ("TELEMETRY_DIR", "PROFILE_DIR"):
+        if settings.get(name):
+            values[name] = os.path.join(settings.get(name), f"worker-{index}")
+    # each worker also spills partial games to a sqlite store of its own, so they never
+    # wait on each other's writes: join_spill.sqlite becomes join_spill.worker-0.sqlite
+    base, ext = os.path.splitext(settings.get("JOIN_SPILL_PATH", "join_spill.sqlite"))
+    values["JOIN_SPILL_PATH"] = f"{base}.worker-{index}{ext}"
+    if settings.get("EXPORT_SPILL_PATH"):
+        base, ext = os.path.splitext(settings.get("EXPORT_SPILL_PATH"))
+        values["EXPORT_SPILL_PATH"] = f"{base}.worker-{index}{ext}"
+    values["LOG_FORMAT"] = (
+        f"%(asctime)s [worker {index}] [%(name)s] %(levelname)s: %(message)s"
+    )
+    return values
+
+
+def run_worker(index: int, results, spider_cls, values: dict, ids: List[str],
+               spider_kwargs: dict):
+    # runs in the worker process: one crawler process, spider and pipelines for the shard
+    from scrapy.crawler import CrawlerProcess
+
+    try:
+        process = CrawlerProcess(values)
+        crawler = process.create_crawler(spider_cls)
+        process.crawl(crawler, ids=ids, **spider_kwargs)
+        process.start()
+        results.put((index, crawler.stats.get_stats(), None))
+    except BaseException as e:
+        results.put((index, None, repr(e)))
+        raise
+
+
+def run_workers(spider_cls, settings: Settings, shards: List[Shard],
+                **spider_kwargs) -> List[Optional[dict]]:
+    """
+    Crawls every shard in a worker process of its own, all at once, and returns each
+    worker's scrapy stats in shard order, None for workers that failed. Workers are started
+    with spawn, so none of them inherits the reactor, database connections or open files of
+    this process. Ctrl-C reaches the workers, which shut down the way a single crawl does,
+    and this process waits for them.
+    """
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    processes = []
+    for index, shard in enumerate(shards):
+        p = ctx.Process(
+            target=run_worker,
+            args=(
+                index,
+                results,
+                spider_cls,
+                worker_settings(settings, len(shards), index),
+                [i for _, ids in shard for i in ids],
+                spider_kwargs,
+            ),
+            name=f"crawl-worker-{index}",
+        )
+        p.start()
+        processes.append(p)
+
+    def interrupted(signum, frame):
+        print("interrupted, waiting for the workers to stop")
+
+    previous = signal.signal(signal.SIGINT, interrupted)
+    stats: List[Optional[dict]] = [None] * len(shards)
+    try:
+        received = 0
+        while received < len(processes):
+            try:
+                index, worker_stats, error = results.get(timeout=1)
+            except queue.Empty:
+                # a worker killed outright never reports
+                if not any(p.is_alive() for p in processes) and results.empty():
+                    break
+                continue
+            received += 1
+            stats[index] = worker_stats
+            if error is not None:
+                print(f"worker {index} failed: {error}")
+        for p in processes:
+            p.join()
+    finally:
+        signal.signal(signal.SIGINT, previous)
+    for index, p in enumerate(processes):
+        if stats[index] is None and p.exitcode:
+            print(f"worker {index} exited with code {p.exitcode}")
+    return stats
+
+
+def crawl_finished(stats: Optional[dict]) -> bool:
+    # whether a crawl ran to the end and wrote every game it was given: not failed, not
+    # shut down early (Ctrl-C, close spider), without games the spider gave up on after a
+    # failed request or parse, and without batches the database writer gave up on. A unit
+    # left open is planned again from its games still missing from the database.
+    return (
+        stats is not None
+        and stats.get("finish_reason") == "finished"
+        and not stats.get("games/incomplete")
+        and not stats.get("db/games_lost")
+    )
+
+
+def merge_stats(worker_stats: List[dict]) -> Dict:
+    # one summary of the workers' stats: counters are summed, peaks (names with max, and
+    # the last/current delay and latency gauges) take the largest value, start_time the
+    # earliest and finish_time the latest, and differing strings are listed
+    merged = {}
+    for stats in worker_stats:
+        for key, value in stats.items():
+            if key not in merged:
+                merged[key] = value
+                continue
+            name = key.rsplit("/", 1)[-1]
+            current = merged[key]
+            if isinstance(value, datetime):
+                merged[key] = min(current, value) if key == "start_time" else max(current, value)
+            elif isinstance(value, str):
+                values = set(current.split(", ")) | {value}
+                merged[key] = ", ".join(sorted(values))
+            elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                if "max" in name or name.startswith("last_") or name in PEAK_NAMES:
+                    merged[key] = max(current, value)
+                else:
+                    merged[key] = current + value
+    return merged
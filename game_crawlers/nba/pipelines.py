@@ -1,36 +1,364 @@
 import json
-import scrapy
-from db import nba
 import os
+import time
+from typing import Tuple
+import scrapy
+from twisted.internet import task
+from twisted.python.failure import Failure
+from db import export, nba
+from game_crawlers.nba.background_writer import BackgroundWriter
+from game_crawlers.nba.join_buffer import GameJoinBuffer
+from game_crawlers.nba.records import json_default
+from game_crawlers.nba.telemetry import games_committed
 
 # TODO add SQL Pipeline instead
 
-USER = os.environ["dbName"]
-PASSWORD = os.environ["dbPass"]
-
 
 class DBWriterPipeline(object):
+    """
+    Joins the game, team_stats and player_stats fragments for a game and writes completed
+    games to the database. Commits are batched: a batch is flushed once it holds
+    DB_COMMIT_GAMES games or DB_COMMIT_SECONDS seconds have passed since it was started,
+    whichever comes first, and any partial batch is flushed when the spider closes.
+    Fragments waiting for the rest of their game are held in a GameJoinBuffer, and spilled
+    as soon as the spider reports a page of the game failed. Items from the ESPN summary
+    mode are complete games and go straight to the batch. Every commit is announced with
+    the telemetry games_committed signal.
+
+    Batches are written and committed by a BackgroundWriter thread, off the reactor, with at
+    most DB_WRITER_QUEUE batches waiting or being written (0 writes them on the reactor
+    thread instead). When the writer is that far behind the engine is paused and new items
+    wait until a batch is done, so a slow database slows the crawl down instead of filling
+    memory. A failed batch is rolled back, logged and counted in db/write_errors and
+    db/games_lost; its games are not in the database, so the next run crawls them again.
+    close_spider waits for every batch to be written.
+    """
+
+    def __init__(
+        self,
+        commit_games: int = 50,
+        commit_seconds: float = 30,
+        stats=None,
+        join_settings: dict = None,
+        signals=None,
+        writer_batches: int = 4,
+        crawler=None,
+    ):
+        self.commit_games = commit_games
+        self.commit_seconds = commit_seconds
+        self.stats = stats
+        self.signals = signals
+        self.writer_batches = writer_batches
+        self.crawler = crawler
+        self.join_settings = join_settings or {"spill_path": "join_spill.sqlite"}
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(
+            commit_games=crawler.settings.getint("DB_COMMIT_GAMES", 50),
+            commit_seconds=crawler.settings.getfloat("DB_COMMIT_SECONDS", 30),
+            stats=crawler.stats,
+            join_settings=cls.join_settings_from(crawler.settings),
+            signals=crawler.signals,
+            writer_batches=crawler.settings.getint("DB_WRITER_QUEUE", 4),
+            crawler=crawler,
+        )
+
+    @staticmethod
+    def join_settings_from(settings) -> dict:
+        return {
+            "spill_path": settings.get("JOIN_SPILL_PATH", "join_spill.sqlite"),
+            "max_bytes": settings.getint("JOIN_BUFFER_MAX_BYTES", 64 * 2 ** 20),
+            "max_age": settings.getfloat("JOIN_BUFFER_MAX_AGE", 600),
+        }
+
     def open_spider(self, spider):
-        self.db = nba.nbaDB(USER, PASSWORD)
-        self.async_data = {}
+        self.open_writer(spider)
+        self.writer = None
+        self.paused_at = None
+        if self.writer_batches > 0:
+            self.writer = BackgroundWriter(
+                self.write_and_commit,
+                self.writer_batches,
+                on_done=lambda batch, rows, seconds: self.batch_written(spider, batch, rows, seconds),
+                on_error=lambda batch, failure, seconds: self.batch_failed(spider, batch, failure),
+                on_full=lambda: self.pause(spider),
+                on_room=lambda: self.unpause(spider),
+            )
+            self.writer.start()
+        self.async_data = GameJoinBuffer(**self.join_settings)
+        self.pending = []
+        self.pending_ids = []
+        self.batch_started = None
+        self.flush_timer = None
+        if self.commit_seconds > 0:
+            self.flush_timer = task.LoopingCall(self._flush_if_stale, spider)
+            self.flush_timer.start(self.commit_seconds, now=False)
 
     def close_spider(self, spider):
-        self.db.session.commit()
-        self.db.session.close()
+        if self.flush_timer is not None and self.flush_timer.running:
+            self.flush_timer.stop()
+        self.flush(spider)
+        if self.writer is None:
+            self.finish(spider)
+            return None
+        # the spider closes once the writer has written everything it was given
+        d = self.writer.close()
+        d.addCallback(lambda _: self.finish(spider))
+        return d
+
+    def finish(self, spider):
+        self.async_data.close()
+        self._record_join_stats(spider)
+        if self.async_data.abandoned:
+            spider.logger.warning(
+                f"{self.async_data.abandoned} incomplete games left in "
+                f"{self.join_settings['spill_path']}"
+            )
+        self.close_writer(spider)
+
+    # open_writer, commit and close_writer hold everything specific to the database, so
+    # subclasses can send the joined games somewhere else
+    def open_writer(self, spider):
+        self.db = nba.nbaDB()
+        self.db.warm_cache()
+
+    def commit(self):
+        self.db.commit()
+
+    def rollback(self):
+        self.db.rollback()
+
+    def close_writer(self, spider):
+        spider.logger.info(f"identity cache stats: {self.db.cache_stats()}")
+        self.db.close()
 
     def process_item(self, item, spider):
+        if self.writer is not None and self.writer.full():
+            # backpressure, the item waits until the writer finishes a batch
+            d = self.writer.when_room()
+            d.addCallback(lambda _: self.process_item(item, spider))
+            return d
         gid = item.get("game_id")
-        fields = ["player_stats", "game", "team_stats"]
+        if item.get("type") == "game_summary":
+            # summary items already hold the whole game
+            self.write_game(item.get("data"), spider, gid)
+            return f"game{gid} processed"
+        if item.get("type") == "game_incomplete":
+            # a page of the game failed, so its other fragments wait in the spill store
+            self.async_data.spill(gid)
+            return f"game{gid} incomplete"
+        record = self.async_data.add(gid, item.get("type"), item.get("data"))
+        if record is not None:
+            self.write_game(record, spider, gid)
+        return f"game{gid} processed"
 
-        if gid not in self.async_data:
-            self.async_data[gid] = {}
-        self.async_data[gid][item.get("type")] = item.get("data")
+    def write_game(self, record: dict, spider, game_id=None):
+        if self.batch_started is None:
+            self.batch_started = time.monotonic()
+        self.pending.append(record)
+        self.pending_ids.append(game_id)
+        if len(self.pending) >= self.commit_games:
+            self.flush(spider)
+        elif self.commit_seconds > 0 and self._batch_age() >= self.commit_seconds:
+            self.flush(spider)
 
-        if set(self.async_data[gid].keys()) == set(fields):
-            self.db.add_record(self.async_data[gid])
-            del self.async_data[gid]
-            self.db.session.commit()
-        return f"game{gid} processed"
+    def write_batch(self, records: list) -> int:
+        # adds the batch to the session one game at a time, returns number of rows written
+        return sum(self.db.add_record(record) for record in records)
+
+    # write_and_commit writes one batch, on the writer thread unless DB_WRITER_QUEUE is 0
+    def write_and_commit(self, batch: tuple) -> int:
+        records, _ = batch
+        try:
+            rows = self.write_batch(records)
+            self.commit()
+        except Exception:
+            self.rollback()
+            raise
+        return rows
+
+    def flush(self, spider):
+        if not self.pending:
+            return
+        batch = (self.pending, self.pending_ids)
+        self.pending = []
+        self.pending_ids = []
+        self.batch_started = None
+        if self.writer is not None:
+            self.writer.submit(batch)
+            if self.stats is not None:
+                self.stats.max_value("db/max_writer_queue", self.writer.queued, spider=spider)
+            return
+        t = time.perf_counter()
+        try:
+            rows = self.write_and_commit(batch)
+        except Exception:
+            self.batch_failed(spider, batch, Failure())
+        else:
+            self.batch_written(spider, batch, rows, time.perf_counter() - t)
+
+    def batch_written(self, spider, batch: tuple, rows: int, elapsed: float):
+        records, game_ids = batch
+        if self.stats is not None:
+            self.stats.inc_value("db/flush_count", spider=spider)
+            self.stats.inc_value("db/games_written", len(records), spider=spider)
+            self.stats.inc_value("db/rows_written", rows, spider=spider)
+            self.stats.set_value("db/last_batch_size", len(records), spider=spider)
+            self.stats.max_value("db/max_batch_size", len(records), spider=spider)
+            self.stats.set_value("db/last_flush_seconds", round(elapsed, 4), spider=spider)
+            self.stats.max_value("db/max_flush_seconds", round(elapsed, 4), spider=spider)
+            self.stats.inc_value("db/flush_seconds_total", elapsed, spider=spider)
+            self._record_join_stats(spider)
+        if self.signals is not None:
+            self.signals.send_catch_log(
+                games_committed, game_ids=game_ids, seconds=elapsed, rows=rows
+            )
+        spider.logger.info(
+            f"committed {len(records)} games ({rows} rows) in {elapsed:.2f}s "
+            f"- {rows / elapsed if elapsed else 0:.0f} rows/sec"
+        )
+
+    def batch_failed(self, spider, batch: tuple, failure):
+        records, game_ids = batch
+        if self.stats is not None:
+            self.stats.inc_value("db/write_errors", spider=spider)
+            self.stats.inc_value("db/games_lost", len(records), spider=spider)
+        spider.logger.error(
+            f"writing {len(records)} games failed, rolled back: {failure.getErrorMessage()}",
+            exc_info=(failure.type, failure.value, failure.getTracebackObject()),
+        )
+
+    # pause and unpause stop the engine from starting new requests while the writer is full
+    def pause(self, spider):
+        if self.crawler is None:
+            return
+        self.paused_at = time.monotonic()
+        self.crawler.engine.pause()
+        if self.stats is not None:
+            self.stats.inc_value("db/writer_pauses", spider=spider)
+
+    def unpause(self, spider):
+        if self.paused_at is None:
+            return
+        self.crawler.engine.unpause()
+        if self.stats is not None:
+            self.stats.inc_value(
+                "db/writer_paused_seconds", time.monotonic() - self.paused_at, spider=spider
+            )
+        self.paused_at = None
+
+    def _record_join_stats(self, spider):
+        if self.stats is None:
+            return
+        for k, v in self.async_data.stats().items():
+            self.stats.set_value(f"join/{k}", v, spider=spider)
+
+    def _batch_age(self) -> float:
+        if self.batch_started is None:
+            return 0
+        return time.monotonic() - self.batch_started
+
+    def _flush_if_stale(self, spider):
+        if self._batch_age() >= self.commit_seconds:
+            self.flush(spider)
+
+
+class BulkDBWriterPipeline(DBWriterPipeline):
+    """
+    Drop in replacement for DBWriterPipeline that writes each batch with nbaDB.add_records,
+    using set based upserts and COPY for the stats tables instead of one ORM round trip
+    per row. Batches default to DB_BULK_GAMES games.
+    """
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(
+            commit_games=crawler.settings.getint(
+                "DB_BULK_GAMES", crawler.settings.getint("DB_COMMIT_GAMES", 100)
+            ),
+            commit_seconds=crawler.settings.getfloat("DB_COMMIT_SECONDS", 30),
+            stats=crawler.stats,
+            join_settings=cls.join_settings_from(crawler.settings),
+            signals=crawler.signals,
+            writer_batches=crawler.settings.getint("DB_WRITER_QUEUE", 4),
+            crawler=crawler,
+        )
+
+    def write_batch(self, records: list) -> int:
+        return self.db.add_records(records, use_copy=True)
+
+
+class SeasonExportPipeline(DBWriterPipeline):
+    """
+    Builds the columnar season exports (db/export.py) straight from the item stream instead
+    of the database. Joined games are grouped by season and appended to the export under
+    EXPORT_DIR every DB_COMMIT_GAMES games. Games already in an export are skipped, so the
+    pipeline can run next to a database writer or on a re-crawl. Running next to one, it
+    needs a spill store of its own: EXPORT_SPILL_PATH, by default JOIN_SPILL_PATH with
+    .export before the extension (join_spill.export.sqlite).
+    """
+
+    def __init__(self, export_dir: str = "exports", **kwargs):
+        super(SeasonExportPipeline, self).__init__(**kwargs)
+        self.export_dir = export_dir
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(
+            export_dir=crawler.settings.get("EXPORT_DIR", "exports"),
+            commit_games=crawler.settings.getint("DB_COMMIT_GAMES", 50),
+            commit_seconds=crawler.settings.getfloat("DB_COMMIT_SECONDS", 30),
+            stats=crawler.stats,
+            join_settings=cls.export_join_settings(crawler.settings),
+            signals=crawler.signals,
+            writer_batches=crawler.settings.getint("DB_WRITER_QUEUE", 4),
+            crawler=crawler,
+        )
+
+    @classmethod
+    def export_join_settings(cls, settings) -> dict:
+        # the database writer's join settings with a spill store of the export's own, so
+        # the two buffers never unspill each other's games
+        join_settings = cls.join_settings_from(settings)
+        base, ext = os.path.splitext(join_settings["spill_path"])
+        join_settings["spill_path"] = settings.get("EXPORT_SPILL_PATH") or f"{base}.export{ext}"
+        return join_settings
+
+    def open_writer(self, spider):
+        self.exports = {}
+
+    # write_batch runs on the writer thread, so the games without a season are returned
+    # with the rows and counted in batch_written, on the reactor thread
+    def write_batch(self, records: list) -> Tuple[int, int]:
+        rows = 0
+        no_season = 0
+        for season, (games, team_stats, player_stats) in export.record_rows(records).items():
+            if season is None:
+                no_season += len(games)
+                continue
+            if season not in self.exports:
+                self.exports[season] = export.SeasonExport(self.export_dir, season)
+            if self.exports[season].append(games, team_stats, player_stats):
+                rows += len(games) + len(team_stats) + len(player_stats)
+        return rows, no_season
+
+    def batch_written(self, spider, batch: tuple, rows: Tuple[int, int], elapsed: float):
+        rows, no_season = rows
+        if no_season and self.stats is not None:
+            self.stats.inc_value("export/no_season", no_season, spider=spider)
+        super(SeasonExportPipeline, self).batch_written(spider, batch, rows, elapsed)
+
+    def commit(self):
+        # each append already committed its manifest
+        pass
+
+    def rollback(self):
+        pass
+
+    def close_writer(self, spider):
+        for season, e in self.exports.items():
+            spider.logger.info(f"{season} export: {len(e.games)} games")
 
 
 class JsonWriterPipeline(object):
@@ -41,6 +369,6 @@ class JsonWriterPipeline(object):
         self.file.close()
 
     def process_item(self, item, spider):
-        line = json.dumps(dict(item)) + "\n"
+        line = json.dumps(dict(item), default=json_default) + "\n"
         self.file.write(line)
         return item
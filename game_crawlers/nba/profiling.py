@@ -0,0 +1,74 @@
+from typing import Optional
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+
+from db.profiling import Profiler, disable, enable, record_season
+from game_crawlers.nba.telemetry import ParseTimingMiddleware
+
+
+class ProfilingMiddleware:
+    """
+    Spider middleware that samples callbacks with the active Profiler, grouped by callback
+    (named the way telemetry names them) and season. The season is the one the request
+    carries in meta["season"] (the ESPN spider sets it when run with a game id store),
+    otherwise the one of the game date among the callback's items; pages with neither (the
+    ESPN boxscore and matchup) use the season an earlier page of the same game had, and are
+    reported as unknown before it.
+    Reports are written when the spider closes. Not installed unless PROFILE_ENABLED, so a
+    crawl without profiling pays nothing.
+
+    Settings:
+        PROFILE_ENABLED
+        PROFILE_DIR     report directory, default "profiles"
+        PROFILE_SAMPLE  profile one in this many calls of each callback, default 10
+        PROFILE_TOP     functions and allocation sites per report, default 25
+        PROFILE_FRAMES  traceback frames tracemalloc keeps, default 1
+    """
+
+    def __init__(self, profiler: Profiler):
+        self.profiler = profiler
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool("PROFILE_ENABLED"):
+            raise NotConfigured
+        mw = cls(
+            enable(
+                settings.get("PROFILE_DIR", "profiles"),
+                sample_every=settings.getint("PROFILE_SAMPLE", 10),
+                top=settings.getint("PROFILE_TOP", 25),
+                frames=settings.getint("PROFILE_FRAMES", 1),
+            )
+        )
+        crawler.signals.connect(mw.spider_closed, signal=signals.spider_closed)
+        return mw
+
+    def process_spider_input(self, response, spider):
+        request = response.request
+        callback = request.callback or spider.parse
+        kind = ParseTimingMiddleware.callback_name(response, spider)
+        game_id = request.cb_kwargs.get("game_id")
+        meta_season = response.meta.get("season")
+
+        def season(result) -> Optional[str]:
+            if meta_season is not None:
+                return meta_season
+            items = result if isinstance(result, list) else [result]
+            for item in items:
+                s = record_season(item)
+                if s is not None:
+                    if game_id is not None:
+                        self.profiler.remember_season(game_id, s)
+                    return s
+            return self.profiler.game_seasons.get(game_id)
+
+        def profiled_callback(*args, **kwargs):
+            request.callback = callback
+            return self.profiler.run(kind, season, callback, *args, **kwargs)
+
+        request.callback = profiled_callback
+
+    def spider_closed(self, spider):
+        disable()
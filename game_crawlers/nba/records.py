@@ -0,0 +1,105 @@
+from typing import Any, Dict, Iterator, Tuple
+
+from game_crawlers.nba import fields
+
+_UNSET = object()
+
+
+class SlotRecord:
+    """
+    Compact stand-in for a scrapy Item. Every field of the Item is a slot, so a record costs
+    one pointer per field instead of a dict, and field names are checked like they are on
+    the Item. Records keep the parts of the mapping interface the pipeline and the db row
+    mappers use (get, [], in, keys, items), so they pass from spider to mapper without being
+    copied into dicts. Fields never set behave like keys missing from the Item.
+    """
+
+    __slots__ = ()
+    fields: Tuple[str, ...] = ()
+    field_set: frozenset = frozenset()
+
+    def __init__(self, **values):
+        try:
+            for k, v in values.items():
+                setattr(self, k, v)
+        except AttributeError:
+            raise KeyError(f"{type(self).__name__} does not support field: {k}")
+
+    def __getitem__(self, key: str):
+        if key in self.field_set and hasattr(self, key):
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __setitem__(self, key: str, value):
+        try:
+            setattr(self, key, value)
+        except AttributeError:
+            raise KeyError(f"{type(self).__name__} does not support field: {key}")
+
+    def __contains__(self, key) -> bool:
+        return key in self.field_set and hasattr(self, key)
+
+    def __iter__(self) -> Iterator[str]:
+        return self.keys()
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self.keys())
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (SlotRecord, dict)):
+            return self.to_dict() == (other.to_dict() if isinstance(other, SlotRecord) else other)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+    def get(self, key: str, default=None):
+        return getattr(self, key, default) if key in self.field_set else default
+
+    def keys(self) -> Iterator[str]:
+        return (f for f in self.fields if hasattr(self, f))
+
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        for f in self.fields:
+            v = getattr(self, f, _UNSET)
+            if v is not _UNSET:
+                yield f, v
+
+    def setdefaults(self, default):
+        # sets every field not set yet to default
+        for f in self.fields:
+            if not hasattr(self, f):
+                setattr(self, f, default)
+        return self
+
+    def to_dict(self) -> Dict[str, Any]:
+        # nested records are converted too
+        d = {}
+        for f in self.fields:
+            v = getattr(self, f, _UNSET)
+            if v is not _UNSET:
+                d[f] = v.to_dict() if isinstance(v, SlotRecord) else v
+        return d
+
+
+# record_type builds the record class for a scrapy Item, with the Item's fields as slots
+def record_type(item_cls) -> type:
+    names = tuple(item_cls.fields)
+    namespace = {"__slots__": names, "fields": names, "field_set": frozenset(names)}
+    return type(item_cls.__name__, (SlotRecord,), namespace)
+
+
+# json_default lets json.dumps write records, pass it as default=
+def json_default(o):
+    if isinstance(o, SlotRecord):
+        return o.to_dict()
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+Game = record_type(fields.Game)
+Record = record_type(fields.Record)
+Line = record_type(fields.Line)
+Team = record_type(fields.Team)
+TeamStats = record_type(fields.TeamStats)
+Player = record_type(fields.Player)
+PlayerStats = record_type(fields.PlayerStats)
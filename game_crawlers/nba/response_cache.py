@@ -0,0 +1,264 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import zlib
+from datetime import date, datetime
+from typing import Iterable, Optional
+
+from scrapy import signals
+from scrapy.exceptions import IgnoreRequest, NotConfigured
+from scrapy.http import Headers
+from scrapy.responsetypes import responsetypes
+
+from game_crawlers.nba.seasons import season_index
+
+
+class ResponseStore:
+    """
+    Local response store. Bodies are zlib compressed and written once per sha256 digest
+    under objects/, and a sqlite index maps (url, fetch date) to the digest, status, headers
+    and season of the page so the same page fetched on two days shares storage.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.objects = os.path.join(path, "objects")
+        os.makedirs(self.objects, exist_ok=True)
+        self.index = sqlite3.connect(os.path.join(path, "index.sqlite"))
+        self.index.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                url TEXT NOT NULL,
+                fetch_date TEXT NOT NULL,
+                digest TEXT NOT NULL,
+                status INTEGER NOT NULL,
+                headers TEXT NOT NULL,
+                season TEXT,
+                size INTEGER NOT NULL,
+                PRIMARY KEY (url, fetch_date)
+            );
+            CREATE INDEX IF NOT EXISTS responses_season ON responses (season);
+            CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+            """
+        )
+        self.index.commit()
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.objects, digest[:2], digest[2:])
+
+    def put(self, url: str, status: int, headers: dict, body: bytes, season: str = None, fetch_date: date = None):
+        digest = hashlib.sha256(body).hexdigest()
+        path = self._object_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(zlib.compress(body))
+            os.replace(tmp, path)
+        self.index.execute(
+            "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                url,
+                (fetch_date or date.today()).isoformat(),
+                digest,
+                status,
+                json.dumps(headers),
+                season,
+                len(body),
+            ),
+        )
+        self.index.commit()
+
+    def has(self, url: str) -> bool:
+        # whether url was stored, from the index alone
+        row = self.index.execute("SELECT 1 FROM responses WHERE url = ? LIMIT 1", (url,)).fetchone()
+        return row is not None
+
+    def get(self, url: str) -> Optional[tuple]:
+        # returns (status, headers, body) for the most recent fetch of url
+        row = self.index.execute(
+            "SELECT digest, status, headers FROM responses WHERE url = ? "
+            "ORDER BY fetch_date DESC LIMIT 1",
+            (url,),
+        ).fetchone()
+        if row is None:
+            return None
+        try:
+            with open(self._object_path(row[0]), "rb") as f:
+                body = zlib.decompress(f.read())
+        except FileNotFoundError:
+            return None
+        return row[1], json.loads(row[2]), body
+
+    def add_counts(self, hits: int, misses: int):
+        for name, value in (("hits", hits), ("misses", misses)):
+            self.index.execute(
+                "INSERT INTO counters VALUES (?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+                (name, value),
+            )
+        self.index.commit()
+
+    def prune(self, seasons: Iterable[str] = None, keep_seasons: Iterable[str] = None) -> int:
+        # removes index entries for the given seasons, or every season not kept, then
+        # deletes bodies that are no longer referenced
+        if seasons:
+            marks = ",".join("?" * len(seasons))
+            cur = self.index.execute(f"DELETE FROM responses WHERE season IN ({marks})", list(seasons))
+        elif keep_seasons:
+            marks = ",".join("?" * len(keep_seasons))
+            cur = self.index.execute(
+                f"DELETE FROM responses WHERE season IS NULL OR season NOT IN ({marks})",
+                list(keep_seasons),
+            )
+        else:
+            return 0
+        removed = cur.rowcount
+        self.index.commit()
+
+        referenced = {r[0] for r in self.index.execute("SELECT DISTINCT digest FROM responses")}
+        for prefix in os.listdir(self.objects):
+            for name in os.listdir(os.path.join(self.objects, prefix)):
+                if prefix + name not in referenced:
+                    os.remove(os.path.join(self.objects, prefix, name))
+        return removed
+
+    def stats(self) -> dict:
+        entries, raw_bytes = self.index.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+        objects = 0
+        disk_bytes = 0
+        for prefix in os.listdir(self.objects):
+            for name in os.listdir(os.path.join(self.objects, prefix)):
+                objects += 1
+                disk_bytes += os.path.getsize(os.path.join(self.objects, prefix, name))
+        counters = dict(self.index.execute("SELECT name, value FROM counters"))
+        lookups = counters.get("hits", 0) + counters.get("misses", 0)
+        seasons = dict(
+            self.index.execute(
+                "SELECT COALESCE(season, 'unknown'), COUNT(*) FROM responses GROUP BY season"
+            )
+        )
+        return {
+            "entries": entries,
+            "objects": objects,
+            "raw_bytes": raw_bytes,
+            "disk_bytes": disk_bytes,
+            "hits": counters.get("hits", 0),
+            "misses": counters.get("misses", 0),
+            "hit_ratio": round(counters.get("hits", 0) / lookups, 4) if lookups else None,
+            "seasons": seasons,
+        }
+
+    def close(self):
+        self.index.close()
+
+
+# season_for_url finds the season of a page from its url where the url carries a date,
+# i.e. basketball-reference scoreboard and boxscore pages. ESPN urls only carry the game
+# id, so the ESPN spider passes the season in request.meta["season"] instead.
+def season_for_url(url: str) -> Optional[str]:
+    m = re.search(r"boxscores/([0-9]{4})([0-9]{2})([0-9]{2})", url)
+    if m:
+        d = date(int(m.group(1)), int(m.group(2)), int(m.group(3)))
+        return season_index.season(d)
+    m = re.search(r"month=([0-9]+)&day=([0-9]+)&year=([0-9]{4})", url)
+    if m:
+        d = date(int(m.group(3)), int(m.group(1)), int(m.group(2)))
+        return season_index.season(d)
+    return None
+
+
+class ResponseCacheMiddleware:
+    """
+    Downloader middleware that records every successful response in a ResponseStore
+    (RESPONSE_CACHE_MODE = "record") or serves the crawl entirely from the store
+    (RESPONSE_CACHE_MODE = "replay"). Replayed responses are returned from process_request,
+    so they never reach the downloader and pay no DOWNLOAD_DELAY. Requests missing from the
+    store are dropped in replay mode rather than fetched. Both modes count every request as
+    a hit or a miss of the store, so the hit ratio of a recording crawl shows how much of it
+    a replay could serve. Off unless RESPONSE_CACHE_MODE is set.
+    """
+
+    def __init__(self, store: ResponseStore, mode: str, stats):
+        self.store = store
+        self.mode = mode
+        self.stats = stats
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        mode = crawler.settings.get("RESPONSE_CACHE_MODE", "off")
+        if mode not in ("record", "replay"):
+            raise NotConfigured
+        store = ResponseStore(crawler.settings.get("RESPONSE_CACHE_DIR", "response_cache"))
+        mw = cls(store, mode, crawler.stats)
+        crawler.signals.connect(mw.spider_closed, signal=signals.spider_closed)
+        return mw
+
+    def process_request(self, request, spider):
+        if self.mode == "record":
+            # counted only, the page is fetched again and its new copy recorded
+            self._count(self.store.has(request.url), spider)
+            return None
+        cached = self.store.get(request.url)
+        self._count(cached is not None, spider)
+        if cached is None:
+            raise IgnoreRequest(f"{request.url} not in response cache")
+        status, headers, body = cached
+        headers = Headers(headers)
+        respcls = responsetypes.from_args(headers=headers, url=request.url, body=body)
+        return respcls(
+            url=request.url,
+            status=status,
+            headers=headers,
+            body=body,
+            flags=["cached"],
+            request=request,
+        )
+
+    def _count(self, hit: bool, spider):
+        if hit:
+            self.hits += 1
+            self.stats.inc_value("response_cache/hit", spider=spider)
+        else:
+            self.misses += 1
+            self.stats.inc_value("response_cache/miss", spider=spider)
+
+    def process_response(self, request, response, spider):
+        if self.mode != "record" or "cached" in response.flags or response.status != 200:
+            return response
+        headers = {
+            k.decode("latin1"): [v.decode("latin1") for v in vs]
+            for k, vs in response.headers.items()
+        }
+        season = request.meta.get("season") or season_for_url(request.url)
+        self.store.put(request.url, response.status, headers, response.body, season)
+        self.stats.inc_value("response_cache/stored", spider=spider)
+        return response
+
+    def spider_closed(self, spider):
+        self.store.add_counts(self.hits, self.misses)
+        self.store.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="inspect or prune the response cache")
+    parser.add_argument("command", choices=["stats", "prune"])
+    parser.add_argument("--dir", default="response_cache")
+    parser.add_argument("--season", action="append", help="season to remove, e.g. 05-06")
+    parser.add_argument("--keep-season", action="append", help="season to keep, others are removed")
+    args = parser.parse_args()
+
+    store = ResponseStore(args.dir)
+    if args.command == "stats":
+        print(json.dumps(store.stats(), indent=2))
+    else:
+        removed = store.prune(seasons=args.season, keep_seasons=args.keep_season)
+        print(f"removed {removed} cached responses")
+    store.close()
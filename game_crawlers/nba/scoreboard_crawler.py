@@ -0,0 +1,112 @@
+import scrapy
+from scrapy.crawler import CrawlerProcess
+from scrapy.utils.project import get_project_settings
+from datetime import date, datetime
+from typing import Iterable, List
+import argparse
+import json
+import re
+
+from game_crawlers.nba.id_store import GAME_ID_STORE, GameIdStore
+from game_crawlers.nba.seasons import season_index
+
+ESPN_SCOREBOARD_URL = "https://www.espn.com/nba/scoreboard/_/date/"
+
+GAME_ID_RE = re.compile(r"gameId=([0-9]+)")
+SCOREBOARD_DATA_RE = re.compile(r"window\.espn\.scoreboardData\s*=\s*(\{.*?\});\s*window", re.S)
+
+
+class ESPNScoreboardSpider(scrapy.Spider):
+    """
+    Collects ESPN game ids from the scoreboard page of each date over plain HTTP. Ids are read
+    from the mobileScoreboardLink hrefs, the same links GameDriver reads through a browser,
+    and from the scoreboardData JSON embedded in the page when the links are missing. The ids
+    are appended to the GameIdStore.
+    """
+
+    name = "espn_scoreboard"
+
+    def __init__(
+        self,
+        dates: Iterable[date],
+        base_url: str = ESPN_SCOREBOARD_URL,
+        store_path: str = GAME_ID_STORE,
+        skip_existing: bool = True,
+        *args,
+        **kwargs,
+    ):
+        super(ESPNScoreboardSpider, self).__init__(*args, **kwargs)
+        self.dates = dates
+        self.base_url = base_url
+        self.store = GameIdStore(store_path)
+        self.skip_existing = skip_existing
+
+    def date_to_url(self, d: date) -> str:
+        return f"{self.base_url}{d.year}{d.month :02d}{d.day :02d}"
+
+    def start_requests(self):
+        for d in self.dates:
+            if self.skip_existing and self.store.has_date(d):
+                continue
+            yield scrapy.Request(
+                url=self.date_to_url(d), callback=self.parse_scoreboard, cb_kwargs=dict(d=d),
+            )
+
+    def parse_scoreboard(self, response, d: date):
+        games = self.game_ids(response)
+        self.store.append(d, games)
+        self.crawler.stats.inc_value("scoreboard/dates", spider=self)
+        self.crawler.stats.inc_value("scoreboard/game_ids", len(games), spider=self)
+        self.logger.info(f"found {len(games)} games on {d}")
+
+    def closed(self, reason):
+        self.store.close()
+
+    @staticmethod
+    def game_ids(response) -> List[str]:
+        hrefs = response.xpath('//a[@class="mobileScoreboardLink"]/@href').getall()
+        ids = [m.group(1) for m in map(GAME_ID_RE.search, hrefs) if m]
+        if not ids:
+            m = SCOREBOARD_DATA_RE.search(response.text)
+            if m:
+                ids = [str(e["id"]) for e in json.loads(m.group(1)).get("events", [])]
+        # a game can be linked more than once, keep page order
+        return list(dict.fromkeys(ids))
+
+
+def parse_date(s: str) -> date:
+    return datetime.strptime(s, "%Y-%m-%d").date()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="collect ESPN game ids for each date")
+    parser.add_argument("--season", action="append", help="season to collect, e.g. 05-06")
+    parser.add_argument("--start", type=parse_date)
+    parser.add_argument("--end", type=parse_date)
+    parser.add_argument("--base-url", default=ESPN_SCOREBOARD_URL)
+    parser.add_argument("--store", default=GAME_ID_STORE)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    store = GameIdStore(args.store)
+    dates = store.missing_dates(season_index.dates(seasons=args.season))
+    store.close()
+    if args.start or args.end:
+        dates = [
+            d for d in dates
+            if (args.start is None or d >= args.start) and (args.end is None or d <= args.end)
+        ]
+
+    settings = get_project_settings()
+    settings["COOKIES_ENABLED"] = False
+    settings["LOG_LEVEL"] = "INFO"
+    settings["CONCURRENT_REQUESTS"] = args.concurrency
+    settings["CONCURRENT_REQUESTS_PER_DOMAIN"] = args.concurrency
+    settings["AUTOTHROTTLE_ENABLED"] = True
+    settings["AUTOTHROTTLE_TARGET_CONCURRENCY"] = args.concurrency
+
+    process = CrawlerProcess(settings)
+    process.crawl(
+        ESPNScoreboardSpider, dates=list(dates), base_url=args.base_url, store_path=args.store
+    )
+    process.start()
@@ -1,5 +1,10 @@
+from bisect import bisect_right
 from dataclasses import dataclass
-from datetime import datetime
+from datetime import date, datetime, timedelta
+from typing import Iterable, Iterator, Optional, Tuple
+import pytz
+
+EASTERN = pytz.timezone("US/Eastern")
 
 
 @dataclass
@@ -114,3 +119,73 @@ class Seasons:
             "post_season_end": datetime(2019, 6, 13),
         },
     }
+
+
+class SeasonIndex:
+    """
+    Immutable interval index over Seasons.season_info mapping an Eastern calendar date to
+    (season, phase) with a binary search. Days between the end of the regular season and
+    the start of the post season count as post season.
+    """
+
+    REGULAR_SEASON = "regular_season"
+    POST_SEASON = "post_season"
+
+    __slots__ = ("_starts", "_intervals", "_ranges")
+
+    def __init__(self, season_info: dict):
+        intervals = []
+        ranges = {}
+        for season, v in season_info.items():
+            rss = v["regular_season_start"].date()
+            rse = v["regular_season_end"].date()
+            pss = v["post_season_start"].date()
+            pse = v["post_season_end"].date()
+            intervals.append((rss, rse, season, self.REGULAR_SEASON))
+            intervals.append((rse + timedelta(days=1), pse, season, self.POST_SEASON))
+            ranges[season] = ((self.REGULAR_SEASON, rss, rse), (self.POST_SEASON, pss, pse))
+        intervals.sort()
+        self._starts = tuple(i[0] for i in intervals)
+        self._intervals = tuple(intervals)
+        self._ranges = ranges
+
+    def lookup(self, d: date) -> Optional[Tuple[str, str]]:
+        i = bisect_right(self._starts, d) - 1
+        if i < 0:
+            return None
+        _, end, season, phase = self._intervals[i]
+        if d > end:
+            return None
+        return season, phase
+
+    def season(self, d: date) -> Optional[str]:
+        found = self.lookup(d)
+        return found[0] if found else None
+
+    def seasons(self) -> Tuple[str, ...]:
+        return tuple(self._ranges.keys())
+
+    def ranges(
+        self, seasons: Iterable[str] = None, phases: Iterable[str] = None
+    ) -> Iterator[Tuple[str, str, date, date]]:
+        # yields (season, phase, first day, last day) for the scheduled regular and post
+        # season date ranges, the gap before the post season is not included
+        phases = phases or (self.REGULAR_SEASON, self.POST_SEASON)
+        for season in seasons or self._ranges.keys():
+            for phase, start, end in self._ranges[season]:
+                if phase in phases:
+                    yield season, phase, start, end
+
+    def dates(self, seasons: Iterable[str] = None, phases: Iterable[str] = None) -> Iterator[date]:
+        for _, _, start, end in self.ranges(seasons, phases):
+            for i in range((end - start).days + 1):
+                yield start + timedelta(days=i)
+
+
+# parse_game_date converts an ESPN game timestamp (2019-01-24T01:00Z) to its Eastern date
+def parse_game_date(date_str: str) -> date:
+    d = datetime.strptime(date_str, "%Y-%m-%dT%H:%M%z")
+    return d.astimezone(EASTERN).date()
+
+
+season_index = SeasonIndex(Seasons.season_info)
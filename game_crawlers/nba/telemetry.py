@@ -0,0 +1,305 @@
+import json
+import os
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from scrapy import Request, signals
+from scrapy.exceptions import NotConfigured
+from twisted.internet import task
+
+# sent by ParseTimingMiddleware after each callback: callback, seconds, received, items
+callback_parsed = object()
+# sent by DBWriterPipeline after each commit: game_ids, seconds, rows
+games_committed = object()
+
+PARSE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+DOWNLOAD_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+LATENCY_BUCKETS = (0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+FLUSH_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# the item types that end up committed as part of a game
+GAME_ITEM_TYPES = {"game", "team_stats", "player_stats", "game_summary"}
+
+
+class Histogram:
+    """
+    Cumulative histogram of observations in seconds over fixed bucket bounds, with the
+    count, sum and max, in the shape Prometheus expects.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        # (le, observations <= le) with the +Inf bucket last
+        total = 0
+        out = []
+        for le, n in zip(list(self.buckets) + ["+Inf"], self.counts):
+            total += n
+            out.append((str(le), total))
+        return out
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "mean": round(self.sum / self.count, 6) if self.count else None,
+            "max": round(self.max, 6),
+            "buckets": dict(self.cumulative()),
+        }
+
+
+class ParseTimingMiddleware:
+    """
+    Spider middleware that times every callback and reports it to CrawlTelemetry through the
+    callback_parsed signal. The request's callback is wrapped for the one call, since scrapy
+    runs it on a later reactor turn than process_spider_input, and generator callbacks are
+    run to the end before their results are passed on. It should sit next to the spider (a
+    high order) so no other middleware's time is counted. ESPN pages parsed through
+    parse_tracked are reported under the callback that did the parsing (parse_game, ...).
+    """
+
+    def __init__(self, crawler):
+        self.crawler = crawler
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool("TELEMETRY_ENABLED"):
+            raise NotConfigured
+        return cls(crawler)
+
+    def process_spider_input(self, response, spider):
+        request = response.request
+        callback = request.callback or spider.parse
+
+        def timed(*args, **kwargs):
+            request.callback = callback
+            t = time.perf_counter()
+            try:
+                return callback(*args, **kwargs)
+            finally:
+                request.meta["telemetry_parse_seconds"] = time.perf_counter() - t
+
+        request.callback = timed
+
+    def process_spider_output(self, response, result, spider):
+        # results are collected before they are passed on, so the items are tracked before
+        # the pipelines can commit them and the time is the callback's alone
+        t = time.perf_counter()
+        results = list(result or ())
+        elapsed = response.meta.pop("telemetry_parse_seconds", 0.0) + time.perf_counter() - t
+        self.crawler.signals.send_catch_log(
+            callback_parsed,
+            spider=spider,
+            callback=self.callback_name(response, spider),
+            seconds=elapsed,
+            received=response.meta.get("telemetry_received"),
+            items=[r for r in results if not isinstance(r, Request)],
+        )
+        return results
+
+    def process_spider_exception(self, response, exception, spider):
+        response.meta.pop("telemetry_parse_seconds", None)
+
+    @staticmethod
+    def callback_name(response, spider) -> str:
+        name = response.meta.get("game_parse")
+        if name is None:
+            callback = response.request.callback or spider.parse
+            name = getattr(callback, "__name__", "parse")
+        return f"{type(spider).__name__}.{name}"
+
+
+class CrawlTelemetry:
+    """
+    Extension that collects where a crawl spends its time and exports it every
+    TELEMETRY_INTERVAL seconds, and when the spider closes, to TELEMETRY_DIR as
+    <spider>.prom (Prometheus text format, for node_exporter's textfile collector) and
+    <spider>.json. Files are replaced atomically.
+
+    Recorded:
+      - download seconds per response (download_latency)
+      - parse seconds per callback, from ParseTimingMiddleware
+      - item latency, seconds from a fragment's response to the commit of its game, from
+        the games_committed signal the database pipelines send
+      - DB flush seconds per commit, and games/rows committed
+      - items/sec through the pipelines, overall and over the last interval
+
+    Settings:
+        TELEMETRY_ENABLED
+        TELEMETRY_DIR       default "telemetry"
+        TELEMETRY_INTERVAL  seconds, default 15
+        TELEMETRY_MAX_GAMES games whose responses are tracked for item latency, default 10000
+    """
+
+    def __init__(self, crawler, out_dir: str, interval: float, max_games: int):
+        self.crawler = crawler
+        self.out_dir = out_dir
+        self.interval = interval
+        self.max_games = max_games
+
+        self.download = Histogram(DOWNLOAD_BUCKETS)
+        self.parse: Dict[str, Histogram] = defaultdict(lambda: Histogram(PARSE_BUCKETS))
+        self.item_latency = Histogram(LATENCY_BUCKETS)
+        self.flush = Histogram(FLUSH_BUCKETS)
+        self.items = 0
+        self.committed_games = 0
+        self.committed_rows = 0
+        # game id -> monotonic times its item's responses were received, until committed
+        self.received: Dict[str, List[float]] = {}
+
+        self.started = None
+        self.last_export = None
+        self.last_items = 0
+        self.items_per_second = 0.0
+        self.export_loop = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool("TELEMETRY_ENABLED"):
+            raise NotConfigured
+        ext = cls(
+            crawler,
+            out_dir=settings.get("TELEMETRY_DIR", "telemetry"),
+            interval=settings.getfloat("TELEMETRY_INTERVAL", 15),
+            max_games=settings.getint("TELEMETRY_MAX_GAMES", 10000),
+        )
+        crawler.signals.connect(ext.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(ext.spider_closed, signal=signals.spider_closed)
+        crawler.signals.connect(ext.response_received, signal=signals.response_received)
+        crawler.signals.connect(ext.item_scraped, signal=signals.item_scraped)
+        crawler.signals.connect(ext.callback_parsed, signal=callback_parsed)
+        crawler.signals.connect(ext.games_committed, signal=games_committed)
+        return ext
+
+    def spider_opened(self, spider):
+        self.started = self.last_export = time.monotonic()
+        os.makedirs(self.out_dir, exist_ok=True)
+        if self.interval > 0:
+            self.export_loop = task.LoopingCall(self.export, spider)
+            self.export_loop.start(self.interval, now=False)
+
+    def spider_closed(self, spider):
+        if self.export_loop is not None and self.export_loop.running:
+            self.export_loop.stop()
+        self.export(spider)
+
+    def response_received(self, response, request, spider):
+        request.meta["telemetry_received"] = time.monotonic()
+        latency = request.meta.get("download_latency")
+        if latency is not None:
+            self.download.observe(latency)
+
+    def item_scraped(self, item, response, spider):
+        self.items += 1
+
+    def callback_parsed(self, spider, callback: str, seconds: float, received: Optional[float],
+                        items: list):
+        self.parse[callback].observe(seconds)
+        if received is None:
+            return
+        for item in items:
+            kind = item.get("type") if hasattr(item, "get") else None
+            if kind in GAME_ITEM_TYPES:
+                self.received.setdefault(item.get("game_id"), []).append(received)
+            elif kind == "game_incomplete":
+                # never committed, the join buffer spills it
+                self.received.pop(item.get("game_id"), None)
+        while len(self.received) > self.max_games:
+            # pipelines that never commit would grow this forever, drop the oldest games
+            del self.received[next(iter(self.received))]
+
+    def games_committed(self, game_ids: Iterable, seconds: float, rows: int):
+        now = time.monotonic()
+        self.flush.observe(seconds)
+        self.committed_rows += rows
+        for game_id in game_ids:
+            self.committed_games += 1
+            for t in self.received.pop(game_id, ()):
+                self.item_latency.observe(now - t)
+
+    def snapshot(self, spider) -> dict:
+        now = time.monotonic()
+        elapsed = now - self.started if self.started is not None else 0.0
+        return {
+            "spider": spider.name,
+            "time": time.time(),
+            "elapsed": round(elapsed, 3),
+            "items": self.items,
+            "items_per_second": round(self.items / elapsed, 3) if elapsed else 0.0,
+            "items_per_second_last_interval": round(self.items_per_second, 3),
+            "games_committed": self.committed_games,
+            "rows_committed": self.committed_rows,
+            "games_awaiting_commit": len(self.received),
+            "download_seconds": self.download.to_dict(),
+            "parse_seconds": {k: h.to_dict() for k, h in sorted(self.parse.items())},
+            "item_latency_seconds": self.item_latency.to_dict(),
+            "db_flush_seconds": self.flush.to_dict(),
+        }
+
+    def prometheus(self, snapshot: dict) -> str:
+        spider = snapshot["spider"]
+        lines = []
+
+        def metric(name: str, kind: str, doc: str):
+            lines.append(f"# HELP nba_crawl_{name} {doc}")
+            lines.append(f"# TYPE nba_crawl_{name} {kind}")
+
+        def histogram(name: str, h: Histogram, labels: str):
+            for le, n in h.cumulative():
+                lines.append(f'nba_crawl_{name}_bucket{{{labels},le="{le}"}} {n}')
+            lines.append(f"nba_crawl_{name}_sum{{{labels}}} {h.sum:.6f}")
+            lines.append(f"nba_crawl_{name}_count{{{labels}}} {h.count}")
+
+        base = f'spider="{spider}"'
+        metric("download_seconds", "histogram", "Download latency per response.")
+        histogram("download_seconds", self.download, base)
+        metric("parse_seconds", "histogram", "Time spent in each spider callback.")
+        for callback, h in sorted(self.parse.items()):
+            histogram("parse_seconds", h, f'{base},callback="{callback}"')
+        metric("item_latency_seconds", "histogram", "Seconds from an item's response to its commit.")
+        histogram("item_latency_seconds", self.item_latency, base)
+        metric("db_flush_seconds", "histogram", "Duration of each database flush.")
+        histogram("db_flush_seconds", self.flush, base)
+        for name, kind, doc, value in (
+            ("items_total", "counter", "Items through the pipelines.", snapshot["items"]),
+            ("items_per_second", "gauge", "Items/sec over the last export interval.",
+             snapshot["items_per_second_last_interval"]),
+            ("games_committed_total", "counter", "Games committed.", snapshot["games_committed"]),
+            ("rows_committed_total", "counter", "Rows committed.", snapshot["rows_committed"]),
+            ("games_awaiting_commit", "gauge", "Games with responses not yet committed.",
+             snapshot["games_awaiting_commit"]),
+        ):
+            metric(name, kind, doc)
+            lines.append(f"nba_crawl_{name}{{{base}}} {value}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, spider):
+        now = time.monotonic()
+        if now > self.last_export:
+            self.items_per_second = (self.items - self.last_items) / (now - self.last_export)
+        self.last_export, self.last_items = now, self.items
+
+        snapshot = self.snapshot(spider)
+        self.write(f"{spider.name}.json", json.dumps(snapshot, indent=2))
+        self.write(f"{spider.name}.prom", self.prometheus(snapshot))
+
+    def write(self, name: str, text: str):
+        # written beside the target and renamed, so readers never see a partial file
+        path = os.path.join(self.out_dir, name)
+        with open(path + ".tmp", "w") as f:
+            f.write(text)
+        os.replace(path + ".tmp", path)
@@ -0,0 +1,249 @@
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+from scrapy.exceptions import NotConfigured
+from scrapy.utils.httpobj import urlparse_cached
+
+# per host budgets, matched on the end of the host name so www.espn.com and
+# site.api.espn.com each get their own controller with the espn.com budget.
+#   min, max: concurrency bounds, start: concurrency of a new host
+#   delay: the smallest delay between requests the controller will go down to
+DEFAULT_HOST_BUDGETS = {
+    "basketball-reference.com": {"min": 1, "max": 2, "start": 1, "delay": 3.0},
+    "espn.com": {"min": 1, "max": 8, "start": 2, "delay": 0.25},
+    "*": {"min": 1, "max": 4, "start": 1, "delay": 1.0},
+}
+
+# statuses that mean the host wants us to slow down
+BACKOFF_STATUSES = (429, 503)
+
+
+class HostController:
+    """
+    AIMD controller for one host. A window of healthy responses (as many as the current
+    concurrency, with latency under the target) first takes a quarter off the delay, down
+    to the budget's floor, and then adds one to the concurrency. Rate limit statuses halve
+    the concurrency, at least double the delay and pause the host for its Retry-After; the
+    concurrency does not grow again for twice that long. Responses to requests sent before
+    a backoff do not back off again. A window of slow responses, or errors over the error
+    rate, takes one off the concurrency.
+    """
+
+    def __init__(self, host: str, budget: dict, target_latency: float, max_error_rate: float,
+                 max_delay: float, backoff_delay: float):
+        self.host = host
+        self.min_concurrency = budget["min"]
+        self.max_concurrency = budget["max"]
+        self.min_delay = budget["delay"]
+        self.concurrency = budget["start"]
+        self.delay = budget["delay"]
+        self.target_latency = target_latency
+        self.max_error_rate = max_error_rate
+        self.max_delay = max_delay
+        self.backoff_delay = backoff_delay
+
+        self.latency = None  # moving average, seconds
+        self.error_rate = 0.0  # moving average of error responses
+        self.healthy = 0  # healthy responses since the last change
+        self.unhealthy = 0
+        self.backoff_effective = float("-inf")  # requests sent after this saw the last backoff
+        self.cooldown_until = 0.0
+        self.paused_until = 0.0  # Retry-After, no requests before this
+
+    # slot_delay is the delay the host's slot should use right now
+    def slot_delay(self, now: float) -> float:
+        return max(self.delay, min(self.max_delay, self.paused_until - now))
+
+    # observe records one response or failure and returns the decision taken, if any
+    def observe(self, sent: float, latency: Optional[float], status: Optional[int],
+                retry_after: Optional[float], now: float) -> Optional[str]:
+        backoff = status in BACKOFF_STATUSES or bool(retry_after)
+        error = not backoff and (status is None or status >= 500)
+        self.error_rate = 0.9 * self.error_rate + 0.1 * error
+        if latency is not None:
+            self.latency = latency if self.latency is None else 0.7 * self.latency + 0.3 * latency
+
+        if backoff:
+            self.healthy = self.unhealthy = 0
+            self.paused_until = max(self.paused_until, now + (retry_after or 0))
+            if sent < self.backoff_effective:
+                # sent before the last backoff reached the slot, already slowed down for
+                return None
+            self.concurrency = max(self.min_concurrency, self.concurrency // 2)
+            self.delay = min(self.max_delay, max(self.delay * 2, self.backoff_delay))
+            # the downloader sends queued requests before this response reaches the
+            # middleware, and slots randomise delays down to half
+            self.backoff_effective = now + self.slot_delay(now) / 2
+            self.cooldown_until = now + 2 * max(retry_after or 0, self.delay)
+            return "backoff"
+
+        slow = self.latency is not None and self.latency > self.target_latency
+        if error or slow or self.error_rate > self.max_error_rate:
+            self.healthy = 0
+            self.unhealthy += 1
+            if self.unhealthy >= self.concurrency and self.concurrency > self.min_concurrency:
+                self.unhealthy = 0
+                self.concurrency -= 1
+                return "decrease"
+            return None
+
+        self.unhealthy = 0
+        self.healthy += 1
+        if self.healthy < self.concurrency:
+            return None
+        if self.delay > self.min_delay:
+            # snaps to the floor once close, shrinking never reaches a floor of 0
+            self.healthy = 0
+            self.delay = self.delay * 0.75 if self.delay * 0.75 > self.min_delay + 0.01 else self.min_delay
+            return "recover"
+        if now < self.cooldown_until:
+            return None
+        self.healthy = 0
+        if self.concurrency < self.max_concurrency:
+            self.concurrency += 1
+            return "increase"
+        return None
+
+
+def retry_after_seconds(value: Optional[bytes], now: float) -> Optional[float]:
+    # Retry-After is either a number of seconds or an http date
+    if not value:
+        return None
+    value = value.decode("latin1").strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - now)
+    except (TypeError, ValueError):
+        return None
+
+
+# split_budgets divides host budgets between workers that crawl the same hosts from
+# separate processes, so together they stay within one budget: each worker gets its share
+# of the concurrency (at least 1, so more workers than a host's max go over it) and a delay
+# workers times as long, which caps the combined request rate at the budget's
+def split_budgets(budgets: Dict[str, dict], workers: int) -> Dict[str, dict]:
+    split = {}
+    for host, budget in budgets.items():
+        top = max(1, budget["max"] // workers)
+        split[host] = {
+            "min": min(budget["min"], top),
+            "max": top,
+            "start": min(budget["start"], top),
+            "delay": budget["delay"] * workers,
+        }
+    return split
+
+
+class AdaptiveConcurrencyMiddleware:
+    """
+    Downloader middleware that runs a HostController for every host and applies its
+    concurrency and delay to the host's downloader slot. It should sit next to the
+    downloader (a high order, above the retry middleware) so it sees 429 and 503 responses
+    before they are retried. Replayed cache responses are ignored.
+
+    Settings:
+        ADAPTIVE_CONCURRENCY_ENABLED
+        ADAPTIVE_CONCURRENCY_HOSTS           host suffix -> budget, see DEFAULT_HOST_BUDGETS
+        ADAPTIVE_CONCURRENCY_TARGET_LATENCY  seconds, default 2
+        ADAPTIVE_CONCURRENCY_MAX_ERROR_RATE  default 0.1
+        ADAPTIVE_CONCURRENCY_MAX_DELAY       seconds, default 60
+        ADAPTIVE_CONCURRENCY_BACKOFF_DELAY   smallest delay after a backoff, default 1
+
+    Every decision is counted in the stats as throttle/<host>/<decision>, and the current
+    throttle/<host>/concurrency, delay and latency are kept up to date.
+    """
+
+    def __init__(self, crawler, budgets: Dict[str, dict], target_latency: float,
+                 max_error_rate: float, max_delay: float, backoff_delay: float):
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.budgets = budgets
+        self.target_latency = target_latency
+        self.max_error_rate = max_error_rate
+        self.max_delay = max_delay
+        self.backoff_delay = backoff_delay
+        self.hosts: Dict[str, HostController] = {}
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool("ADAPTIVE_CONCURRENCY_ENABLED"):
+            raise NotConfigured
+        budgets = dict(DEFAULT_HOST_BUDGETS)
+        budgets.update(settings.getdict("ADAPTIVE_CONCURRENCY_HOSTS"))
+        return cls(
+            crawler,
+            budgets,
+            target_latency=settings.getfloat("ADAPTIVE_CONCURRENCY_TARGET_LATENCY", 2.0),
+            max_error_rate=settings.getfloat("ADAPTIVE_CONCURRENCY_MAX_ERROR_RATE", 0.1),
+            max_delay=settings.getfloat("ADAPTIVE_CONCURRENCY_MAX_DELAY", 60.0),
+            backoff_delay=settings.getfloat("ADAPTIVE_CONCURRENCY_BACKOFF_DELAY", 1.0),
+        )
+
+    def budget_for(self, host: str) -> dict:
+        matches = [s for s in self.budgets if s != "*" and (host == s or host.endswith("." + s))]
+        return self.budgets[max(matches, key=len)] if matches else self.budgets["*"]
+
+    def controller(self, host: str) -> HostController:
+        c = self.hosts.get(host)
+        if c is None:
+            c = self.hosts[host] = HostController(
+                host,
+                self.budget_for(host),
+                self.target_latency,
+                self.max_error_rate,
+                self.max_delay,
+                self.backoff_delay,
+            )
+            self.export(c)
+        return c
+
+    def process_request(self, request, spider):
+        # slots are created by the downloader after this runs, so a host's first request
+        # goes out with the default slot settings and later ones with the controller's
+        host = urlparse_cached(request).hostname or ""
+        request.meta["throttle_sent"] = time.monotonic()
+        self.apply(self.controller(host), request.meta.get("download_slot", host))
+
+    def process_response(self, request, response, spider):
+        if "cached" in response.flags:
+            return response
+        now = time.time()
+        retry_after = retry_after_seconds(response.headers.get("Retry-After"), now)
+        self.observe(request, request.meta.get("download_latency"), response.status, retry_after)
+        return response
+
+    def process_exception(self, request, exception, spider):
+        self.observe(request, None, None, None)
+
+    def observe(self, request, latency, status, retry_after):
+        host = urlparse_cached(request).hostname or ""
+        c = self.controller(host)
+        now = time.monotonic()
+        sent = now - latency if latency is not None else request.meta.get("throttle_sent", now)
+        decision = c.observe(sent, latency, status, retry_after, now)
+        if decision is not None:
+            self.stats.inc_value(f"throttle/{host}/{decision}")
+            if retry_after:
+                self.stats.inc_value(f"throttle/{host}/retry_after")
+            self.crawler.spider.logger.debug(
+                f"throttle {host}: {decision} -> concurrency {c.concurrency}, "
+                f"delay {c.delay:.2f}s, latency {c.latency or 0:.2f}s"
+            )
+        self.apply(c, request.meta.get("download_slot", host))
+        self.export(c)
+
+    def apply(self, c: HostController, slot_key: str):
+        slot = self.crawler.engine.downloader.slots.get(slot_key)
+        if slot is not None:
+            slot.concurrency = c.concurrency
+            slot.delay = c.slot_delay(time.monotonic())
+
+    def export(self, c: HostController):
+        self.stats.set_value(f"throttle/{c.host}/concurrency", c.concurrency)
+        self.stats.max_value(f"throttle/{c.host}/max_concurrency", c.concurrency)
+        self.stats.set_value(f"throttle/{c.host}/delay", round(c.delay, 3))
+        if c.latency is not None:
+            self.stats.set_value(f"throttle/{c.host}/latency", round(c.latency, 3))
@@ -1,64 +1,233 @@
 from scrapy.utils.project import get_project_settings
 from scrapy.crawler import CrawlerProcess
+import argparse
 import os
 import json
-import time
-import random
-from datetime import datetime, timedelta
-from typing import List
+import pprint
+from datetime import date, datetime
+from itertools import islice
+from typing import Iterable, Iterator, List, Tuple
 
-from game_crawlers.nba.bbref_crawler import BBRefSpider
-from game_crawlers.nba.seasons import Seasons
+from game_crawlers.nba.espn_crawler import NBAESPNSpider
+from game_crawlers.nba.id_store import GAME_ID_STORE, GameIdStore
+from game_crawlers.nba.launcher import crawl_finished, merge_stats, run_workers, shard_units
+from game_crawlers.nba.seasons import season_index
 from db import nba
+from db.engine import session_scope
 
-# TODO read game ids by date in docker volume
-# TODO add flags to specify date range
+CHECKPOINT = os.environ.get("CRAWL_CHECKPOINT", "crawl_plan.json")
+DB_CHUNK_SIZE = 1000
 
-USER = os.environ["dbName"]
-PASSWORD = os.environ["dbPass"]
 
+def missing_ids(session, ids: Iterable[str], chunk_size: int = DB_CHUNK_SIZE) -> Iterator[str]:
+    # anti-join of candidate ids against the games table, one IN query per chunk
+    ids = iter(ids)
+    seen = set()
+    while True:
+        chunk = [i for i in islice(ids, chunk_size) if i not in seen]
+        if not chunk:
+            return
+        seen.update(chunk)
+        existing = {
+            str(r[0])
+            for r in session.query(nba.Game.id).filter(
+                nba.Game.id.in_([int(i) for i in chunk])
+            )
+        }
+        for i in chunk:
+            if i not in existing:
+                yield i
 
-def get_espn_ids():
-    fp = "/c/Users/ainig/Desktop/gameid_data/game_ids"
-    files = os.listdir(fp)
 
-    ids = []
-    for f in files:
-        file_path = os.path.join(fp, f)
-        if os.path.isfile(file_path):
-            with open(os.path.join(fp, f)) as js:
-                ids.extend(json.load(js))
-    return ids
+def plan_units(args) -> List[Tuple[str, date, date]]:
+    # crawl units are explicit date ranges or seasons, every season when nothing is given
+    if args.start or args.end:
+        start = args.start or min(s for _, _, s, _ in season_index.ranges())
+        end = args.end or max(e for _, _, _, e in season_index.ranges())
+        return [(f"{start.isoformat()}_{end.isoformat()}", start, end)]
+    units = []
+    for season in args.season or season_index.seasons():
+        ranges = list(season_index.ranges(seasons=[season]))
+        units.append((season, ranges[0][2], ranges[-1][3]))
+    return units
+
+
+def load_checkpoint(path: str) -> dict:
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return {"units": {}}
+
+
+def save_checkpoint(path: str, checkpoint: dict):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp, path)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="crawl ESPN games not yet in the database")
+    parser.add_argument("--season", action="append", help="season to crawl, e.g. 05-06")
+    parser.add_argument("--start", type=lambda s: datetime.strptime(s, "%Y-%m-%d").date())
+    parser.add_argument("--end", type=lambda s: datetime.strptime(s, "%Y-%m-%d").date())
+    parser.add_argument("--checkpoint", default=CHECKPOINT)
+    parser.add_argument("--store", default=GAME_ID_STORE, help="game id store to read ids from")
+    parser.add_argument(
+        "--summary",
+        action="store_true",
+        help="fetch each game as one ESPN summary request instead of three pages",
+    )
+    parser.add_argument(
+        "--max-open-games",
+        type=int,
+        default=32,
+        help="games whose pages may be in flight at once, 0 for no limit",
+    )
+    parser.add_argument(
+        "--throttle",
+        choices=["adaptive", "autothrottle"],
+        default="adaptive",
+        help="per host adaptive concurrency, or a fixed 1s delay with AutoThrottle",
+    )
+    parser.add_argument(
+        "--telemetry",
+        metavar="DIR",
+        help="export parse, commit and throughput metrics to DIR as .prom and .json files",
+    )
+    parser.add_argument(
+        "--replan", action="store_true", help="ignore checkpointed plans and re-read the id store"
+    )
+    parser.add_argument(
+        "--response-cache",
+        choices=["off", "record", "replay"],
+        default=os.environ.get("RESPONSE_CACHE_MODE", "off"),
+        help="record every response to the local cache, or replay the crawl from it",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="crawl processes to split the units between, sharing one politeness budget",
+    )
+    return parser.parse_args()
 
 
 if __name__ == "__main__":
+    args = parse_args()
     print("getting game ids")
 
-    db = nba.nbaDB(USER, PASSWORD)
-
-    # this step removes ids from the list to process if they have already been processed
-    # required due to multiple runs/debug sessions to get it working properly.
-    query = db.session.query(nba.Game.id)
-    t = query.all()
-    current_ids = [str(i[0]) for i in t]
+    store = GameIdStore(args.store)
+    checkpoint = load_checkpoint(args.checkpoint)
 
-    ids = [i for i in ids if i not in current_ids]
-    del db
+    # this step removes ids from the list to process if they have already been processed.
+    # A checkpointed unit only re-checks its own remaining ids against the database, so a
+    # resumed run does not re-query the id store or recompute the whole diff.
+    planned = []
+    units = plan_units(args)
+    with session_scope() as session:
+        for label, start, end in units:
+            unit = checkpoint["units"].get(label)
+            if unit and unit["done"] and not args.replan:
+                continue
+            if unit is None or args.replan:
+                candidates = store.ids_between(start, end)
+            else:
+                candidates = unit["ids"]
+            unit_ids = list(missing_ids(session, candidates))
+            checkpoint["units"][label] = {
+                "start": start.isoformat(),
+                "end": end.isoformat(),
+                "ids": unit_ids,
+                "done": False,
+            }
+            save_checkpoint(args.checkpoint, checkpoint)
+            print(f"{label}: {len(unit_ids)} games to crawl")
+            planned.append((label, unit_ids))
+    store.close()
 
+    ids = [i for _, unit_ids in planned for i in unit_ids]
     print(f"{len(ids)} games found")
 
     settings = get_project_settings()
     settings["COOKIES_ENABLED"] = False
-    settings["DOWNLOAD_DELAY"] = 1
     settings["LOG_LEVEL"] = "INFO"
+    settings["MAX_OPEN_GAMES"] = args.max_open_games
     settings["ITEM_PIPELINES"] = {
-        "game_crawler.pipelines.DBWriterPipeline": 100,
+        "game_crawlers.nba.pipelines.DBWriterPipeline": 100,
+    }
+    settings["DOWNLOADER_MIDDLEWARES"] = {
+        "game_crawlers.nba.response_cache.ResponseCacheMiddleware": 900,
+        # next to the downloader so it sees 429/503 before the retry middleware
+        "game_crawlers.nba.throttle.AdaptiveConcurrencyMiddleware": 950,
     }
-    settings["AUTOTHROTTLE_ENABLED"] = True
-    settings["AUTHROTTLE_TARGET_CONCURRENCY"] = 3
-
-    process = CrawlerProcess(settings)
-    process.crawl(BBRefSpider, ids=ids)
-    print("starting crawler")
-    process.start()
-    print("crawling completed")
+    if args.throttle == "adaptive":
+        # per host concurrency and delay come from the controller's budgets, new hosts
+        # start at the budget's start concurrency after their first request
+        settings["ADAPTIVE_CONCURRENCY_ENABLED"] = True
+        settings["DOWNLOAD_DELAY"] = 0
+        settings["CONCURRENT_REQUESTS"] = 32
+        settings["CONCURRENT_REQUESTS_PER_DOMAIN"] = 1
+        settings["AUTOTHROTTLE_ENABLED"] = False
+    else:
+        settings["DOWNLOAD_DELAY"] = 1
+        settings["AUTOTHROTTLE_ENABLED"] = True
+        settings["AUTOTHROTTLE_TARGET_CONCURRENCY"] = 3
+    if args.telemetry:
+        settings["TELEMETRY_ENABLED"] = True
+        settings["TELEMETRY_DIR"] = args.telemetry
+        settings["EXTENSIONS"] = {"game_crawlers.nba.telemetry.CrawlTelemetry": 500}
+        settings["SPIDER_MIDDLEWARES"] = {
+            "game_crawlers.nba.telemetry.ParseTimingMiddleware": 990,
+        }
+    # PROFILE_DIR samples callbacks and nbaDB.add_record under cProfile and tracemalloc
+    if os.environ.get("PROFILE_DIR"):
+        settings["PROFILE_ENABLED"] = True
+        settings["PROFILE_DIR"] = os.environ["PROFILE_DIR"]
+        settings["PROFILE_SAMPLE"] = int(os.environ.get("PROFILE_SAMPLE", 10))
+        settings["SPIDER_MIDDLEWARES"] = dict(
+            settings.getdict("SPIDER_MIDDLEWARES"),
+            **{"game_crawlers.nba.profiling.ProfilingMiddleware": 980},
+        )
+    # record stores every response, replay serves the crawl from the store with no network
+    settings["RESPONSE_CACHE_MODE"] = args.response_cache
+    settings["RESPONSE_CACHE_DIR"] = os.environ.get("RESPONSE_CACHE_DIR", "response_cache")
+    if settings["RESPONSE_CACHE_MODE"] == "replay":
+        settings["DOWNLOAD_DELAY"] = 0
+        settings["AUTOTHROTTLE_ENABLED"] = False
+        settings["ADAPTIVE_CONCURRENCY_ENABLED"] = False
+
+    done = [label for label, _, _ in units]
+    if args.workers > 1:
+        # each worker crawls its own shard with its own spider and pipelines, a unit is only
+        # done once every worker with games of it finished with all of its games written
+        shards = shard_units(planned, args.workers)
+        print(f"starting {len(shards)} crawler processes")
+        worker_stats = run_workers(
+            NBAESPNSpider, settings, shards, summary=args.summary, id_store=args.store
+        )
+        for index, (shard, stats) in enumerate(zip(shards, worker_stats)):
+            outcome = "failed" if stats is None else stats.get("finish_reason")
+            print(f"worker {index}: {sum(len(i) for _, i in shard)} games, {outcome}")
+            if not crawl_finished(stats):
+                failed = {label for label, _ in shard}
+                done = [label for label in done if label not in failed]
+        print("crawling completed, stats of all workers:")
+        pprint.pprint(merge_stats([s for s in worker_stats if s is not None]))
+    else:
+        process = CrawlerProcess(settings)
+        crawler = process.create_crawler(NBAESPNSpider)
+        process.crawl(crawler, ids=ids, summary=args.summary, id_store=args.store)
+        print("starting crawler")
+        process.start()
+        stats = crawler.stats.get_stats()
+        print(f"crawling completed: {stats.get('finish_reason')}")
+        # a crawl that was shut down, gave up on games or lost them leaves every unit to the
+        # next run
+        if not crawl_finished(stats):
+            done = []
+
+    for label in done:
+        if label in checkpoint["units"]:
+            checkpoint["units"][label]["done"] = True
+    save_checkpoint(args.checkpoint, checkpoint)